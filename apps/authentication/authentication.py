@@ -16,8 +16,8 @@ class JWTAuthentication(BaseAuthentication):
             '/auth/login',
             '/auth/refresh-token',  # Keep this here - refresh handles its own auth
             '/auth/forgot-password',
-            '/auth/verify-otp',
-            '/auth/change-password',
+            '/auth/forgot-password/verify',
+            '/auth/forgot-password/change',
             '/movies/genres',
         ]
         if request.path in unauthenticated_paths:
@@ -34,16 +34,14 @@ class JWTAuthentication(BaseAuthentication):
             if payload.get('type') != 'access_token':
                 raise AuthenticationFailed('Invalid token type')
 
-            user = User.objects.get(id=payload['user_id'])
-
-            # Validate session
-            session = JWTService.validate_session(payload['session_id'])
-            if not session:
+            # Resolve user and validate session (cached)
+            user = JWTService.resolve_user(payload)
+            if not user:
                 raise AuthenticationFailed('Session expired or invalid')
 
             return (user, token)
 
-        except (User.DoesNotExist, ValueError, KeyError):
+        except (ValueError, KeyError):
             raise AuthenticationFailed('Invalid token')
     
     def authenticate_header(self, request):
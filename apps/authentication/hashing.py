@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+# Worker functions live in this module, which imports no models, so that
+# spawned pool processes can unpickle them before Django is set up.
+
+
+def _init_worker():
+    """Set up Django in a pool process"""
+    import django
+    django.setup()
+
+
+def _hash_password(raw_password):
+    return make_password(raw_password)
+
+
+def _verify_password(raw_password, encoded):
+    """Check a password, returning (valid, upgraded hash or None)"""
+    if not encoded:
+        # Hash anyway so unknown accounts take as long as known ones
+        make_password(raw_password)
+        return False, None
+    
+    upgraded = []
+    valid = check_password(raw_password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+    pass
+
+
+class PasswordHashingService:
+    """Password hashing in a bounded process pool
+    
+    Hashing is deliberately slow, so it runs outside the request worker. At
+    most PASSWORD_HASHING_WORKERS hashes run at once and
+    PASSWORD_HASHING_QUEUE_SIZE more may wait. Beyond that callers are
+    rejected with PasswordHashingBusy instead of piling up.
+    """
+    
+    _executor = None
+    _slots = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._slots = threading.BoundedSemaphore(
+                        settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE_SIZE
+                    )
+                    cls._executor = ProcessPoolExecutor(
+                        max_workers=settings.PASSWORD_HASHING_WORKERS,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker
+                    )
+        return cls._executor
+    
+    @classmethod
+    def _submit(cls, blocking, fn, *args):
+        executor = cls._get_executor()
+        
+        if blocking:
+            acquired = cls._slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT)
+        else:
+            acquired = cls._slots.acquire(blocking=False)
+        
+        if not acquired:
+            raise PasswordHashingBusy("Password hashing queue is full")
+        
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: cls._slots.release())
+        return future
+    
+    @classmethod
+    def hash_password(cls, raw_password):
+        """Hash a password, waiting for the result"""
+        return cls._submit(True, _hash_password, raw_password).result()
+    
+    @classmethod
+    def verify_password(cls, raw_password, encoded):
+        """Verify a password, returning (valid, upgraded hash or None)"""
+        return cls._submit(True, _verify_password, raw_password, encoded).result()
+    
+    @classmethod
+    async def ahash_password(cls, raw_password):
+        """Hash a password without blocking the event loop"""
+        return await asyncio.wrap_future(cls._submit(False, _hash_password, raw_password))
+    
+    @classmethod
+    async def averify_password(cls, raw_password, encoded):
+        """Verify a password without blocking the event loop"""
+        return await asyncio.wrap_future(cls._submit(False, _verify_password, raw_password, encoded))
\ No newline at end of file
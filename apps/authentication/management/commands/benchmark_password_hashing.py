@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from apps.authentication.hashing import PasswordHashingService
+
+
+class Command(BaseCommand):
+    help = 'Measure login password verifications per second through the hashing pool'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, help='Concurrent callers (defaults to the pool size)')
+    
+    def handle(self, *args, **options):
+        workers = settings.PASSWORD_HASHING_WORKERS
+        concurrency = options['concurrency'] or workers
+        encoded = make_password('benchmark-password')
+        
+        # Start the pool processes before timing
+        PasswordHashingService.verify_password('benchmark-password', encoded)
+        
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as callers:
+            results = list(callers.map(
+                lambda _: PasswordHashingService.verify_password('benchmark-password', encoded),
+                range(options['logins'])
+            ))
+        elapsed = time.monotonic() - started
+        
+        assert all(valid for valid, _ in results)
+        
+        rate = options['logins'] / elapsed
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['logins']} logins in {elapsed:.2f}s: {rate:.1f} logins/s, "
+            f"{rate / workers:.1f} logins/s per core ({workers} workers, {concurrency} callers)"
+        ))
\ No newline at end of file
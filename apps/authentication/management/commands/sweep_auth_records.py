@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.authentication.services import AuthRecordSweeper
+
+
+class Command(BaseCommand):
+    help = 'Expire stale login sessions and delete old sessions and password resets, e.g. from cron'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--pause', type=float, help='Seconds to sleep between batches')
+        parser.add_argument('--session-retention-days', type=int)
+        parser.add_argument('--reset-retention-days', type=int)
+        parser.add_argument('--interval', type=int, help='Keep running, sweeping every this many seconds')
+        parser.add_argument('--verbose-progress', action='store_true')
+    
+    def handle(self, *args, **options):
+        progress_callback = None
+        if options['verbose_progress']:
+            progress_callback = lambda name, total: self.stdout.write(f"{name}: {total}")
+        
+        sweeper = AuthRecordSweeper(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            session_retention_days=options['session_retention_days'],
+            reset_retention_days=options['reset_retention_days'],
+            progress_callback=progress_callback
+        )
+        
+        while True:
+            try:
+                stats = sweeper.run()
+            except ValueError as e:
+                if not options['interval']:
+                    raise CommandError(str(e))
+                self.stderr.write(str(e))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Expired {stats['expired_sessions']} sessions, deleted {stats['deleted_sessions']} sessions "
+                    f"and {stats['deleted_password_resets']} password resets in {stats['duration']}s"
+                ))
+            
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
\ No newline at end of file
@@ -1,34 +1,26 @@
 from rest_framework import serializers
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from apps.users.models import Genre, UserGenre
+from django.db import transaction
+from apps.users.genres import GenreMembershipService
+from .hashing import PasswordHashingService
 
 User = get_user_model()
 
 
 class LoginSerializer(serializers.Serializer):
-    """Login serializer"""
+    """Login serializer
+    
+    Only validates the input. Credentials are checked by the login view so
+    that password verification runs in the hashing pool.
+    """
     email = serializers.EmailField()
     password = serializers.CharField()
     
     def validate(self, attrs):
-        email = attrs.get('email')
-        password = attrs.get('password')
-        
-        if email and password:
-            user = authenticate(request=self.context.get('request'), 
-                              username=email, password=password)
-            
-            if not user:
-                raise serializers.ValidationError('Invalid credentials')
-            
-            if not user.is_active:
-                raise serializers.ValidationError('Account is deactivated')
-            
-            attrs['user'] = user
-            return attrs
-        else:
+        if not attrs.get('email') or not attrs.get('password'):
             raise serializers.ValidationError('Must include email and password')
+        return attrs
 
 
 class SignupSerializer(serializers.Serializer):
@@ -54,19 +46,20 @@ class SignupSerializer(serializers.Serializer):
     def create(self, validated_data):
         genres_data = validated_data.pop('genres', [])
         
-        user = User.objects.create_user(
-            email=validated_data['email'],
-            password=validated_data['password'],
-            full_name=validated_data['name']
-        )
+        # Async callers hash ahead of time, without holding a thread
+        password_hash = validated_data.get('password_hash')
+        if not password_hash:
+            password_hash = PasswordHashingService.hash_password(validated_data['password'])
         
-        # Add selected genres
-        for genre_id in genres_data:
-            try:
-                genre = Genre.objects.get(id=genre_id)
-                UserGenre.objects.create(user=user, genre=genre)
-            except Genre.DoesNotExist:
-                pass
+        with transaction.atomic():
+            user = User.objects.create(
+                email_address=User.objects.normalize_email(validated_data['email']),
+                password=password_hash,
+                full_name=validated_data['name']
+            )
+            
+            # Add selected genres, unknown ones are skipped
+            GenreMembershipService.add_genres(user, genres_data)
         
         return user
 
@@ -1,10 +1,24 @@
+import os
 import jwt
+import copy
+import json
+import math
+import time
+import redis
 import hashlib
 import secrets
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.core.cache import cache
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django_redis import get_redis_connection
+from apps.common.hashing import hash_positions
+from apps.common.metrics import Metrics
 from apps.users.models import LoginSession, PasswordReset
 
 User = get_user_model()
@@ -111,10 +125,390 @@ class JWTService:
             if session.refresh_token_expires_at < timezone.now():
                 session.status = 'expired'
                 session.save()
+                SessionCache.invalidate_sessions([session.id])
                 return None
             return session
         except LoginSession.DoesNotExist:
             return None
+    
+    @staticmethod
+    def terminate_user_sessions(user):
+        """Terminate all of a user's active login sessions"""
+        sessions = user.login_sessions.filter(status='active')
+        session_ids = list(sessions.values_list('id', flat=True))
+        
+        # update() skips auto_now, updated_at is when the session ended
+        now = timezone.now()
+        sessions.filter(id__in=session_ids).update(
+            status='terminated',
+            session_end=now,
+            updated_at=now
+        )
+        SessionCache.invalidate_sessions(session_ids)
+    
+    @staticmethod
+    def resolve_user(payload):
+        """Resolve the user of a decoded access token, None if its session is no longer active
+        
+        In 'session' mode the session row is checked (through SessionCache).
+        In 'stateless' mode the token is trusted until it expires unless its
+        session is in the revocation list.
+        """
+        if settings.JWT_AUTH_MODE == 'stateless':
+            if RevocationList.is_revoked(payload['session_id']):
+                return None
+            return SessionCache.resolve_user(payload['user_id'])
+        
+        return SessionCache.resolve(payload['session_id'], payload['user_id'])
+
+
+class SessionCache:
+    """Two-level cache of authenticated session and user lookups
+    
+    Entries live briefly in process memory and for longer in Redis, so steady
+    state authentication needs no database queries. Invalidations delete the
+    Redis entries and are announced on a pub/sub channel that every process
+    listens to, evicting their local copies immediately.
+    """
+    
+    CHANNEL = 'auth:revocations'
+    
+    _local = OrderedDict()
+    # Bumped by every eviction, so a lookup that raced one does not cache its result
+    _generation = 0
+    _lock = threading.Lock()
+    _listener = None
+    _listener_pid = None
+    
+    @staticmethod
+    def session_key(session_id):
+        return f"auth_session_{session_id}"
+    
+    @staticmethod
+    def user_key(user_id):
+        return f"auth_user_{user_id}"
+    
+    @classmethod
+    def resolve(cls, session_id, user_id):
+        """Get the user of an active session, loading it from the database on a miss"""
+        cls._ensure_listener()
+        session_id, user_id = str(session_id), str(user_id)
+        
+        # Process memory
+        user = cls._get_local(session_id)
+        if user is not None:
+            Metrics.inc('auth_cache_lookups_total', {'level': 'local'})
+            return copy.copy(user) if str(user.id) == user_id else None
+        generation = cls._generation
+        
+        # Redis, session and user in one round trip
+        session_key, user_key = cls.session_key(session_id), cls.user_key(user_id)
+        cached = cache.get_many([session_key, user_key])
+        session = cached.get(session_key)
+        user = cached.get(user_key)
+        
+        level = 'redis'
+        if session is None or session['user_id'] != user_id or session['expires_at'] < time.time():
+            level = 'database'
+            session = cls._load_session(session_id)
+            if session is None or session['user_id'] != user_id:
+                return None
+        
+        if user is None:
+            level = 'database'
+            user = cls._load_user(user_id)
+            if user is None:
+                return None
+        
+        Metrics.inc('auth_cache_lookups_total', {'level': level})
+        cls._set_local(session_id, user, session['expires_at'], generation)
+        return copy.copy(user)
+    
+    @classmethod
+    def resolve_user(cls, user_id):
+        """Get a user without checking any session"""
+        cls._ensure_listener()
+        user_id = str(user_id)
+        local_key = f"user_{user_id}"
+        
+        user = cls._get_local(local_key)
+        if user is not None:
+            Metrics.inc('auth_cache_lookups_total', {'level': 'local'})
+            return copy.copy(user)
+        generation = cls._generation
+        
+        level = 'redis'
+        user = cache.get(cls.user_key(user_id))
+        if user is None:
+            level = 'database'
+            user = cls._load_user(user_id)
+            if user is None:
+                return None
+        
+        Metrics.inc('auth_cache_lookups_total', {'level': level})
+        cls._set_local(local_key, user, time.time() + settings.AUTH_CACHE_LOCAL_TTL, generation)
+        return copy.copy(user)
+    
+    @classmethod
+    def _load_user(cls, user_id):
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return None
+        
+        cache.set(cls.user_key(user_id), user, settings.AUTH_CACHE_TTL)
+        return user
+    
+    @classmethod
+    def _load_session(cls, session_id):
+        session = JWTService.validate_session(session_id)
+        if not session:
+            return None
+        
+        entry = {
+            'user_id': str(session.user_id),
+            'expires_at': session.refresh_token_expires_at.timestamp()
+        }
+        
+        # Never cache a session beyond its expiry
+        ttl = min(settings.AUTH_CACHE_TTL, int(entry['expires_at'] - time.time()))
+        if ttl <= 0:
+            return entry
+        
+        # A logout may have run since the session was read. The revocation
+        # list is checked after the write, in the same round trip, and
+        # invalidate_sessions revokes before it deletes, so either this sees
+        # the revocation or the entry is deleted after it was written.
+        try:
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            cache.set(cls.session_key(session_id), entry, ttl, client=pipe)
+            pipe.zscore(RevocationList.KEY, str(session_id))
+            revoked_until = pipe.execute()[-1]
+        except redis.RedisError as e:
+            print(f"Session cache write error: {e}")
+            return entry
+        
+        if revoked_until is not None and revoked_until > time.time():
+            cache.delete(cls.session_key(session_id))
+            return None
+        return entry
+    
+    @classmethod
+    def invalidate_sessions(cls, session_ids):
+        """Drop cached sessions everywhere"""
+        session_ids = [str(session_id) for session_id in session_ids]
+        if not session_ids:
+            return
+        
+        # Revoked first, see _load_session
+        RevocationList.revoke(session_ids)
+        cache.delete_many([cls.session_key(session_id) for session_id in session_ids])
+        cls._evict({'sessions': session_ids})
+        cls._announce({'sessions': session_ids})
+    
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Drop a cached user everywhere, e.g. after a profile or password change"""
+        cache.delete(cls.user_key(user_id))
+        cls._evict({'user': str(user_id)})
+        cls._announce({'user': str(user_id)})
+    
+    @classmethod
+    def _get_local(cls, key):
+        with cls._lock:
+            entry = cls._local.get(key)
+            if entry is None:
+                return None
+            
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del cls._local[key]
+                return None
+            
+            cls._local.move_to_end(key)
+            return user
+    
+    @classmethod
+    def _set_local(cls, key, user, expires_at, generation):
+        """Keep a user in process memory, unless an eviction ran since generation was read"""
+        ttl = min(settings.AUTH_CACHE_LOCAL_TTL, expires_at - time.time())
+        if ttl <= 0:
+            return
+        
+        with cls._lock:
+            if cls._generation != generation:
+                return
+            cls._local[key] = (user, time.monotonic() + ttl)
+            cls._local.move_to_end(key)
+            while len(cls._local) > settings.AUTH_CACHE_LOCAL_MAX_ENTRIES:
+                cls._local.popitem(last=False)
+    
+    @classmethod
+    def _evict(cls, message):
+        RevocationList.add_local(message.get('sessions', []))
+        
+        with cls._lock:
+            cls._generation += 1
+            for session_id in message.get('sessions', []):
+                cls._local.pop(session_id, None)
+            
+            if message.get('user'):
+                for session_id, (user, _) in list(cls._local.items()):
+                    if str(user.id) == message['user']:
+                        del cls._local[session_id]
+    
+    @classmethod
+    def _announce(cls, message):
+        try:
+            get_redis_connection('default').publish(cls.CHANNEL, json.dumps(message))
+        except redis.RedisError as e:
+            # Other processes fall back to the short local TTL
+            print(f"Session revocation publish error: {e}")
+    
+    @classmethod
+    def _ensure_listener(cls):
+        """Start this process's revocation listener (restarted after a fork)"""
+        if cls._listener is not None and cls._listener_pid == os.getpid() and cls._listener.is_alive():
+            return
+        
+        with cls._lock:
+            if cls._listener is not None and cls._listener_pid == os.getpid() and cls._listener.is_alive():
+                return
+            
+            cls._local.clear()
+            cls._listener_pid = os.getpid()
+            cls._listener = threading.Thread(target=cls._listen, name='session-revocations', daemon=True)
+            cls._listener.start()
+    
+    @classmethod
+    def _listen(cls):
+        while True:
+            try:
+                pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(cls.CHANNEL)
+                
+                for message in pubsub.listen():
+                    cls._evict(json.loads(message['data']))
+            except redis.RedisError as e:
+                print(f"Session revocation listener error: {e}")
+            
+            # Revocations may have been missed while disconnected
+            with cls._lock:
+                cls._generation += 1
+                cls._local.clear()
+            time.sleep(1)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings"""
+    
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item):
+        return hash_positions(item, self.hashes, self.size)
+    
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Terminated sessions whose access tokens may not have expired yet
+    
+    The authoritative list is a Redis sorted set scored by the time the last
+    access token of each session expires. Each process keeps a Bloom filter
+    of it, so checking a token that was never revoked needs no network round
+    trip. Revocations reach other processes through the SessionCache
+    pub/sub channel. The filter is also rebuilt from Redis every
+    AUTH_REVOCATION_SYNC_INTERVAL seconds, which bounds how long a missed
+    message can go unnoticed.
+    """
+    
+    KEY = 'auth:revoked_sessions'
+    
+    _bloom = None
+    _synced_at = 0
+    _lock = threading.Lock()
+    
+    @classmethod
+    def revoke(cls, session_ids):
+        """Add sessions to the revocation list"""
+        now = time.time()
+        expires_at = now + settings.JWT_ACCESS_TOKEN_LIFETIME
+        
+        try:
+            pipe = get_redis_connection('default').pipeline()
+            pipe.zadd(cls.KEY, {str(session_id): expires_at for session_id in session_ids})
+            pipe.zremrangebyscore(cls.KEY, '-inf', now)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Session revocation error: {e}")
+        
+        cls.add_local(session_ids)
+    
+    @classmethod
+    def add_local(cls, session_ids):
+        """Add sessions to this process's filter"""
+        # Waits for a rebuild in progress so the addition is not lost
+        with cls._lock:
+            if cls._bloom is not None:
+                for session_id in session_ids:
+                    cls._bloom.add(str(session_id))
+    
+    @classmethod
+    def is_revoked(cls, session_id):
+        """Check whether a session has been revoked"""
+        session_id = str(session_id)
+        cls._sync_if_stale()
+        
+        if session_id not in cls._bloom:
+            return False
+        
+        # Possible false positive, confirm with Redis and fail closed
+        try:
+            score = get_redis_connection('default').zscore(cls.KEY, session_id)
+        except redis.RedisError as e:
+            print(f"Session revocation check error: {e}")
+            return True
+        
+        return score is not None and score > time.time()
+    
+    @classmethod
+    def _sync_if_stale(cls):
+        if cls._bloom is not None and time.monotonic() - cls._synced_at < settings.AUTH_REVOCATION_SYNC_INTERVAL:
+            return
+        
+        with cls._lock:
+            if cls._bloom is not None and time.monotonic() - cls._synced_at < settings.AUTH_REVOCATION_SYNC_INTERVAL:
+                return
+            
+            # Revocations are announced on the session cache channel
+            SessionCache._ensure_listener()
+            
+            try:
+                session_ids = get_redis_connection('default').zrangebyscore(cls.KEY, time.time(), '+inf')
+            except redis.RedisError as e:
+                print(f"Session revocation sync error: {e}")
+                if cls._bloom is not None:
+                    # Keep the current filter and retry on the next check
+                    return
+                session_ids = []
+            
+            bloom = BloomFilter(
+                max(settings.AUTH_REVOCATION_BLOOM_CAPACITY, len(session_ids) * 2),
+                settings.AUTH_REVOCATION_BLOOM_ERROR_RATE
+            )
+            for session_id in session_ids:
+                bloom.add(session_id.decode())
+            
+            cls._bloom = bloom
+            cls._synced_at = time.monotonic()
 
 
 class OTPService:
@@ -142,7 +536,7 @@ class OTPService:
         PasswordReset.objects.filter(
             user=user,
             status__in=['pending', 'verified']
-        ).update(status='revoked')
+        ).update(status='revoked', updated_at=timezone.now())
         
         # Generate OTP and hash it
         otp = OTPService.generate_otp()
@@ -165,4 +559,130 @@ class OTPService:
         # This would be implemented with your email service
         print(f"OTP for {user.email_address}: {otp}")  # For development only
         
-        return reset_request, otp
\ No newline at end of file
+        return reset_request, otp
+
+
+class AuthRecordSweeper:
+    """Expire and purge stale LoginSession and PasswordReset rows
+    
+    Work is done in batches of batch_size rows, selected by walking the
+    primary key so the whole run is a single pass over each table. Every
+    batch commits on its own and re-checks its condition when writing,
+    so the sweep holds no long locks and never overwrites rows that live
+    traffic changed in the meantime. It pauses between batches to leave
+    room for that traffic.
+    
+    Expired sessions are invalidated like a logout, so cached entries and
+    stateless access tokens stop working with the sweep. Rows are purged
+    by updated_at, which every status change writes.
+    """
+    
+    LOCK_KEY = 'auth_sweep_lock'
+    STATS_KEY = 'auth_sweep_last_run'
+    
+    def __init__(self, batch_size=None, pause=None, session_retention_days=None,
+                 reset_retention_days=None, progress_callback=None):
+        self.batch_size = batch_size or settings.AUTH_SWEEP_BATCH_SIZE
+        self.pause = settings.AUTH_SWEEP_BATCH_PAUSE if pause is None else pause
+        self.session_retention = timedelta(days=(
+            settings.AUTH_SESSION_RETENTION_DAYS if session_retention_days is None else session_retention_days
+        ))
+        self.reset_retention = timedelta(days=(
+            settings.PASSWORD_RESET_RETENTION_DAYS if reset_retention_days is None else reset_retention_days
+        ))
+        self.progress_callback = progress_callback
+    
+    def run(self):
+        """Run one sweep, returning its statistics"""
+        # A sweep touches every stale row, don't let two overlap
+        if not cache.add(self.LOCK_KEY, True, 3600):
+            raise ValueError("Another sweep is already running")
+        
+        try:
+            started = time.monotonic()
+            now = timezone.now()
+            session_cutoff = now - self.session_retention
+            reset_cutoff = now - self.reset_retention
+            
+            stats = {
+                'started_at': now.isoformat(),
+                'expired_sessions': self._update_batches(
+                    'expired_sessions',
+                    LoginSession.objects,
+                    Q(status='active', refresh_token_expires_at__lt=now),
+                    SessionCache.invalidate_sessions,
+                    status='expired',
+                    session_end=now,
+                    updated_at=now
+                ),
+                'deleted_sessions': self._delete_batches(
+                    'deleted_sessions',
+                    LoginSession.objects,
+                    Q(status__in=['expired', 'terminated'], updated_at__lt=session_cutoff)
+                ),
+                'deleted_password_resets': self._delete_batches(
+                    'deleted_password_resets',
+                    PasswordReset.objects,
+                    Q(status__in=['completed', 'revoked'], updated_at__lt=reset_cutoff) |
+                    Q(expires_at__lt=reset_cutoff)
+                ),
+            }
+            stats['duration'] = round(time.monotonic() - started, 3)
+        finally:
+            cache.delete(self.LOCK_KEY)
+        
+        # Kept for monitoring
+        cache.set(self.STATS_KEY, stats, None)
+        return stats
+    
+    @classmethod
+    def last_run(cls):
+        return cache.get(cls.STATS_KEY)
+    
+    def _batches(self, manager, condition):
+        """Yield primary keys of matching rows, one batch at a time"""
+        last_id = None
+        
+        while True:
+            queryset = manager.filter(condition)
+            if last_id is not None:
+                queryset = queryset.filter(id__gt=last_id)
+            
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                return
+            
+            yield ids
+            last_id = ids[-1]
+            
+            if len(ids) < self.batch_size:
+                return
+            time.sleep(self.pause)
+    
+    def _update_batches(self, name, manager, condition, on_updated, **values):
+        """Update matching rows, passing the ids of each updated batch to on_updated"""
+        total = 0
+        for ids in self._batches(manager, condition):
+            # Lock the rows still matching, so exactly those are updated and reported
+            with transaction.atomic():
+                updated = list(
+                    manager.filter(condition, id__in=ids).select_for_update().values_list('id', flat=True)
+                )
+                manager.filter(id__in=updated).update(**values)
+            
+            on_updated(updated)
+            total += len(updated)
+            self._report(name, total)
+        return total
+    
+    def _delete_batches(self, name, manager, condition):
+        total = 0
+        for ids in self._batches(manager, condition):
+            deleted, _ = manager.filter(condition, id__in=ids).delete()
+            total += deleted
+            self._report(name, total)
+        return total
+    
+    def _report(self, name, total):
+        if self.progress_callback:
+            self.progress_callback(name, total)
\ No newline at end of file
@@ -0,0 +1,114 @@
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from apps.authentication.services import BloomFilter, JWTService, RevocationList, SessionCache
+from apps.users.models import User
+
+CLIENT_IP = '127.0.0.1'
+
+
+class BloomFilterTests(TestCase):
+    
+    def test_added_items_are_members(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f"session-{n}" for n in range(1000)]
+        for item in items:
+            bloom.add(item)
+        
+        self.assertTrue(all(item in bloom for item in items))
+    
+    def test_false_positive_rate_is_near_the_target(self):
+        bloom = BloomFilter(1000, 0.01)
+        for n in range(1000):
+            bloom.add(f"session-{n}")
+        
+        false_positives = sum(f"other-{n}" in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(
+    JWT_AUTH_MODE='stateless',
+    AUTH_REVOCATION_SYNC_INTERVAL=30,
+    RATE_LIMIT_ENABLE=False,
+    SERVER_TIMING_ENABLE=False,
+)
+class StatelessRevocationTests(TestCase):
+    """An access token stops working within a bounded delay of its session being revoked
+    
+    In the revoking process that is immediately. Other processes are told
+    over pub/sub, and when that message is lost they still pick the
+    revocation up when their filter is next rebuilt, at most
+    AUTH_REVOCATION_SYNC_INTERVAL seconds later.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        self.reset_process_state()
+        
+        self.user = User.objects.create_user('member@example.com', 'Cinemate-Revoke-2024', full_name='Member')
+        self.token, self.session = JWTService.create_login_session(self.user, CLIENT_IP)
+    
+    @staticmethod
+    def reset_process_state():
+        """Forget everything this process holds, as a newly started worker would"""
+        SessionCache._local.clear()
+        RevocationList._bloom = None
+        RevocationList._synced_at = 0
+    
+    def get_profile(self):
+        return self.client.get('/profile/', HTTP_AUTHORIZATION=f"Bearer {self.token}")
+    
+    def logout(self):
+        response = self.client.post('/auth/logout', HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, 200)
+    
+    def test_token_is_accepted_until_revoked(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.assertFalse(RevocationList.is_revoked(self.session.id))
+    
+    def test_token_is_rejected_right_after_logout(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        
+        self.logout()
+        
+        self.assertEqual(self.get_profile().status_code, 401)
+    
+    def test_token_is_rejected_after_filter_rebuild(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        self.logout()
+        
+        # A new filter only knows what is in Redis
+        self.reset_process_state()
+        
+        self.assertTrue(RevocationList.is_revoked(self.session.id))
+        self.assertEqual(self.get_profile().status_code, 401)
+    
+    def test_token_is_rejected_elsewhere_within_sync_interval(self):
+        # Another process, whose filter was built before the logout
+        self.assertEqual(self.get_profile().status_code, 200)
+        other_bits, other_synced_at = bytes(RevocationList._bloom.bits), RevocationList._synced_at
+        
+        # The pub/sub message never reaches the other process
+        with mock.patch.object(SessionCache, '_announce'):
+            self.logout()
+        
+        SessionCache._local.clear()
+        RevocationList._bloom.bits[:] = other_bits
+        RevocationList._synced_at = other_synced_at
+        
+        # Its filter is stale until the sync interval has passed...
+        self.assertEqual(self.get_profile().status_code, 200)
+        
+        # ...and is rebuilt from Redis on the first check after it
+        RevocationList._synced_at -= settings.AUTH_REVOCATION_SYNC_INTERVAL
+        self.assertEqual(self.get_profile().status_code, 401)
+    
+    def test_revocation_ends_when_the_last_access_token_expires(self):
+        RevocationList.revoke([self.session.id])
+        self.assertTrue(RevocationList.is_revoked(self.session.id))
+        
+        # Every access token of this session has expired by now
+        with override_settings(JWT_ACCESS_TOKEN_LIFETIME=-1):
+            RevocationList.revoke([self.session.id])
+        self.assertFalse(RevocationList.is_revoked(self.session.id))
\ No newline at end of file
@@ -0,0 +1,67 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.authentication.services import JWTService, RevocationList, SessionCache
+from apps.users.models import User
+
+CLIENT_IP = '127.0.0.1'
+
+
+@override_settings(JWT_AUTH_MODE='session')
+class SessionCacheTests(TestCase):
+    """A session stops authenticating as soon as it is invalidated, even mid-lookup"""
+    
+    def setUp(self):
+        cache.clear()
+        SessionCache._local.clear()
+        RevocationList._bloom = None
+        
+        self.user = User.objects.create_user('member@example.com', 'Cinemate-Session-2024', full_name='Member')
+        _, self.session = JWTService.create_login_session(self.user, CLIENT_IP)
+    
+    def resolve(self):
+        return SessionCache.resolve(self.session.id, self.user.id)
+    
+    def logout(self):
+        self.session.status = 'terminated'
+        self.session.session_end = timezone.now()
+        self.session.save()
+        SessionCache.invalidate_sessions([self.session.id])
+    
+    def test_cached_session_is_dropped_on_logout(self):
+        self.assertEqual(self.resolve(), self.user)
+        self.assertIsNotNone(cache.get(SessionCache.session_key(self.session.id)))
+        
+        self.logout()
+        
+        self.assertIsNone(cache.get(SessionCache.session_key(self.session.id)))
+        self.assertIsNone(self.resolve())
+    
+    def test_logout_during_lookup_is_not_overwritten(self):
+        validate_session = JWTService.validate_session
+        
+        def validate_then_logout(session_id):
+            # The session was read as active just before the logout committed
+            session = validate_session(session_id)
+            self.logout()
+            return session
+        
+        with mock.patch.object(JWTService, 'validate_session', side_effect=validate_then_logout):
+            self.assertIsNone(self.resolve())
+        
+        self.assertIsNone(cache.get(SessionCache.session_key(self.session.id)))
+        self.assertIsNone(self.resolve())
+    
+    def test_eviction_during_lookup_is_not_cached_locally(self):
+        load_session = SessionCache._load_session
+        
+        def load_then_evict(session_id):
+            entry = load_session(session_id)
+            SessionCache._evict({'user': str(self.user.id)})
+            return entry
+        
+        with mock.patch.object(SessionCache, '_load_session', side_effect=load_then_evict):
+            self.assertEqual(self.resolve(), self.user)
+        
+        self.assertIsNone(SessionCache._get_local(str(self.session.id)))
\ No newline at end of file
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.authentication.services import AuthRecordSweeper, JWTService, OTPService, RevocationList, SessionCache
+from apps.users.models import LoginSession, PasswordReset, User
+
+CLIENT_IP = '127.0.0.1'
+
+
+@override_settings(JWT_AUTH_MODE='session')
+class AuthRecordSweeperTests(TestCase):
+    """Stale sessions stop authenticating when swept, and rows are purged a retention period after they ended"""
+    
+    def setUp(self):
+        cache.clear()
+        SessionCache._local.clear()
+        RevocationList._bloom = None
+        
+        self.user = User.objects.create_user('member@example.com', 'Cinemate-Sweep-2024', full_name='Member')
+        self.sweeper = AuthRecordSweeper(batch_size=2, pause=0, session_retention_days=30, reset_retention_days=7)
+    
+    def create_session(self, **values):
+        _, session = JWTService.create_login_session(self.user, CLIENT_IP)
+        if values:
+            LoginSession.objects.filter(id=session.id).update(**values)
+        return session
+    
+    def create_reset(self, expires_at, **values):
+        reset = PasswordReset.objects.create(user=self.user, ip_address=CLIENT_IP, expires_at=expires_at)
+        if values:
+            PasswordReset.objects.filter(id=reset.id).update(**values)
+        return reset
+    
+    def days_ago(self, days):
+        return timezone.now() - timedelta(days=days)
+    
+    def test_expired_sessions_are_invalidated(self):
+        sessions = [self.create_session() for _ in range(3)]
+        for session in sessions:
+            self.assertEqual(SessionCache.resolve(session.id, self.user.id), self.user)
+        LoginSession.objects.update(refresh_token_expires_at=self.days_ago(1))
+        live = self.create_session()
+        
+        stats = self.sweeper.run()
+        
+        self.assertEqual(stats['expired_sessions'], 3)
+        for session in sessions:
+            session.refresh_from_db()
+            self.assertEqual(session.status, 'expired')
+            self.assertGreater(session.updated_at, self.days_ago(1))
+            self.assertIsNone(cache.get(SessionCache.session_key(session.id)))
+            self.assertIsNone(SessionCache._get_local(str(session.id)))
+            self.assertTrue(RevocationList.is_revoked(session.id))
+        
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'active')
+        self.assertFalse(RevocationList.is_revoked(live.id))
+    
+    def test_sessions_are_purged_after_retention_from_when_they_ended(self):
+        recently_ended = self.create_session(created_at=self.days_ago(60), updated_at=self.days_ago(60))
+        JWTService.terminate_user_sessions(self.user)
+        
+        long_ended = self.create_session(status='terminated', updated_at=self.days_ago(31))
+        long_expired = self.create_session(status='expired', updated_at=self.days_ago(31))
+        old_but_active = self.create_session(updated_at=self.days_ago(60))
+        
+        stats = self.sweeper.run()
+        
+        self.assertEqual(stats['deleted_sessions'], 2)
+        remaining = set(LoginSession.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {recently_ended.id, old_but_active.id})
+        self.assertNotIn(long_ended.id, remaining)
+        self.assertNotIn(long_expired.id, remaining)
+    
+    def test_password_resets_are_purged_after_retention(self):
+        recently_revoked = self.create_reset(self.days_ago(1), created_at=self.days_ago(30), updated_at=self.days_ago(30))
+        # Revokes the request above, so its retention starts now
+        pending = OTPService.create_password_reset(self.user, CLIENT_IP)[0]
+        long_completed = self.create_reset(self.days_ago(20), status='completed', updated_at=self.days_ago(8))
+        long_expired = self.create_reset(self.days_ago(8))
+        
+        stats = self.sweeper.run()
+        
+        self.assertEqual(stats['deleted_password_resets'], 2)
+        remaining = set(PasswordReset.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {recently_revoked.id, pending.id})
+        self.assertNotIn(long_completed.id, remaining)
+        self.assertNotIn(long_expired.id, remaining)
\ No newline at end of file
@@ -1,106 +1,171 @@
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.utils import timezone
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from apps.common.responses import success_response, error_response
+from apps.common.network import get_client_ip
 from apps.users.models import LoginSession, PasswordReset
 from .serializers import (
     LoginSerializer, SignupSerializer, ForgotPasswordSerializer,
     VerifyOTPSerializer, ChangePasswordSerializer, RefreshTokenSerializer
 )
-from .services import JWTService, OTPService
+from .hashing import PasswordHashingService, PasswordHashingBusy
+from .services import JWTService, OTPService, SessionCache
 
 User = get_user_model()
 
 
-class LoginView(APIView):
+class AsyncAPIView(View):
+    """Base for async JSON endpoints that cannot go through DRF's sync views"""
+    
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated API, exempt from CSRF like the DRF views
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+    
+    def get_request_data(self, request):
+        """Parse a JSON or form body, None if malformed"""
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return None
+            return data if isinstance(data, dict) else None
+        return request.POST
+    
+    def respond(self, response):
+        """Render a success_response/error_response outside DRF"""
+        return JsonResponse(response.data, status=response.status_code)
+    
+    def parse_error(self):
+        return self.respond(error_response(
+            "Malformed request body",
+            "PARSE_ERROR"
+        ))
+    
+    def busy_error(self):
+        return self.respond(error_response(
+            "Server is busy, please retry",
+            "SERVICE_BUSY",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        ))
+
+
+class LoginView(AsyncAPIView):
     """User login endpoint"""
-    permission_classes = [AllowAny]
     
-    def post(self, request):
-        serializer = LoginSerializer(data=request.data, context={'request': request})
+    async def post(self, request):
+        data = self.get_request_data(request)
+        if data is None:
+            return self.parse_error()
         
-        if serializer.is_valid():
-            user = serializer.validated_data['user']
-            ip_address = self.get_client_ip(request)
-            
-            # Create login session
-            access_token, session = JWTService.create_login_session(
-                user, ip_address, 
-                platform=request.data.get('platform', 'mobile-app'),
-                device_name=request.data.get('device_name')
+        serializer = LoginSerializer(data=data, context={'request': request})
+        
+        if not serializer.is_valid():
+            return self.respond(error_response(
+                "Invalid email or password",
+                "INVALID_CREDENTIALS",
+                serializer.errors,
+                status.HTTP_401_UNAUTHORIZED
+            ))
+        
+        email = serializer.validated_data['email']
+        password = serializer.validated_data['password']
+        
+        user = await User.objects.filter(email_address=email).afirst()
+        
+        # Verify in the hashing pool, also for unknown emails to keep timing uniform
+        try:
+            valid, upgraded_hash = await PasswordHashingService.averify_password(
+                password, user.password if user else None
             )
-            
-            # Update last login
-            user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
-            
-            return success_response({
-                "auth_token": access_token,
-                "user": {
-                    "id": str(user.id),
-                    "name": user.full_name,
-                    "email": user.email_address
-                }
-            }, "Login successful")
+        except PasswordHashingBusy:
+            return self.busy_error()
         
-        return error_response(
-            "Invalid email or password",
-            "INVALID_CREDENTIALS",
-            serializer.errors,
-            status.HTTP_401_UNAUTHORIZED
+        if not valid or not user.is_active:
+            return self.respond(error_response(
+                "Invalid email or password",
+                "INVALID_CREDENTIALS",
+                {"non_field_errors": ["Invalid credentials" if not valid else "Account is deactivated"]},
+                status.HTTP_401_UNAUTHORIZED
+            ))
+        
+        ip_address = get_client_ip(request)
+        
+        # Create login session
+        access_token, session = await sync_to_async(JWTService.create_login_session)(
+            user, ip_address, 
+            platform=data.get('platform', 'mobile-app'),
+            device_name=data.get('device_name')
         )
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        
+        # Update last login, upgrading the stored hash if the hasher settings changed
+        user.last_login = timezone.now()
+        update_fields = ['last_login']
+        if upgraded_hash:
+            user.password = upgraded_hash
+            update_fields.append('password')
+        await user.asave(update_fields=update_fields)
+        
+        return self.respond(success_response({
+            "auth_token": access_token,
+            "user": {
+                "id": str(user.id),
+                "name": user.full_name,
+                "email": user.email_address
+            }
+        }, "Login successful"))
 
 
-class SignupView(APIView):
+class SignupView(AsyncAPIView):
     """User signup endpoint"""
-    permission_classes = [AllowAny]
     
-    def post(self, request):
-        serializer = SignupSerializer(data=request.data)
+    async def post(self, request):
+        data = self.get_request_data(request)
+        if data is None:
+            return self.parse_error()
         
-        if serializer.is_valid():
-            user = serializer.save()
-            ip_address = self.get_client_ip(request)
-            
-            # Create login session
-            access_token, session = JWTService.create_login_session(
-                user, ip_address,
-                platform=request.data.get('platform', 'mobile-app'),
-                device_name=request.data.get('device_name')
+        serializer = SignupSerializer(data=data)
+        
+        if not await sync_to_async(serializer.is_valid)():
+            return self.respond(error_response(
+                "Validation failed",
+                "VALIDATION_ERROR",
+                serializer.errors
+            ))
+        
+        try:
+            password_hash = await PasswordHashingService.ahash_password(
+                serializer.validated_data['password']
             )
-            
-            return success_response({
-                "auth_token": access_token,
-                "user": {
-                    "id": str(user.id),
-                    "name": user.full_name,
-                    "email": user.email_address
-                }
-            }, "Account created successfully", status.HTTP_201_CREATED)
+        except PasswordHashingBusy:
+            return self.busy_error()
         
-        return error_response(
-            "Validation failed",
-            "VALIDATION_ERROR",
-            serializer.errors
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
+        ip_address = get_client_ip(request)
+        
+        # Create login session
+        access_token, session = await sync_to_async(JWTService.create_login_session)(
+            user, ip_address,
+            platform=data.get('platform', 'mobile-app'),
+            device_name=data.get('device_name')
         )
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        
+        return self.respond(success_response({
+            "auth_token": access_token,
+            "user": {
+                "id": str(user.id),
+                "name": user.full_name,
+                "email": user.email_address
+            }
+        }, "Account created successfully", status.HTTP_201_CREATED))
 
 
 class ForgotPasswordView(APIView):
@@ -113,7 +178,7 @@ class ForgotPasswordView(APIView):
         if serializer.is_valid():
             email = serializer.validated_data['email']
             user = User.objects.get(email_address=email)
-            ip_address = self.get_client_ip(request)
+            ip_address = get_client_ip(request)
             
             # Create password reset request
             reset_request, otp = OTPService.create_password_reset(user, ip_address)
@@ -127,14 +192,6 @@ class ForgotPasswordView(APIView):
             "VALIDATION_ERROR",
             serializer.errors
         )
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
 
 class VerifyOTPView(APIView):
@@ -199,7 +256,7 @@ class VerifyOTPView(APIView):
                 )
             
             # Verify IP address
-            if reset_request.ip_address != self.get_client_ip(request):
+            if reset_request.ip_address != get_client_ip(request):
                 return error_response(
                     "Invalid request source",
                     "INVALID_SOURCE"
@@ -225,14 +282,6 @@ class VerifyOTPView(APIView):
             "VALIDATION_ERROR",
             serializer.errors
         )
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
 
 class ChangePasswordView(APIView):
@@ -280,7 +329,14 @@ class ChangePasswordView(APIView):
             
             # Update user password
             user = reset_request.user
-            user.set_password(new_password)
+            try:
+                user.password = PasswordHashingService.hash_password(new_password)
+            except PasswordHashingBusy:
+                return error_response(
+                    "Server is busy, please retry",
+                    "SERVICE_BUSY",
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             user.save()
             
             # Mark request as completed
@@ -291,7 +347,7 @@ class ChangePasswordView(APIView):
             PasswordReset.objects.filter(
                 user=user,
                 status__in=['pending', 'verified']
-            ).exclude(id=reset_request.id).update(status='revoked')
+            ).exclude(id=reset_request.id).update(status='revoked', updated_at=timezone.now())
             
             return success_response(message="Password reset successfully")
         
@@ -382,6 +438,7 @@ class LogoutView(APIView):
             session.status = 'terminated'
             session.session_end = timezone.now()
             session.save()
+            SessionCache.invalidate_sessions([session.id])
             
             return success_response(message="Logged out successfully")
             
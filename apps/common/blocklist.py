@@ -0,0 +1,136 @@
+import time
+import ipaddress
+import threading
+import redis
+from django.db import DatabaseError
+from django.utils import timezone
+from django_redis import get_redis_connection
+from apps.users.models import IPBlacklist
+
+
+class CIDRTrie:
+    """Binary prefix trie of IP networks and the time each block ends
+    
+    One trie per address family. Nodes are [zero child, one child, blocked
+    until] lists, so a lookup walks at most 32 (IPv4) or 128 (IPv6) levels
+    and stops at the first missing branch.
+    """
+    
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = [None, None, None]
+        self.size = 0
+    
+    def insert(self, network, blocked_until):
+        node = self.root
+        value = int(network.network_address)
+        
+        for i in range(network.prefixlen):
+            bit = (value >> (self.bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        
+        # Overlapping rows for the same network keep the latest end
+        if node[2] is None:
+            self.size += 1
+        node[2] = max(node[2] or 0, blocked_until)
+    
+    def lookup(self, value, now):
+        """Time the address stays blocked until, None if it is not blocked"""
+        node = self.root
+        shift = self.bits - 1
+        
+        while node is not None:
+            if node[2] is not None and node[2] > now:
+                return node[2]
+            if shift < 0:
+                break
+            node = node[(value >> shift) & 1]
+            shift -= 1
+        
+        return None
+
+
+class IPBlocklist:
+    """In-process copy of the IPBlacklist table
+    
+    Rows are compiled into a CIDRTrie per address family, so checking a
+    client costs no network round trip. Writes to IPBlacklist bump VERSION_KEY
+    and a process rebuilds its tries when it sees a newer version. Rows are
+    loaded with their blocked_until and expire in place, without a reload.
+    """
+    
+    VERSION_KEY = 'ip_blacklist:version'
+    
+    _tries = None
+    _version = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def bump_version(cls):
+        """Tell every process to reload the blocklist"""
+        try:
+            get_redis_connection('default').incr(cls.VERSION_KEY)
+        except redis.RedisError as e:
+            print(f"IP blocklist version error: {e}")
+    
+    @classmethod
+    def blocked_until(cls, ip_address):
+        """Unix time until which the address is blocked, None if it is not"""
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except (ValueError, AttributeError):
+            return None
+        
+        # Treat IPv4-mapped IPv6 clients as their IPv4 address
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        
+        tries = cls._tries
+        if tries is None:
+            tries = cls.reload(cls._version)
+        
+        return tries[address.version].lookup(int(address), time.time())
+    
+    @classmethod
+    def ensure_version(cls, version):
+        """Reload when the shared version differs from the loaded one"""
+        if version != cls._version:
+            cls.reload(version)
+    
+    @classmethod
+    def reload(cls, version):
+        """Rebuild the tries from the database"""
+        with cls._lock:
+            if cls._tries is not None and version == cls._version:
+                return cls._tries
+            
+            tries = {4: CIDRTrie(32), 6: CIDRTrie(128)}
+            loaded = True
+            
+            try:
+                rows = IPBlacklist.objects.filter(
+                    blocked_until__gt=timezone.now()
+                ).values_list('ip_address', 'prefix_length', 'blocked_until')
+                
+                for ip_address, prefix_length, blocked_until in rows.iterator(chunk_size=5000):
+                    # Only the admin validates rows, skip one that was written malformed
+                    try:
+                        network = IPBlacklist.build_network(ip_address, prefix_length)
+                    except ValueError as e:
+                        print(f"IP blocklist skipped {ip_address}/{prefix_length}: {e}")
+                        continue
+                    tries[network.version].insert(network, blocked_until.timestamp())
+            except DatabaseError as e:
+                print(f"IP blocklist load error: {e}")
+                if cls._tries is not None:
+                    # Keep serving the current tries and retry on the next version check
+                    return cls._tries
+                loaded = False
+            
+            # Swap in whole so concurrent lookups never see a partial trie
+            cls._tries = tries
+            if loaded:
+                cls._version = version
+            return tries
\ No newline at end of file
@@ -0,0 +1,13 @@
+import hashlib
+
+
+def hash_positions(item, count, size):
+    """count positions in range(size) for a string, as used by Bloom filters and sketches
+    
+    Double hashing: position i is h1 + i * h2, from the two halves of one
+    digest. h2 is odd so the positions do not collapse onto one another.
+    """
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'big')
+    h2 = int.from_bytes(digest[8:], 'big') | 1
+    return [(h1 + i * h2) % size for i in range(count)]
\ No newline at end of file
@@ -0,0 +1,197 @@
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+import redis
+import requests
+from django.conf import settings
+from django_redis import get_redis_connection
+from django_redis.client import DefaultClient
+from apps.common.timing import record
+
+
+class Metrics:
+    """Prometheus counters and histograms shared by every worker process
+    
+    Observations are added up in process memory and flushed to one Redis
+    hash at most every METRICS_FLUSH_INTERVAL seconds, with HINCRBYFLOAT
+    so concurrent flushes from other processes add up. A request pays no
+    round trip of its own; a crashed process loses its last interval.
+    """
+    
+    KEY = 'metrics'
+    
+    # Seconds, shared by every latency histogram
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    
+    HELP = {
+        'http_request_duration_seconds': ('histogram', 'Time to answer a request, by route'),
+        'upstream_request_duration_seconds': ('histogram', 'Time of calls to upstream APIs, by host'),
+        'upstream_errors_total': ('counter', 'Failed calls to upstream APIs, by host and reason'),
+        'cache_requests_total': ('counter', 'Cache reads by key family and result'),
+        'rate_limit_rejections_total': ('counter', 'Requests rejected by rate limiting, by reason'),
+        'auth_cache_lookups_total': ('counter', 'Session lookups by the level that answered them'),
+    }
+    
+    _buffer = {}
+    _flushed_at = time.monotonic()
+    _lock = threading.Lock()
+    
+    @classmethod
+    def inc(cls, name, labels, amount=1):
+        cls._add(cls._field(name, labels), amount)
+    
+    @classmethod
+    def observe(cls, name, labels, value):
+        """Add a value to a histogram, one bucket field plus sum and count"""
+        bucket = next((str(b) for b in cls.BUCKETS if value <= b), '+Inf')
+        cls._add(cls._field(name, labels, 'bucket', bucket), 1)
+        cls._add(cls._field(name, labels, 'sum'), value)
+        cls._add(cls._field(name, labels, 'count'), 1)
+    
+    @staticmethod
+    def _field(name, labels, kind='', bucket=''):
+        return json.dumps([name, labels, kind, bucket], sort_keys=True)
+    
+    @classmethod
+    def _add(cls, field, amount):
+        with cls._lock:
+            cls._buffer[field] = cls._buffer.get(field, 0) + amount
+    
+    @classmethod
+    def maybe_flush(cls):
+        if time.monotonic() - cls._flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            cls.flush()
+    
+    @classmethod
+    def flush(cls):
+        """Add this process's observations to the shared hash"""
+        with cls._lock:
+            buffer, cls._buffer = cls._buffer, {}
+            cls._flushed_at = time.monotonic()
+        
+        if not buffer:
+            return
+        
+        try:
+            pipe = get_redis_connection('default').pipeline(transaction=False)
+            for field, amount in buffer.items():
+                pipe.hincrbyfloat(cls.KEY, field, amount)
+            pipe.execute()
+        except redis.RedisError as e:
+            # Dropped rather than kept, so an outage cannot grow the buffer
+            print(f"Metrics flush error: {e}")
+    
+    @classmethod
+    def render(cls, gauges=()):
+        """All metrics in the Prometheus text format
+        
+        gauges are extra (name, help, value) samples computed at scrape time.
+        """
+        cls.flush()
+        stored = get_redis_connection('default').hgetall(cls.KEY)
+        
+        series = {}
+        for field, value in stored.items():
+            name, labels, kind, bucket = json.loads(field)
+            series.setdefault(name, {}).setdefault(
+                json.dumps(labels, sort_keys=True), {}
+            )[(kind, bucket)] = float(value)
+        
+        lines = []
+        for name in sorted(series):
+            metric_type, help_text = cls.HELP.get(name, ('untyped', ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            
+            for labels_json, values in sorted(series[name].items()):
+                labels = json.loads(labels_json)
+                if metric_type == 'histogram':
+                    # Buckets are stored one by one and reported cumulatively
+                    cumulative = 0
+                    for bucket in [str(b) for b in cls.BUCKETS] + ['+Inf']:
+                        cumulative += values.get(('bucket', bucket), 0)
+                        lines.append(f"{name}_bucket{cls._labels(dict(labels, le=bucket))} {cls._number(cumulative)}")
+                    lines.append(f"{name}_sum{cls._labels(labels)} {values.get(('sum', ''), 0)}")
+                    lines.append(f"{name}_count{cls._labels(labels)} {cls._number(values.get(('count', ''), 0))}")
+                else:
+                    lines.append(f"{name}{cls._labels(labels)} {cls._number(values.get(('', ''), 0))}")
+        
+        for name, help_text, value in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {cls._number(value)}")
+        
+        return '\n'.join(lines) + '\n'
+    
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        
+        pairs = ','.join(f'{key}="{escape(value)}"' for key, value in sorted(labels.items()))
+        return '{' + pairs + '}'
+    
+    @staticmethod
+    def _number(value):
+        return str(int(value)) if float(value).is_integer() else str(value)
+
+
+_WORD = re.compile(r'^[a-z]+$')
+
+
+def cache_family(key):
+    """Family of a cache key for metrics, e.g. tmdb_movie for tmdb_movie_550_base
+    
+    The first two alphabetic words, so ids and queries never become labels.
+    """
+    words = []
+    for word in key.split('_'):
+        if not _WORD.match(word) or len(words) == 2:
+            break
+        words.append(word)
+    return '_'.join(words) or 'other'
+
+
+class MetricsCacheClient(DefaultClient):
+    """django-redis client counting cache hits and misses per key family"""
+    
+    _missing = object()
+    
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=self._missing, version=version, client=client)
+        hit = value is not self._missing
+        Metrics.inc('cache_requests_total', {'family': cache_family(str(key)), 'result': 'hit' if hit else 'miss'})
+        return value if hit else default
+    
+    def get_many(self, keys, version=None, client=None):
+        found = super().get_many(keys, version=version, client=client)
+        for key in keys:
+            result = 'hit' if key in found else 'miss'
+            Metrics.inc('cache_requests_total', {'family': cache_family(str(key)), 'result': result})
+        return found
+
+
+@contextmanager
+def upstream_call(host):
+    """Time a call to an upstream host, for Server-Timing and the metrics
+    
+    Exceptions raised in the block are counted as errors, by HTTP status
+    or exception type.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        response = getattr(e, 'response', None)
+        reason = str(response.status_code) if isinstance(e, requests.HTTPError) and response is not None else type(e).__name__
+        Metrics.inc('upstream_errors_total', {'host': host, 'reason': reason})
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        record(host, elapsed)
+        Metrics.observe('upstream_request_duration_seconds', {'host': host}, elapsed)
\ No newline at end of file
@@ -1,79 +1,420 @@
+import re
+import json
+import math
 import time
 import hashlib
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import parse_qsl, urlencode
+import redis
 from django.conf import settings
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.db import DatabaseError, connections
+from django.dispatch import Signal
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
+from django_redis import get_redis_connection
 from apps.common.responses import error_response
+from apps.authentication.services import JWTService
+from apps.common.blocklist import IPBlocklist
+from apps.common.hashing import hash_positions
+from apps.common.metrics import Metrics
+from apps.common.network import get_client_ip, is_auto_blockable
+from apps.common.timing import RequestTimings, db_execute_wrapper
+from apps.users.models import IPBlacklist
+
+timing_logger = logging.getLogger('cinemate.timing')
+
+
+class RateLimiter:
+    """Token-bucket rate limiting with one Redis round trip per request
+    
+    The blacklist lookup, bucket refill and token spend run in a single Lua
+    script, so concurrent requests are counted exactly and a bucket refills
+    continuously instead of resetting at window boundaries.
+    """
+    
+    # KEYS[1] is the client's blacklist key, KEYS[2] the IPBlacklist version
+    # and KEYS[3] the bucket (absent when the route is not limited). Returns
+    # {allowed, remaining, retry after ms, version} with allowed -1 for a
+    # blacklisted client. The version rides along so processes notice
+    # blocklist changes without a round trip of their own.
+    SCRIPT = """
+    local version = redis.call('GET', KEYS[2])
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        return {-1, 0, math.max(redis.call('PTTL', KEYS[1]), 0), version}
+    end
+    if #KEYS == 2 then
+        return {1, 0, 0, version}
+    end
+    
+    local capacity = tonumber(ARGV[1])
+    local window_ms = tonumber(ARGV[2])
+    local block_seconds = tonumber(ARGV[3])
+    
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    
+    local bucket = redis.call('HMGET', KEYS[3], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(now - last, 0) * capacity / window_ms)
+    
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = math.ceil((1 - tokens) * window_ms / capacity)
+        if block_seconds > 0 then
+            redis.call('SET', KEYS[1], 1, 'EX', block_seconds)
+            retry_after = block_seconds * 1000
+        end
+    end
+    
+    redis.call('HSET', KEYS[3], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[3], window_ms)
+    return {allowed, math.floor(tokens), retry_after, version}
+    """
+    
+    def __init__(self, rules=None):
+        self.redis = get_redis_connection('default')
+        self._check = self.redis.register_script(self.SCRIPT)
+        self.rules = [
+            dict(rule, pattern=re.compile(rule['pattern']))
+            for rule in (settings.RATE_LIMIT_RULES if rules is None else rules)
+        ]
+    
+    def get_rule(self, path, method):
+        """First configured rule matching the request, None if unlimited"""
+        for rule in self.rules:
+            if rule.get('methods') and method not in rule['methods']:
+                continue
+            if rule['pattern'].search(path):
+                return rule if rule.get('requests') else None
+        return None
+    
+    def check(self, ip_address, path, method, user_id=None):
+        """Check the blacklist and spend a token, returning (allowed, limit, remaining, retry_after)
+        
+        allowed is None when the client is blacklisted. Buckets are per rule,
+        client, path and method. Authenticated callers get their own bucket
+        when the matching rule sets user_requests.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        limit = self.queue(pipe, ip_address, path, method, user_id)
+        return self.parse(pipe.execute()[0], limit)
+    
+    def queue(self, pipe, ip_address, path, method, user_id=None):
+        """Add the check to a pipeline, returning the limit that applies"""
+        keys = [cache.make_key(f"blacklist:{ip_address}"), IPBlocklist.VERSION_KEY]
+        args = []
+        limit = None
+        rule = self.get_rule(path, method)
+        
+        if rule:
+            if user_id and rule.get('user_requests'):
+                limit = rule['user_requests']
+                identity = f"user:{user_id}"
+                block_duration = 0  # never block a shared IP for one user's burst
+            else:
+                limit = rule['requests']
+                identity = f"ip:{ip_address}"
+                block_duration = rule.get('block_duration', settings.RATE_LIMIT_BLOCK_DURATION)
+                if not is_auto_blockable(ip_address):
+                    block_duration = 0  # only throttle proxies and internal addresses
+            
+            # One bucket per endpoint, so e.g. refreshing tokens never uses up logins
+            keys.append(f"rate_limit:{rule['name']}:{identity}:{method}:{path}")
+            args = [limit, rule['window'] * 1000, block_duration]
+        
+        self._check(keys=keys, args=args, client=pipe)
+        return limit
+    
+    def parse(self, result, limit):
+        """Turn a queued check's result into (allowed, limit, remaining, retry_after)"""
+        allowed, remaining, retry_after_ms, version = result
+        IPBlocklist.ensure_version(version)
+        
+        return (
+            None if allowed == -1 else bool(allowed),
+            limit,
+            remaining,
+            math.ceil(retry_after_ms / 1000)
+        )
+
+
+class HeavyHitterDetector:
+    """Streaming detection of clients sending an outsized share of requests
+    
+    Each window of HEAVY_HITTER_WINDOW seconds has a count-min sketch of
+    requests per subject (client IP and token subject) and a sorted set of
+    its top HEAVY_HITTER_TOP_K subjects, both in Redis. Memory per window is
+    fixed by the sketch dimensions and K, whatever the number of clients.
+    Since subjects are counted across all paths, a client rotating URLs is
+    caught as well. A subject is flagged once per window when its estimate
+    reaches HEAVY_HITTER_THRESHOLD.
+    """
+    
+    # KEYS are the window's sketch, top-K set and flagged set. ARGV holds the
+    # sketch width, depth, K, threshold and TTL, then for each subject its
+    # name followed by one sketch column per row. Returns the newly flagged
+    # subjects and their estimates.
+    SCRIPT = """
+    local width = tonumber(ARGV[1])
+    local depth = tonumber(ARGV[2])
+    local top_k = tonumber(ARGV[3])
+    local threshold = tonumber(ARGV[4])
+    local ttl = tonumber(ARGV[5])
+    local flagged = {}
+    
+    local i = 6
+    while i <= #ARGV do
+        local subject = ARGV[i]
+        local estimate = nil
+        
+        for row = 0, depth - 1 do
+            local offset = row * width + tonumber(ARGV[i + 1 + row])
+            local count = redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'SAT', 'INCRBY', 'u32', '#' .. offset, 1)[1]
+            if estimate == nil or count < estimate then
+                estimate = count
+            end
+        end
+        i = i + 1 + depth
+        
+        if redis.call('ZSCORE', KEYS[2], subject) or redis.call('ZCARD', KEYS[2]) < top_k then
+            redis.call('ZADD', KEYS[2], estimate, subject)
+        else
+            local lowest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+            if estimate > tonumber(lowest[2]) then
+                redis.call('ZREM', KEYS[2], lowest[1])
+                redis.call('ZADD', KEYS[2], estimate, subject)
+            end
+        end
+        
+        if estimate >= threshold and redis.call('SADD', KEYS[3], subject) == 1 then
+            table.insert(flagged, subject)
+            table.insert(flagged, estimate)
+        end
+    end
+    
+    for _, key in ipairs(KEYS) do
+        redis.call('EXPIRE', key, ttl)
+    end
+    return flagged
+    """
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self._record = self.redis.register_script(self.SCRIPT)
+        self.window = settings.HEAVY_HITTER_WINDOW
+        self.width = settings.HEAVY_HITTER_SKETCH_WIDTH
+        self.depth = settings.HEAVY_HITTER_SKETCH_DEPTH
+    
+    def window_keys(self, window):
+        prefix = f"heavy_hitters:{window}"
+        return [f"{prefix}:sketch", f"{prefix}:top", f"{prefix}:flagged"]
+    
+    def columns(self, subject):
+        """The column of a subject in each row of the sketch"""
+        return hash_positions(subject, self.depth, self.width)
+    
+    def queue(self, pipe, subjects):
+        """Add counting a request by each subject to a pipeline"""
+        args = [
+            self.width,
+            self.depth,
+            settings.HEAVY_HITTER_TOP_K,
+            settings.HEAVY_HITTER_THRESHOLD,
+            self.window * settings.HEAVY_HITTER_HISTORY
+        ]
+        for subject in subjects:
+            args.append(subject)
+            args.extend(self.columns(subject))
+        
+        window = int(time.time()) // self.window
+        self._record(keys=self.window_keys(window), args=args, client=pipe)
+    
+    def parse(self, result):
+        """Newly flagged subjects of a queued count as {subject: estimate}"""
+        return {
+            subject.decode(): int(estimate)
+            for subject, estimate in zip(result[::2], result[1::2])
+        }
+    
+    def block(self, ip_address, estimate):
+        """Add an automatic IPBlacklist entry for a flagged address, unless it may not be blocked"""
+        if not is_auto_blockable(ip_address):
+            return
+        
+        IPBlacklist.objects.create(
+            ip_address=ip_address,
+            reason=f"Automatic: about {estimate} requests within {self.window} seconds",
+            blocked_until=timezone.now() + timedelta(seconds=settings.HEAVY_HITTER_BLOCK_DURATION)
+        )
+    
+    def report(self, windows=5):
+        """Top subjects of the most recent windows, newest first"""
+        current = int(time.time()) // self.window
+        pipe = self.redis.pipeline(transaction=False)
+        
+        for window in range(current, current - windows, -1):
+            _, top_key, flagged_key = self.window_keys(window)
+            pipe.zrevrange(top_key, 0, -1, withscores=True)
+            pipe.smembers(flagged_key)
+        
+        results = pipe.execute()
+        report = []
+        
+        for index, window in enumerate(range(current, current - windows, -1)):
+            top, flagged = results[2 * index], results[2 * index + 1]
+            subjects = []
+            
+            for subject, estimate in top:
+                kind, _, value = subject.decode().partition(':')
+                subjects.append({
+                    "type": kind,
+                    "value": value,
+                    "estimate": int(estimate),
+                    "flagged": subject in flagged
+                })
+            
+            report.append({
+                "window_start": datetime.fromtimestamp(window * self.window, tz=dt_timezone.utc).isoformat(),
+                "subjects": subjects
+            })
+        
+        return report
 
 
 class RateLimitMiddleware(MiddlewareMixin):
-    """Rate limiting middleware based on IP address and endpoint"""
+    """Rate limiting middleware based on per-route rules, keyed by user or IP address"""
+    
+    limiter = None
+    detector = None
     
     def process_request(self, request):
         if not settings.RATE_LIMIT_ENABLE:
             return None
-            
-        ip_address = self.get_client_ip(request)
-        path = request.path_info
-        method = request.method
+        
+        if RateLimitMiddleware.limiter is None:
+            RateLimitMiddleware.limiter = RateLimiter()
+            RateLimitMiddleware.detector = HeavyHitterDetector()
+        
+        ip_address = get_client_ip(request)
+        
+        # Blocked addresses and networks are answered from memory
+        blocked_until = IPBlocklist.blocked_until(ip_address)
+        if blocked_until:
+            return self.blocked_response(math.ceil(blocked_until - time.time()), 'blocked')
+        
+        user_id = self.get_user_id(request)
+        
+        subjects = [f"ip:{ip_address}"]
+        if user_id:
+            subjects.append(f"user:{user_id}")
+        
+        # Rate limit check and heavy-hitter counting share one round trip
+        try:
+            pipe = self.limiter.redis.pipeline(transaction=False)
+            limit = self.limiter.queue(pipe, ip_address, request.path_info, request.method, user_id)
+            self.detector.queue(pipe, subjects)
+            limit_result, detector_result = pipe.execute()
+        except redis.RedisError as e:
+            # Fail open rather than take the API down with Redis
+            print(f"Rate limit error: {e}")
+            return None
+        
+        allowed, limit, remaining, retry_after = self.limiter.parse(limit_result, limit)
+        
+        flagged = self.detector.parse(detector_result)
+        if flagged:
+            self.handle_heavy_hitters(flagged)
+            if f"ip:{ip_address}" in flagged and is_auto_blockable(ip_address):
+                return self.blocked_response(settings.HEAVY_HITTER_BLOCK_DURATION, 'heavy_hitter')
         
         # Check if IP is blacklisted
-        if self.is_ip_blacklisted(ip_address):
-            return JsonResponse(
+        if allowed is None:
+            return self.blocked_response(retry_after, 'blocked')
+        
+        if limit is None:
+            return None
+        
+        if not allowed:
+            rule = self.limiter.get_rule(request.path_info, request.method)
+            Metrics.inc('rate_limit_rejections_total', {'reason': 'rate_limited', 'rule': rule['name']})
+            response = JsonResponse(
                 error_response(
-                    "IP address is temporarily blocked",
-                    "IP_BLOCKED",
+                    f"Rate limit exceeded. Max {limit} requests per {rule['window']} seconds",
+                    "RATE_LIMIT_EXCEEDED",
                     status_code=429
                 ).data,
                 status=429
             )
+            response['Retry-After'] = str(retry_after)
+            response['X-RateLimit-Limit'] = str(limit)
+            response['X-RateLimit-Remaining'] = '0'
+            return response
         
-        # Define rate limits for different endpoints
-        rate_limits = self.get_rate_limits(path)
-        
-        if rate_limits:
-            key = f"rate_limit:{ip_address}:{path}:{method}"
-            
-            # Get current request count
-            current_requests = cache.get(key, 0)
-            
-            if current_requests >= rate_limits['requests']:
-                # Block IP temporarily if too many requests
-                self.block_ip_temporarily(ip_address, 300)  # 5 minutes
-                return JsonResponse(
-                    error_response(
-                        f"Rate limit exceeded. Max {rate_limits['requests']} requests per {rate_limits['window']} seconds",
-                        "RATE_LIMIT_EXCEEDED",
-                        status_code=429
-                    ).data,
-                    status=429
-                )
-            
-            # Increment counter
-            cache.set(key, current_requests + 1, rate_limits['window'])
-        
+        request.rate_limit = (limit, remaining)
         return None
     
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
-    def get_rate_limits(self, path):
-        """Define rate limits for different endpoint patterns"""
-        if '/auth/' in path:
-            return {'requests': 5, 'window': 60}  # 5 requests per minute
-        elif '/movies/search' in path:
-            return None  # No rate limiting for search
-        elif '/movies/' in path:
-            return {'requests': 100, 'window': 60}  # 100 requests per minute
-        elif '/profile/' in path:
-            return {'requests': 50, 'window': 60}  # 50 requests per minute
-        return None
+    def process_response(self, request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit:
+            response['X-RateLimit-Limit'] = str(rate_limit[0])
+            response['X-RateLimit-Remaining'] = str(rate_limit[1])
+        return response
+    
+    def handle_heavy_hitters(self, flagged):
+        """Block flagged addresses, token subjects are left to the admin report"""
+        for subject, estimate in flagged.items():
+            kind, _, value = subject.partition(':')
+            print(f"Heavy hitter {subject}: about {estimate} requests in {self.detector.window}s")
+            
+            if kind == 'ip':
+                if not is_auto_blockable(value):
+                    print(f"Heavy hitter {value} is a proxy or internal address, not blocked")
+                    continue
+                
+                # Takes effect at once, the blacklist row reaches the tries on the next version check
+                self.block_ip_temporarily(value, settings.HEAVY_HITTER_BLOCK_DURATION)
+                try:
+                    self.detector.block(value, estimate)
+                except DatabaseError as e:
+                    print(f"Heavy hitter block error: {e}")
+    
+    def blocked_response(self, retry_after, reason):
+        Metrics.inc('rate_limit_rejections_total', {'reason': reason, 'rule': ''})
+        response = JsonResponse(
+            error_response(
+                "IP address is temporarily blocked",
+                "IP_BLOCKED",
+                status_code=429
+            ).data,
+            status=429
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+    
+    def get_user_id(self, request):
+        """User id from a valid bearer access token, without touching the database"""
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+        
+        try:
+            payload = JWTService.decode_token(auth_header.split(' ')[1])
+        except (ValueError, IndexError):
+            return None
+        
+        if payload.get('type') != 'access_token':
+            return None
+        return payload.get('user_id')
     
     def is_ip_blacklisted(self, ip_address):
         """Check if IP is in blacklist"""
@@ -81,4 +422,229 @@ class RateLimitMiddleware(MiddlewareMixin):
     
     def block_ip_temporarily(self, ip_address, duration):
         """Temporarily block an IP address"""
-        cache.set(f"blacklist:{ip_address}", True, duration)
\ No newline at end of file
+        cache.set(f"blacklist:{ip_address}", True, duration)
+
+
+# Sent when a cached response is served, with request and resolver_match, so
+# side effects of the skipped view (e.g. counting a movie view) still happen
+response_cache_hit = Signal()
+
+
+class ResponseCache:
+    """Rendered responses to anonymous requests, kept in Redis
+    
+    Entries are keyed by the data version and a digest of the normalized
+    path and query. Bumping VERSION_KEY retires every entry at once, and old
+    entries run out on their TTL.
+    """
+    
+    VERSION_KEY = 'response_cache:version'
+    
+    # KEYS[1] is the version. ARGV[1] is the entry key prefix and ARGV[2] the
+    # request digest. Returns {version, body, content type}, body nil on a
+    # miss. The entry key depends on the version so it is built here;
+    # fine on a single Redis, not on a cluster.
+    SCRIPT = """
+    local version = redis.call('GET', KEYS[1]) or '0'
+    local entry = redis.call('HMGET', ARGV[1] .. version .. ':' .. ARGV[2], 'body', 'content_type')
+    return {version, entry[1], entry[2]}
+    """
+    
+    PREFIX = 'response_cache:'
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self._lookup = self.redis.register_script(self.SCRIPT)
+    
+    @staticmethod
+    def digest(request):
+        """Digest of the path and query, with parameters in a fixed order"""
+        query = urlencode(sorted(parse_qsl(request.META.get('QUERY_STRING', ''), keep_blank_values=True)))
+        return hashlib.sha256(f"{request.path_info}?{query}".encode()).hexdigest()
+    
+    def get(self, digest):
+        """Get (version, body, content type), body None on a miss"""
+        version, body, content_type = self._lookup(keys=[self.VERSION_KEY], args=[self.PREFIX, digest])
+        if body is None or content_type is None:
+            return version.decode(), None, None
+        return version.decode(), body, content_type.decode()
+    
+    def set(self, version, digest, body, content_type, ttl):
+        key = f"{self.PREFIX}{version}:{digest}"
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, mapping={'body': body, 'content_type': content_type})
+        pipe.expire(key, ttl)
+        pipe.execute()
+    
+    @classmethod
+    def bump_version(cls):
+        """Retire every cached response"""
+        try:
+            get_redis_connection('default').incr(cls.VERSION_KEY)
+        except redis.RedisError as e:
+            print(f"Response cache version error: {e}")
+
+
+class ResponseCacheMiddleware(MiddlewareMixin):
+    """Serve public routes to anonymous callers from ResponseCache
+    
+    Routes are chosen by URL name in RESPONSE_CACHE_RULES. A hit is answered
+    here, without running DRF. Responses on those routes carry Cache-Control
+    and Vary: Authorization, so a CDN may cache the anonymous ones.
+    """
+    
+    response_cache = None
+    
+    def process_request(self, request):
+        if not settings.RESPONSE_CACHE_ENABLE or request.method not in ('GET', 'HEAD'):
+            return None
+        
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        
+        ttl = settings.RESPONSE_CACHE_RULES.get(match.url_name)
+        if ttl is None:
+            return None
+        
+        request.response_cache_ttl = ttl
+        if request.META.get('HTTP_AUTHORIZATION'):
+            return None
+        
+        if ResponseCacheMiddleware.response_cache is None:
+            ResponseCacheMiddleware.response_cache = ResponseCache()
+        
+        digest = ResponseCache.digest(request)
+        
+        try:
+            version, body, content_type = self.response_cache.get(digest)
+        except redis.RedisError as e:
+            print(f"Response cache error: {e}")
+            return None
+        
+        if body is None:
+            Metrics.inc('cache_requests_total', {'family': 'response_cache', 'result': 'miss'})
+            request.response_cache_entry = (version, digest)
+            return None
+        
+        Metrics.inc('cache_requests_total', {'family': 'response_cache', 'result': 'hit'})
+        response_cache_hit.send(sender=ResponseCacheMiddleware, request=request, resolver_match=match)
+        
+        response = HttpResponse(body, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+        return self.add_headers(response, ttl, public=True)
+    
+    def process_response(self, request, response):
+        ttl = getattr(request, 'response_cache_ttl', None)
+        if ttl is None or response.has_header('X-Cache'):
+            return response
+        
+        entry = getattr(request, 'response_cache_entry', None)
+        if entry is None:
+            return self.add_headers(response, ttl, public=False)
+        
+        if (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            version, digest = entry
+            try:
+                self.response_cache.set(version, digest, response.content, response['Content-Type'], ttl)
+            except redis.RedisError as e:
+                print(f"Response cache error: {e}")
+        
+        response['X-Cache'] = 'MISS'
+        return self.add_headers(response, ttl, public=response.status_code == 200)
+    
+    def add_headers(self, response, ttl, public):
+        if public:
+            patch_cache_control(response, public=True, max_age=ttl)
+        else:
+            patch_cache_control(response, private=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    """Time spent on the database, Redis and each upstream host per request
+    
+    Sent as a Server-Timing header and logged as one JSON line to the
+    cinemate.timing logger. Durations of calls made in parallel add up, so
+    they can exceed the total. Collecting costs two clock reads per call.
+    """
+    
+    def process_request(self, request):
+        if not settings.SERVER_TIMING_ENABLE:
+            return None
+        
+        # Wrappers stay installed, they only record while a request is active
+        for connection in connections.all():
+            if db_execute_wrapper not in connection.execute_wrappers:
+                connection.execute_wrappers.append(db_execute_wrapper)
+        
+        request.timings = RequestTimings()
+        RequestTimings.activate(request.timings)
+        return None
+    
+    def process_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is None:
+            return response
+        
+        RequestTimings.activate(None)
+        total = timings.total()
+        metrics = sorted(timings.metrics.items())
+        
+        entries = [
+            f'{name};dur={seconds * 1000:.1f};desc="{count} call{"" if count == 1 else "s"}"'
+            for name, (count, seconds) in metrics
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response['Server-Timing'] = ', '.join(entries)
+        
+        timing_logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path_info,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "timings": {
+                name: {"count": count, "ms": round(seconds * 1000, 1)}
+                for name, (count, seconds) in metrics
+            }
+        }))
+        return response
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Request latency histogram by route, method and status
+    
+    Routes are URL names, so ids in paths never become labels. Rejected
+    requests that never reached a view are resolved here to label them.
+    """
+    
+    def process_request(self, request):
+        request.metrics_started = time.perf_counter()
+        return None
+    
+    def process_response(self, request, response):
+        started = getattr(request, 'metrics_started', None)
+        if started is None:
+            return response
+        
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                pass
+        
+        Metrics.observe('http_request_duration_seconds', {
+            'route': (match.url_name or 'unnamed') if match else 'unmatched',
+            'method': request.method,
+            'status': str(response.status_code),
+        }, time.perf_counter() - started)
+        Metrics.maybe_flush()
+        return response
\ No newline at end of file
@@ -0,0 +1,74 @@
+import ipaddress
+from django.conf import settings
+
+# (TRUSTED_PROXIES, parsed networks), re-parsed when the setting changes
+_trusted = ((), [])
+# Whether this process has warned about X-Forwarded-For without TRUSTED_PROXIES
+_warned_untrusted_forwarding = False
+
+
+def trusted_proxies():
+    """TRUSTED_PROXIES as ip_network objects"""
+    global _trusted
+    configured = tuple(settings.TRUSTED_PROXIES)
+    if _trusted[0] != configured:
+        _trusted = (configured, [ipaddress.ip_network(network.strip(), strict=False) for network in configured])
+    return _trusted[1]
+
+
+def is_trusted_proxy(ip):
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies())
+
+
+def is_auto_blockable(ip):
+    """Whether an address may be blocked automatically
+    
+    Trusted proxies, private, loopback, link-local and reserved addresses
+    are usually shared by many clients, e.g. a load balancer when
+    TRUSTED_PROXIES is not set, and blocking one could take the site down.
+    """
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    
+    if not address.is_global or address.is_multicast:
+        return False
+    return not any(address in network for network in trusted_proxies())
+
+
+def get_client_ip(request):
+    """Address of the client that sent a request
+    
+    X-Forwarded-For is only read when the request comes from one of
+    TRUSTED_PROXIES, and then from the right: the right-most hop that is not
+    a trusted proxy is the client. Hops further left were sent by the client
+    and may be forged. Without trusted proxies this is REMOTE_ADDR.
+    """
+    global _warned_untrusted_forwarding
+    remote_addr = request.META.get('REMOTE_ADDR')
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if not x_forwarded_for:
+        return remote_addr
+    
+    if not is_trusted_proxy(remote_addr):
+        # Most likely a proxy that is missing from the setting
+        if not settings.TRUSTED_PROXIES and not _warned_untrusted_forwarding:
+            _warned_untrusted_forwarding = True
+            print(
+                f"X-Forwarded-For received from {remote_addr} but TRUSTED_PROXIES is empty, every client "
+                f"is identified as the connecting address. Set TRUSTED_PROXIES when behind a reverse proxy."
+            )
+        return remote_addr
+    
+    hops = [hop.strip() for hop in x_forwarded_for.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else remote_addr
\ No newline at end of file
@@ -1,3 +1,12 @@
+import json
+import uuid
+import base64
+import binascii
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from django.db.models import Q
+from rest_framework import serializers
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
@@ -20,4 +29,129 @@ class CustomPagination(PageNumberPagination):
                     'has_previous': self.page.has_previous(),
                 }
             }
-        })
\ No newline at end of file
+        })
+
+class PaginationQuerySerializer(serializers.Serializer):
+    """Serializer for pagination query parameters"""
+    page = serializers.IntegerField(default=1, min_value=1)
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=50)
+
+
+class CursorPaginationQuerySerializer(PaginationQuerySerializer):
+    """Serializer for pagination query parameters with an optional keyset cursor"""
+    cursor = serializers.CharField(required=False, allow_blank=True)
+
+
+class KeysetPaginator:
+    """Cursor pagination over (created_at, id), newest first
+    
+    Each page is a single index range scan of limit + 1 rows, so the cost
+    does not grow with depth and no COUNT(*) is needed.
+    """
+    
+    def __init__(self, queryset, limit):
+        self.queryset = queryset.order_by('-created_at', '-id')
+        self.limit = limit
+    
+    @staticmethod
+    def encode_cursor(obj):
+        """Encode the position of a row as an opaque cursor"""
+        position = json.dumps([obj.created_at.isoformat(), str(obj.id)])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into (created_at, id), raising ValueError if malformed"""
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = datetime.fromisoformat(created_at)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError, AttributeError, binascii.Error):
+            raise ValueError("Invalid cursor")
+        return created_at, pk
+    
+    def page(self, cursor=None):
+        """Get the rows after a cursor and the cursor of the next page"""
+        queryset = self.queryset
+        
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        
+        items = list(queryset[:self.limit + 1])
+        has_next = len(items) > self.limit
+        items = items[:self.limit]
+        
+        next_cursor = self.encode_cursor(items[-1]) if has_next else None
+        return items, next_cursor
+
+
+class FixedPageAdapter:
+    """Arbitrary (offset, limit) windows over an API with fixed-size pages
+    
+    fetch_page(page) returns one upstream page as a dict with results,
+    total_results and total_pages, as TMDb does. The pages a window spans
+    are fetched concurrently and sliced, so a client can ask for 50 items
+    in one request. Offsets can also be handed out as opaque cursors.
+    """
+    
+    def __init__(self, fetch_page, page_size=20, max_pages=500):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_pages = max_pages
+    
+    @staticmethod
+    def encode_cursor(offset):
+        """Encode an offset as an opaque cursor"""
+        return base64.urlsafe_b64encode(json.dumps([offset]).encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into an offset, raising ValueError if malformed"""
+        try:
+            offset, = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError, AttributeError, binascii.Error):
+            raise ValueError("Invalid cursor")
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("Invalid cursor")
+        return offset
+    
+    def window(self, offset, limit):
+        """Get (items, total) for a window, None if the first page failed
+        
+        total counts only items the upstream will actually serve, since
+        TMDb stops at max_pages whatever total_results says.
+        """
+        first = offset // self.page_size + 1
+        last = min((offset + limit - 1) // self.page_size + 1, self.max_pages)
+        pages = list(range(first, last + 1))
+        
+        if len(pages) > 1:
+            # A copy of this context per page, so fetches count towards the request's timings
+            contexts = [contextvars.copy_context() for _ in pages]
+            with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+                results = list(executor.map(lambda context, page: context.run(self.fetch_page, page), contexts, pages))
+        elif pages:
+            results = [self.fetch_page(first)]
+        else:
+            results = []
+        
+        if results and (not results[0] or 'results' not in results[0]):
+            return None
+        
+        items = []
+        total = 0
+        for data in results:
+            if not data or 'results' not in data:
+                # A later page failed, serve what came before it
+                break
+            items.extend(data['results'])
+            total = min(
+                data.get('total_results', 0),
+                min(data.get('total_pages', 0), self.max_pages) * self.page_size
+            )
+        
+        start = offset - (first - 1) * self.page_size
+        return items[start:start + limit], total
\ No newline at end of file
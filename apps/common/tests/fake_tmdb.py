@@ -0,0 +1,192 @@
+import io
+import re
+import json
+import requests
+from urllib.parse import urlsplit
+from PIL import Image
+
+
+class FakeResponse:
+    """The parts of requests.Response the services use"""
+    
+    def __init__(self, url, status_code=200, data=None, content=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content if content is not None else json.dumps(data or {}).encode()
+    
+    def json(self):
+        return json.loads(self.content)
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+
+class FakeTMDb:
+    """Stand-in for requests.get that answers like TMDb, YouTube and the TMDb image host
+    
+    Every movie id exists, except SERIES_ID which is only a series. Lists
+    have TOTAL_PAGES pages of 20 items and every item has GENRE_IDS, so
+    formatters see realistic shapes without any network access. Calls are
+    kept in calls, as (host, path).
+    """
+    
+    SERIES_ID = '1399'
+    TOTAL_PAGES = 5
+    GENRES = {'28': 'Action', '35': 'Comedy', '18': 'Drama'}
+    TV_GENRES = {'10765': 'Sci-Fi & Fantasy', '18': 'Drama'}
+    GENRE_IDS = [28, 35, 18]
+    
+    def __init__(self):
+        self.calls = []
+        self.routes = [
+            (r'^/3/search/multi$', self.search),
+            (r'^/3/movie/(popular|upcoming)$', self.movie_list),
+            (r'^/3/discover/movie$', self.movie_list),
+            (r'^/3/genre/movie/list$', lambda params: self.genre_list(self.GENRES)),
+            (r'^/3/genre/tv/list$', lambda params: self.genre_list(self.TV_GENRES)),
+            (r'^/3/movie/(\d+)$', self.movie_details),
+            (r'^/3/tv/(\d+)$', self.series_details),
+            (r'^/3/tv/(\d+)/season/(\d+)$', self.season_details),
+            (r'^/youtube/v3/videos$', self.video_stats),
+            (r'^/t/p/original/[\w-]+\.(jpg|jpeg|png)$', self.image),
+        ]
+    
+    def __call__(self, url, headers=None, params=None, **kwargs):
+        parts = urlsplit(url)
+        self.calls.append((parts.hostname, parts.path))
+        params = params or {}
+        
+        for pattern, handler in self.routes:
+            match = re.match(pattern, parts.path)
+            if match:
+                result = handler(params, *match.groups())
+                if isinstance(result, FakeResponse):
+                    result.url = url
+                    return result
+                if result is None:
+                    return FakeResponse(url, 404, {'status_code': 34})
+                return FakeResponse(url, data=result)
+        
+        return FakeResponse(url, 404, {'status_code': 34})
+    
+    def movie(self, movie_id):
+        movie_id = int(movie_id)
+        return {
+            'id': movie_id,
+            'media_type': 'movie',
+            'title': f"Movie {movie_id}",
+            'overview': f"Overview of movie {movie_id}",
+            'release_date': '2024-05-01',
+            'vote_average': 7.25,
+            'poster_path': f"/poster{movie_id}.jpg",
+            'backdrop_path': f"/backdrop{movie_id}.jpg",
+            'genre_ids': self.GENRE_IDS,
+        }
+    
+    def page(self, params, first_id):
+        page = int(params.get('page', 1))
+        if page > self.TOTAL_PAGES:
+            return {'page': page, 'results': [], 'total_pages': self.TOTAL_PAGES, 'total_results': self.TOTAL_PAGES * 20}
+        
+        return {
+            'page': page,
+            'results': [self.movie(first_id + page * 100 + i) for i in range(20)],
+            'total_pages': self.TOTAL_PAGES,
+            'total_results': self.TOTAL_PAGES * 20,
+        }
+    
+    def search(self, params):
+        data = self.page(params, 1000)
+        # Search mixes in people, which the API drops
+        data['results'][-1] = {'id': 42, 'media_type': 'person', 'name': 'Someone'}
+        return data
+    
+    def movie_list(self, params, *groups):
+        return self.page(params, 2000)
+    
+    def genre_list(self, genres):
+        return {'genres': [{'id': int(genre_id), 'name': name} for genre_id, name in genres.items()]}
+    
+    def movie_details(self, params, movie_id):
+        if movie_id == self.SERIES_ID:
+            return None
+        
+        item = dict(self.movie(movie_id), runtime=120, homepage='https://example.com')
+        item['genres'] = [{'id': genre_id, 'name': self.GENRES[str(genre_id)]} for genre_id in self.GENRE_IDS]
+        del item['genre_ids']
+        return self.append(item, params)
+    
+    def series_details(self, params, series_id):
+        if series_id != self.SERIES_ID:
+            return None
+        
+        item = {
+            'id': int(series_id),
+            'name': 'Series',
+            'overview': 'Overview of the series',
+            'first_air_date': '2011-04-17',
+            'vote_average': 8.4,
+            'poster_path': '/series.jpg',
+            'backdrop_path': '/series-backdrop.jpg',
+            'genres': [{'id': 10765, 'name': 'Sci-Fi & Fantasy'}],
+            'networks': [{'id': 49, 'name': 'Network', 'logo_path': '/network.png'}],
+            'seasons': [
+                {'id': 3620 + n, 'season_number': n, 'name': f"Season {n}", 'episode_count': 10,
+                 'air_date': '2011-04-17', 'poster_path': f"/season{n}.jpg", 'overview': ''}
+                for n in range(1, 4)
+            ],
+        }
+        return self.append(item, params)
+    
+    def append(self, item, params):
+        appended = params.get('append_to_response', '')
+        appended = appended.split(',') if appended else []
+        
+        if 'credits' in appended:
+            item['credits'] = {'cast': [
+                {'id': n, 'name': f"Actor {n}", 'character': f"Role {n}", 'order': n, 'profile_path': f"/actor{n}.jpg"}
+                for n in range(12)
+            ]}
+        if 'videos' in appended:
+            item['videos'] = {'results': [
+                {'id': f"v{n}", 'key': f"key{n}", 'name': f"Trailer {n}", 'site': 'YouTube',
+                 'type': 'Trailer', 'size': 1080, 'published_at': '2024-01-01T00:00:00.000Z'}
+                for n in range(3)
+            ]}
+        if 'reviews' in appended:
+            item['reviews'] = {'results': [
+                {'id': f"r{n}", 'author': f"Critic {n}", 'content': 'Good.', 'created_at': '2024-02-01T00:00:00.000Z',
+                 'author_details': {'rating': 8, 'avatar_path': None}}
+                for n in range(6)
+            ]}
+        if 'recommendations' in appended:
+            item['recommendations'] = {'results': [self.movie(item['id'] * 10 + n) for n in range(12)]}
+        return item
+    
+    def season_details(self, params, series_id, season_number):
+        if series_id != self.SERIES_ID or not 1 <= int(season_number) <= 3:
+            return None
+        
+        return {
+            'id': 3620 + int(season_number),
+            'season_number': int(season_number),
+            'name': f"Season {season_number}",
+            'episodes': [
+                {'id': n, 'episode_number': n, 'season_number': int(season_number), 'name': f"Episode {n}", 'overview': '', 'air_date': '2011-04-17',
+                 'runtime': 55, 'still_path': f"/still{n}.jpg", 'vote_average': 8.0}
+                for n in range(1, 11)
+            ],
+        }
+    
+    def video_stats(self, params):
+        return {'items': [{
+            'statistics': {'viewCount': '1500000', 'likeCount': '20000', 'commentCount': '300'},
+            'contentDetails': {'duration': 'PT2M30S'},
+            'snippet': {'description': 'Official trailer', 'publishedAt': '2024-01-01T00:00:00Z', 'channelTitle': 'Studio'},
+        }]}
+    
+    def image(self, params, extension):
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 900), (90, 40, 160)).save(buffer, 'JPEG')
+        return FakeResponse('', content=buffer.getvalue())
\ No newline at end of file
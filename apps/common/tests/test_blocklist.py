@@ -0,0 +1,43 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from apps.common.blocklist import IPBlocklist
+from apps.users.models import IPBlacklist
+
+
+class IPBlocklistTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        IPBlocklist._tries = None
+        IPBlocklist._version = None
+    
+    def block(self, ip_address, prefix_length=None):
+        # objects.create skips the admin's validation, like a script or raw insert would
+        IPBlacklist.objects.create(
+            ip_address=ip_address,
+            prefix_length=prefix_length,
+            blocked_until=timezone.now() + timedelta(hours=1)
+        )
+    
+    def test_networks_and_addresses_are_blocked(self):
+        self.block('10.0.0.0', 8)
+        self.block('2001:db8::1')
+        
+        self.assertIsNotNone(IPBlocklist.blocked_until('10.20.30.40'))
+        self.assertIsNotNone(IPBlocklist.blocked_until('::ffff:10.0.0.1'))
+        self.assertIsNotNone(IPBlocklist.blocked_until('2001:db8::1'))
+        self.assertIsNone(IPBlocklist.blocked_until('11.0.0.1'))
+        self.assertIsNone(IPBlocklist.blocked_until('2001:db8::2'))
+    
+    def test_malformed_rows_are_skipped(self):
+        self.block('192.168.1.1', 40)
+        self.block('not-an-address')
+        self.block('10.0.0.0', 8)
+        
+        self.assertIsNone(IPBlocklist.blocked_until('192.168.1.1'))
+        self.assertIsNotNone(IPBlocklist.blocked_until('10.0.0.1'))
+        
+        # Requests still get through the blocklist check to the view
+        self.assertEqual(self.client.get('/profile/').status_code, 401)
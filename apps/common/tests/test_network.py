@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from apps.common.blocklist import IPBlocklist
+from apps.common.network import get_client_ip, is_auto_blockable
+from apps.users.models import IPBlacklist
+
+
+class ClientIPTests(SimpleTestCase):
+    
+    def get_client_ip(self, remote_addr, x_forwarded_for=None):
+        extra = {'REMOTE_ADDR': remote_addr}
+        if x_forwarded_for:
+            extra['HTTP_X_FORWARDED_FOR'] = x_forwarded_for
+        return get_client_ip(RequestFactory().get('/', **extra))
+    
+    @override_settings(TRUSTED_PROXIES=[])
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(self.get_client_ip('10.0.0.5', '203.0.113.7'), '10.0.0.5')
+    
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_forwarded_for_is_ignored_from_untrusted_clients(self):
+        self.assertEqual(self.get_client_ip('198.51.100.1', '203.0.113.7'), '198.51.100.1')
+    
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_right_most_untrusted_hop_is_the_client(self):
+        # The left-most hop was sent by the client and is forged
+        self.assertEqual(self.get_client_ip('10.0.0.5', '192.0.2.1, 203.0.113.7, 10.0.0.9'), '203.0.113.7')
+
+
+class AutoBlockTests(SimpleTestCase):
+    
+    @override_settings(TRUSTED_PROXIES=['198.51.100.0/24'])
+    def test_shared_addresses_are_not_blockable(self):
+        for address in ['198.51.100.7', '10.1.2.3', '192.168.0.1', '127.0.0.1', '::1', 'fe80::1',
+                        '::ffff:10.0.0.1', 'not-an-address']:
+            self.assertFalse(is_auto_blockable(address), address)
+    
+    @override_settings(TRUSTED_PROXIES=['198.51.100.0/24'])
+    def test_public_addresses_are_blockable(self):
+        for address in ['8.8.8.8', '2606:4700::1111', '::ffff:8.8.4.4']:
+            self.assertTrue(is_auto_blockable(address), address)
+
+
+@override_settings(
+    RATE_LIMIT_ENABLE=True,
+    TRUSTED_PROXIES=[],
+    HEAVY_HITTER_THRESHOLD=3,
+    SERVER_TIMING_ENABLE=False,
+)
+class HeavyHitterProxyTests(TestCase):
+    """A load balancer missing from TRUSTED_PROXIES is every client, and must not be blocked"""
+    
+    def setUp(self):
+        cache.clear()
+        IPBlocklist._tries = None
+    
+    def test_internal_heavy_hitter_is_not_blocked(self):
+        for _ in range(5):
+            response = self.client.get('/profile/', REMOTE_ADDR='10.0.0.5', HTTP_X_FORWARDED_FOR='203.0.113.7')
+            self.assertEqual(response.status_code, 401)
+        
+        self.assertFalse(IPBlacklist.objects.exists())
+    
+    def test_public_heavy_hitter_is_blocked(self):
+        for _ in range(3):
+            response = self.client.get('/profile/', REMOTE_ADDR='8.8.8.8')
+        
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(IPBlacklist.objects.filter(ip_address='8.8.8.8').exists())
@@ -0,0 +1,488 @@
+import re
+import json
+import shutil
+import logging
+import difflib
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from apps.authentication.services import JWTService, OTPService, SessionCache
+from apps.common.timing import TimedConnectionMixin, record
+from apps.movies.images import ImageProxyService
+from apps.movies.services import TrendingService
+from apps.users.genres import GenreRegistry, GenreMembershipService
+from apps.users.models import User, Genre, UserFavourite, UserNotification, UserHistory
+from .fake_tmdb import FakeTMDb
+
+PASSWORD = 'Cinemate-Budget-2024'
+CLIENT_IP = '127.0.0.1'
+
+
+class Case:
+    """One request to a route, with the queries and Redis round trips it may cost
+    
+    queries lists the statements the route is expected to run, as
+    signature() strings. More statements than that fails the test with a
+    diff against the list. path, data and headers may be callables taking
+    the test case, for values that depend on seeded rows.
+    """
+    
+    def __init__(self, method, route, path, queries, cache_round_trips, user=None, data=None,
+                 content_type='application/json', headers=None, status=200, prepare=None):
+        self.method = method
+        self.route = route
+        self.path = path
+        self.queries = queries
+        self.cache_round_trips = cache_round_trips
+        self.user = user
+        self.data = data
+        self.content_type = content_type
+        self.headers = headers
+        self.status = status
+        self.prepare = prepare
+    
+    def __str__(self):
+        return f"{self.method} /{self.route}"
+
+
+_TABLES = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+def signature(sql):
+    """Short form of a statement that does not depend on parameters or backend
+    
+    e.g. 'SELECT user_favourites' or 'INSERT user_genres'.
+    """
+    verb = sql.split(None, 1)[0].upper()
+    if verb == 'SELECT' and sql[7:].upper().startswith('COUNT('):
+        verb = 'SELECT COUNT'
+    tables = list(dict.fromkeys(_TABLES.findall(sql)))
+    return ' '.join([verb] + tables)
+
+
+def _counting_send(self, *args, **kwargs):
+    """send_packed_command that counts one cache round trip per send
+    
+    Pipelines and scripts send all their commands at once, so they count once.
+    The handshake of a new connection (CLIENT SETINFO, SELECT, AUTH) is not
+    counted, as how many connections a request opens depends on how warm the
+    pool is rather than on the code under test.
+    """
+    if not getattr(self, '_connecting', False):
+        record('cache_round_trip', 0)
+    return super(TimedConnectionMixin, self).send_packed_command(*args, **kwargs)
+
+
+def _uncounted_on_connect(self):
+    """on_connect that marks its commands as handshake for _counting_send"""
+    self._connecting = True
+    try:
+        return super(TimedConnectionMixin, self).on_connect()
+    finally:
+        self._connecting = False
+
+
+def _reset_token(test, verified):
+    reset_request, otp = OTPService.create_password_reset(test.member, CLIENT_IP)
+    if verified:
+        reset_request.status = 'verified'
+        reset_request.save()
+    test.otp = otp
+    return reset_request.reset_token
+
+
+def _unread_ids(test):
+    ids = UserNotification.objects.filter(user=test.member, read=False).values_list('id', flat=True)[:5]
+    return {'notification_id': [str(notification_id) for notification_id in ids]}
+
+
+def _import_body(test):
+    lines = [
+        {'kind': 'favourites', 'movie_id': str(9000 + n), 'created_at': '2024-01-01T00:00:00Z'}
+        for n in range(10)
+    ] + [
+        {'kind': 'notifications', 'type': 'system_update', 'title': f"Imported {n}", 'message': 'Hello',
+         'read': False, 'created_at': '2024-01-01T00:00:00Z'}
+        for n in range(10)
+    ]
+    return ''.join(json.dumps(line) + '\n' for line in lines)
+
+
+def _seed_trending(test):
+    TrendingService().record_events([(str(100 + n), f"viewer{n}", 1) for n in range(10)])
+
+
+# Budgets are for a cold request: Redis is empty and in-process caches are
+# dropped before each one, so every cache miss path is paid for.
+CASES = [
+    Case('GET', 'api/schema/', '/api/schema/', [], 2),
+    Case('GET', 'api/docs/', '/api/docs/', [], 2),
+    
+    Case('POST', 'auth/login', '/auth/login', [
+        'SELECT users',
+        'INSERT login_sessions',
+        'UPDATE users',
+    ], 2, data={'email': 'member@example.com', 'password': PASSWORD}),
+    Case('POST', 'auth/signup', '/auth/signup', [
+        'SELECT users',
+        'SAVEPOINT',
+        'INSERT users',
+        'SELECT genres',
+        'INSERT user_genres',
+        'RELEASE',
+        'INSERT login_sessions',
+    ], 4, data={'name': 'New User', 'email': 'new@example.com', 'password': PASSWORD, 'genres': ['28', '35']},
+        status=201),
+    Case('POST', 'auth/forgot-password', '/auth/forgot-password', [
+        'SELECT users',
+        'SELECT users',
+        'UPDATE password_resets',
+        'INSERT password_resets',
+        'UPDATE password_resets',
+    ], 2, data={'email': 'member@example.com'}),
+    Case('POST', 'auth/forgot-password/verify', '/auth/forgot-password/verify', [
+        'SELECT password_resets',
+        'UPDATE password_resets',
+    ], 2, data=lambda test: {'otp_code': test.otp},
+        headers=lambda test: {'HTTP_AUTHORIZATION': f"Bearer {_reset_token(test, verified=False)}"}),
+    Case('POST', 'auth/forgot-password/change', '/auth/forgot-password/change', [
+        'SELECT password_resets',
+        'SELECT users',
+        'UPDATE users',
+        'UPDATE password_resets',
+        'UPDATE password_resets',
+    ], 2, data={'new_password': 'Another-Budget-2024'},
+        headers=lambda test: {'HTTP_AUTHORIZATION': f"Bearer {_reset_token(test, verified=True)}"}),
+    Case('POST', 'auth/refresh-token', '/auth/refresh-token', [
+        'SELECT login_sessions',
+        'SELECT users',
+    ], 2, user='member'),
+    Case('POST', 'auth/logout', '/auth/logout', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT login_sessions',
+        'UPDATE login_sessions',
+    ], 8, user='member'),
+    
+    Case('GET', 'movies/search', '/movies/search?q=matrix&limit=50', [
+        'SELECT genres',
+    ], 10),
+    Case('GET', 'movies/popular', '/movies/popular?limit=50', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'SELECT genres',
+    ], 13, user='member'),
+    Case('GET', 'movies/coming-soon', '/movies/coming-soon', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'SELECT genres',
+    ], 9, user='member'),
+    Case('GET', 'movies/batch', '/movies/batch?ids=' + ','.join(str(100 + n) for n in range(20)), [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+    ], 26, user='member'),
+    Case('GET', 'movies/trending', '/movies/trending', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+    ], 22, user='member', prepare=_seed_trending),
+    Case('GET', 'movies/recommendations', '/movies/recommendations', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_genres',
+        'SELECT user_favourites',
+        'SELECT genres',
+    ], 12, user='member'),
+    Case('GET', 'movies/favourites', '/movies/favourites', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT COUNT user_favourites',
+        'SELECT user_favourites',
+        'SELECT user_favourites',
+    ], 26, user='member'),
+    Case('POST', 'movies/favourites', '/movies/favourites', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'INSERT user_favourites',
+        'SELECT user_favourites',
+    ], 7, user='member', data={'movie_id': '777'}, status=201),
+    Case('DELETE', 'movies/favourites', '/movies/favourites?movie_id=100', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'DELETE user_favourites',
+    ], 5, user='member'),
+    Case('POST', 'movies/favourites/bulk', '/movies/favourites/bulk', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'INSERT user_favourites',
+        'SELECT user_favourites',
+    ], 7, user='member', data={'movie_ids': [str(700 + n) for n in range(20)]}),
+    Case('DELETE', 'movies/favourites/bulk', '/movies/favourites/bulk', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'DELETE user_favourites',
+    ], 5, user='member', data={'movie_ids': [str(100 + n) for n in range(20)]}),
+    Case('GET', 'movies/genres', '/movies/genres', [
+        'SELECT genres',
+        'SELECT genres',
+    ], 6),
+    Case('GET', 'movies/images/<str:file_name>', '/movies/images/poster550.jpg?w=342&fm=jpeg', [], 2),
+    Case('GET', 'movies/<str:movie_id>', '/movies/550', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'SELECT user_favourites',
+        'SELECT genres',
+    ], 17, user='member'),
+    Case('GET', 'movies/<str:movie_id>/seasons', f"/movies/{FakeTMDb.SERIES_ID}/seasons", [], 4),
+    Case('GET', 'movies/<str:movie_id>/seasons/<int:season_number>/episodes',
+         f"/movies/{FakeTMDb.SERIES_ID}/seasons/1/episodes", [], 4),
+    
+    Case('GET', 'profile/', '/profile/', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_genres',
+    ], 7, user='member'),
+    Case('POST', 'profile/', '/profile/', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT genres',
+        'SAVEPOINT',
+        'UPDATE users',
+        'SAVEPOINT',
+        'SELECT users',
+        'SELECT user_genres',
+        'DELETE user_genres',
+        'INSERT user_genres',
+        'RELEASE',
+        'RELEASE',
+        'SELECT user_genres',
+    ], 9, user='member', data={'name': 'Renamed', 'genres': ['18', '35']}),
+    Case('POST', 'profile/change-password', '/profile/change-password', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'UPDATE users',
+        'SELECT login_sessions',
+        'UPDATE login_sessions',
+        'INSERT login_sessions',
+    ], 8, user='member', data={'old_password': PASSWORD, 'new_password': 'Another-Budget-2024'}),
+    Case('GET', 'profile/notifications', '/profile/notifications', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT COUNT user_notifications',
+        'SELECT COUNT user_notifications',
+        'SELECT user_notifications',
+    ], 7, user='member'),
+    Case('GET', 'profile/notifications/unread-count', '/profile/notifications/unread-count', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT COUNT user_notifications',
+    ], 7, user='member'),
+    Case('POST', 'profile/notifications/read', '/profile/notifications/read', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SAVEPOINT',
+        'UPDATE user_notifications',
+        'RELEASE',
+    ], 5, user='member', data=_unread_ids),
+    Case('GET', 'profile/export', '/profile/export', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'SELECT user_history',
+        'SELECT user_notifications',
+    ], 5, user='member'),
+    Case('POST', 'profile/import', '/profile/import', [
+        'SELECT login_sessions',
+        'SELECT users',
+        'SELECT user_favourites',
+        'SAVEPOINT',
+        'INSERT user_favourites',
+        'SELECT user_favourites',
+        'UPDATE user_favourites',
+        'RELEASE',
+        'SAVEPOINT',
+        'INSERT user_notifications',
+        'UPDATE user_notifications',
+        'RELEASE',
+    ], 6, user='member', data=_import_body, content_type='application/x-ndjson'),
+    
+    Case('GET', 'system/health/', '/system/health/', [], 2),
+    Case('GET', 'system/heavy-hitters', '/system/heavy-hitters', [
+        'SELECT login_sessions',
+        'SELECT users',
+    ], 6, user='staff'),
+    Case('GET', 'system/metrics', '/system/metrics', [], 5,
+         headers={'HTTP_AUTHORIZATION': 'Bearer budget-token'}),
+]
+
+
+def iter_routes(patterns=None, prefix=''):
+    """Every route in the URLconf as a pattern string, without the admin"""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            if route != 'admin/':
+                yield from iter_routes(pattern.url_patterns, route)
+        else:
+            yield route
+
+
+@override_settings(
+    SERVER_TIMING_ENABLE=True,
+    RATE_LIMIT_ENABLE=True,
+    RESPONSE_CACHE_ENABLE=True,
+    METRICS_FLUSH_INTERVAL=10 ** 9,
+    METRICS_TOKEN='budget-token',
+    TMDB_BASE_URL='https://api.themoviedb.org/3',
+    YOUTUBE_API_KEY='budget-key',
+)
+class QueryBudgetTests(TestCase):
+    """Database queries and Redis round trips per endpoint stay within budget
+    
+    Every route in cinemate/urls.py is called against a fake TMDb, with
+    seeded users, genres, favourites, history and notifications. A route
+    without a Case fails test_every_route_has_a_budget. Queries are counted
+    on the request thread's connection, round trips on every thread that
+    runs in the request's context.
+    """
+    
+    @classmethod
+    def setUpTestData(cls):
+        Genre.objects.bulk_create([Genre(id=genre_id, name=name) for genre_id, name in {
+            **FakeTMDb.GENRES, **FakeTMDb.TV_GENRES
+        }.items()])
+        
+        cls.member = User.objects.create_user('member@example.com', PASSWORD, full_name='Member')
+        cls.staff = User.objects.create_user('staff@example.com', PASSWORD, full_name='Staff', is_staff=True)
+        GenreMembershipService.add_genres(cls.member, ['28', '18'])
+        
+        UserFavourite.objects.bulk_create([UserFavourite(user=cls.member, movie_id=str(100 + n)) for n in range(30)])
+        UserHistory.objects.bulk_create([UserHistory(user=cls.member, movie_id=str(200 + n)) for n in range(30)])
+        UserNotification.objects.bulk_create([
+            UserNotification(user=cls.member, title=f"Notification {n}", message='New movie', movie_id=str(100 + n), read=n % 3 == 0)
+            for n in range(40)
+        ])
+        
+        cls.tokens = {
+            'member': JWTService.create_login_session(cls.member, CLIENT_IP)[0],
+            'staff': JWTService.create_login_session(cls.staff, CLIENT_IP)[0],
+        }
+    
+    def setUp(self):
+        self.tmdb = FakeTMDb()
+        patcher = mock.patch('requests.get', self.tmdb)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        # One JSON line per request is noise here
+        patcher = mock.patch.object(logging.getLogger('cinemate.timing'), 'disabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        patcher = mock.patch.object(TimedConnectionMixin, 'send_packed_command', _counting_send, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(TimedConnectionMixin, 'on_connect', _uncounted_on_connect, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        image_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, image_dir, ignore_errors=True)
+        settings_patcher = override_settings(IMAGE_CACHE_DIR=image_dir)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+    
+    def reset_caches(self):
+        """Empty Redis and the in-process caches, then settle per-process state"""
+        cache.clear()
+        GenreRegistry._local = None
+        SessionCache._local.clear()
+        ImageProxyService._cache_size = None
+        
+        # Loads the IP blocklist and the rate limiter, outside any budget
+        self.client.get('/system/health/')
+    
+    def test_every_route_has_a_budget(self):
+        budgeted = {case.route for case in CASES}
+        missing = [route for route in iter_routes() if route not in budgeted]
+        self.assertEqual(missing, [], "Routes without a query budget, add a Case to CASES")
+    
+    def test_query_budgets(self):
+        for case in CASES:
+            with self.subTest(str(case)):
+                with transaction.atomic():
+                    self.check_budget(case)
+                    transaction.set_rollback(True)
+    
+    def check_budget(self, case):
+        self.reset_caches()
+        if case.prepare:
+            case.prepare(self)
+        
+        headers = self.resolve(case.headers) or {}
+        if case.user:
+            headers['HTTP_AUTHORIZATION'] = f"Bearer {self.tokens[case.user]}"
+        
+        data = self.resolve(case.data)
+        if data is None:
+            data = ''
+        elif not isinstance(data, str):
+            data = json.dumps(data)
+        
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.generic(
+                case.method, self.resolve(case.path), data, content_type=case.content_type, **headers
+            )
+            # Streamed bodies run their queries while being read
+            if response.streaming:
+                b''.join(response.streaming_content)
+        response.close()
+        
+        self.assertEqual(response.status_code, case.status, getattr(response, 'content', b'')[:500])
+        
+        problems = []
+        statements = [query['sql'] for query in captured.captured_queries]
+        if len(statements) > len(case.queries):
+            problems.append(self.query_report(case.queries, statements))
+        
+        timings = response.wsgi_request.timings.metrics
+        round_trips = timings.get('cache_round_trip', (0, 0))[0]
+        if round_trips > case.cache_round_trips:
+            problems.append(f"{round_trips} cache round trips, budget is {case.cache_round_trips}")
+        
+        if problems:
+            self.fail(f"{case} is over budget\n\n" + '\n\n'.join(problems))
+    
+    def resolve(self, value):
+        return value(self) if callable(value) else value
+    
+    @staticmethod
+    def query_report(expected, statements):
+        """Diff of expected and actual signatures, with the SQL of the extra statements"""
+        actual = [signature(sql) for sql in statements]
+        diff = difflib.unified_diff(expected, actual, 'budget', 'actual', lineterm='')
+        
+        matcher = difflib.SequenceMatcher(a=expected, b=actual, autojunk=False)
+        offending = [
+            f"  [{index + 1}] {statements[index]}"
+            for tag, _, _, start, end in matcher.get_opcodes() if tag in ('insert', 'replace')
+            for index in range(start, end)
+        ]
+        
+        return (
+            f"{len(statements)} queries, budget is {len(expected)}:\n"
+            + '\n'.join(diff)
+            + "\n\nOffending queries:\n"
+            + '\n'.join(offending)
+        )
\ No newline at end of file
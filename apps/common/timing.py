@@ -0,0 +1,94 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+import redis
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Time spent and calls made per category (db, cache, upstream host) in one request"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.metrics = {}
+        self._lock = threading.Lock()
+    
+    def add(self, name, seconds):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                self.metrics[name] = [1, seconds]
+            else:
+                metric[0] += 1
+                metric[1] += seconds
+    
+    def total(self):
+        return time.perf_counter() - self.started
+    
+    @staticmethod
+    def current():
+        return _current.get()
+    
+    @staticmethod
+    def activate(timings):
+        """Make timings collect for the current context, None to stop"""
+        _current.set(timings)
+
+
+def record(name, seconds):
+    """Add a call to the current request's timings, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def timed(name):
+    """Time a block as one call of name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper timing each query"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record('db', time.perf_counter() - start)
+
+
+class TimedConnectionMixin:
+    """Count each Redis reply, with the time spent waiting for it, as a cache call"""
+    
+    def read_response(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().read_response(*args, **kwargs)
+        finally:
+            record('cache', time.perf_counter() - start)
+
+
+class TimedConnectionPool(redis.ConnectionPool):
+    """Connection pool whose connections report to the request timings
+    
+    Wraps whatever connection class the URL or options chose (TCP, TLS,
+    Unix socket), so both the cache API and raw connections are covered.
+    """
+    
+    _classes = {}
+    
+    def __init__(self, connection_class=redis.Connection, **kwargs):
+        timed_class = self._classes.get(connection_class)
+        if timed_class is None:
+            # Built with the connection class's own metaclass
+            timed_class = type(connection_class)(
+                f"Timed{connection_class.__name__}", (TimedConnectionMixin, connection_class), {}
+            )
+            self._classes[connection_class] = timed_class
+        super().__init__(connection_class=timed_class, **kwargs)
\ No newline at end of file
@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('health/', views.HealthCheckView.as_view(), name='health-check'),
+    path('heavy-hitters', views.HeavyHittersView.as_view(), name='heavy-hitters'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
@@ -1,7 +1,17 @@
+import hmac
+from datetime import datetime
+import redis
+from django.http import HttpResponse
 from django.utils import timezone
+from django_redis.exceptions import ConnectionInterrupted
+from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework.permissions import AllowAny
-from apps.common.responses import success_response
+from rest_framework.permissions import AllowAny, IsAdminUser
+from django.conf import settings
+from apps.authentication.services import AuthRecordSweeper
+from apps.common.metrics import Metrics
+from apps.common.middleware import HeavyHitterDetector
+from apps.common.responses import success_response, error_response
 
 
 class HealthCheckView(APIView):
@@ -13,4 +23,71 @@ class HealthCheckView(APIView):
             "status": "healthy",
             "timestamp": timezone.now().isoformat(),
             "version": "1.0.0"
-        })
\ No newline at end of file
+        })
+
+
+class HeavyHittersView(APIView):
+    """Top clients per detection window, for staff"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        try:
+            windows = int(request.query_params.get('windows', 5))
+        except ValueError:
+            windows = 0
+        
+        if not 1 <= windows <= settings.HEAVY_HITTER_HISTORY:
+            return error_response(
+                f"windows must be between 1 and {settings.HEAVY_HITTER_HISTORY}",
+                "INVALID_PARAMS"
+            )
+        
+        return success_response({
+            "window_seconds": settings.HEAVY_HITTER_WINDOW,
+            "threshold": settings.HEAVY_HITTER_THRESHOLD,
+            "windows": HeavyHitterDetector().report(windows)
+        })
+
+
+class MetricsView(APIView):
+    """Prometheus metrics of every worker process, for scrapers holding METRICS_TOKEN"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        # Compared as bytes, compare_digest rejects non-ASCII str
+        if not token or not hmac.compare_digest(auth_header.encode(), f"Bearer {token}".encode()):
+            return error_response("Metrics token required", "FORBIDDEN", status_code=403)
+        
+        try:
+            sweep = AuthRecordSweeper.last_run()
+            body = Metrics.render(self.sweep_gauges(sweep))
+        except (redis.RedisError, ConnectionInterrupted) as e:
+            print(f"Metrics scrape error: {e}")
+            return error_response(
+                "Metrics are unavailable",
+                "METRICS_UNAVAILABLE",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    def sweep_gauges(self, sweep):
+        """Gauges of the last auth record sweep, none before the first one"""
+        if not sweep:
+            return []
+        
+        return [
+            ('auth_sweep_last_run_timestamp_seconds', 'Start of the last auth record sweep',
+             datetime.fromisoformat(sweep['started_at']).timestamp()),
+            ('auth_sweep_last_run_duration_seconds', 'Duration of the last auth record sweep',
+             sweep['duration']),
+            ('auth_sweep_last_run_expired_sessions', 'Sessions expired by the last sweep',
+             sweep['expired_sessions']),
+            ('auth_sweep_last_run_deleted_sessions', 'Sessions deleted by the last sweep',
+             sweep['deleted_sessions']),
+            ('auth_sweep_last_run_deleted_password_resets', 'Password resets deleted by the last sweep',
+             sweep['deleted_password_resets']),
+        ]
\ No newline at end of file
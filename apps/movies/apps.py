@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.movies'
\ No newline at end of file
+    name = 'apps.movies'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
\ No newline at end of file
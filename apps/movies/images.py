@@ -0,0 +1,297 @@
+import io
+import os
+import re
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+from apps.common.metrics import upstream_call
+
+
+class ImageBusy(Exception):
+    """Raised when the image worker queue is full"""
+    pass
+
+
+class ImageNotFound(Exception):
+    """Raised when TMDb has no image at the path"""
+    pass
+
+
+class ImageProxyService:
+    """Resized TMDb images in modern formats, cached on disk
+    
+    Originals are downloaded once and each (width, format) variant is made
+    once, in a pool of IMAGE_PROXY_WORKERS threads (Pillow releases the GIL
+    while resizing and encoding). Concurrent requests for the same variant
+    wait for the same job. Files live under IMAGE_CACHE_DIR, which is kept
+    below IMAGE_CACHE_MAX_BYTES by deleting the least recently used files.
+    """
+    
+    # Widths a client may ask for, others are rounded up to the next one
+    WIDTHS = (92, 154, 185, 342, 500, 780, 1280)
+    
+    FORMATS = {
+        'avif': ('AVIF', 'image/avif'),
+        'webp': ('WEBP', 'image/webp'),
+        'jpeg': ('JPEG', 'image/jpeg'),
+    }
+    
+    # TMDb image paths, e.g. /kqjL17yufvn9OVLyXYpvtyrFfak.jpg
+    FILE_NAME = re.compile(r'^[A-Za-z0-9_-]+\.(jpg|jpeg|png)$')
+    
+    ORIGINAL_URL = 'https://image.tmdb.org/t/p/original/{}'
+    
+    _executor = None
+    _slots = None
+    _jobs = {}
+    _downloads = {}
+    _cache_size = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def url(cls, path, width):
+        """Proxy URL of a TMDb image path at a width, None without a path
+        
+        Paths the proxy cannot resize (e.g. SVG logos) stay on TMDb.
+        """
+        if not path:
+            return None
+        
+        file_name = path.lstrip('/')
+        if not settings.IMAGE_PROXY_ENABLE or not cls.FILE_NAME.match(file_name):
+            return f"https://image.tmdb.org/t/p/w{width}{path}"
+        
+        return f"{settings.IMAGE_PROXY_BASE_URL}{reverse('movie-image', args=[file_name])}?w={width}"
+    
+    @classmethod
+    def snap_width(cls, width):
+        return next((w for w in cls.WIDTHS if w >= width), cls.WIDTHS[-1])
+    
+    @classmethod
+    def available_formats(cls):
+        """Formats this Pillow build can write, best first"""
+        Image.init()
+        return [name for name, (pil_format, _) in cls.FORMATS.items() if pil_format in Image.SAVE]
+    
+    @classmethod
+    def negotiate_format(cls, accept):
+        """Best format the client accepts, from its Accept header"""
+        for name in cls.available_formats():
+            if name == 'jpeg' or cls.FORMATS[name][1] in accept:
+                return name
+        return 'jpeg'
+    
+    @classmethod
+    def open_variant(cls, file_name, width, image_format):
+        """Open the cached variant for reading, making it first if needed
+        
+        Raises ImageNotFound, ImageBusy or OSError (which includes
+        requests.RequestException).
+        """
+        return cls._open(lambda: cls.get_variant(file_name, width, image_format))
+    
+    @classmethod
+    def get_variant(cls, file_name, width, image_format):
+        """Path of the cached variant on disk, making it first if needed
+        
+        The file may be evicted at any time, use open_variant to read it.
+        """
+        path = cls._cache_path(file_name, f"w{width}.{image_format}")
+        
+        try:
+            # Modification time is the LRU clock, atime is often not kept
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        
+        return cls._submit(path, cls._make_variant, file_name, width, image_format, path).result()
+    
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._slots = threading.BoundedSemaphore(
+                        settings.IMAGE_PROXY_WORKERS + settings.IMAGE_PROXY_QUEUE_SIZE
+                    )
+                    cls._executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PROXY_WORKERS)
+        return cls._executor
+    
+    @classmethod
+    def _submit(cls, key, fn, *args):
+        """Run a job for key in the pool, or join the one already running"""
+        executor = cls._get_executor()
+        
+        with cls._lock:
+            future = cls._jobs.get(key)
+            if future is not None:
+                return future
+            
+            if not cls._slots.acquire(blocking=False):
+                raise ImageBusy("Image worker queue is full")
+            
+            future = executor.submit(fn, *args)
+            cls._jobs[key] = future
+        
+        def done(_):
+            with cls._lock:
+                cls._jobs.pop(key, None)
+            cls._slots.release()
+        
+        future.add_done_callback(done)
+        return future
+    
+    @classmethod
+    def _make_variant(cls, file_name, width, image_format, path):
+        pil_format = cls.FORMATS[image_format][0]
+        
+        with cls._open(lambda: cls._get_original(file_name)) as original:
+            try:
+                data = cls._resize(original, width, pil_format)
+            except Exception as e:
+                # Decoders raise more than OSError on bad data, e.g. SyntaxError
+                raise OSError(f"Could not resize {file_name}: {e!r}") from e
+        
+        cls._write(path, data)
+        return path
+    
+    @staticmethod
+    def _resize(original, width, pil_format):
+        with Image.open(original) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                image.thumbnail((width, image.height), Image.LANCZOS)
+            
+            if pil_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, quality=settings.IMAGE_PROXY_QUALITY)
+        
+        return buffer.getvalue()
+    
+    @classmethod
+    def _get_original(cls, file_name):
+        path = cls._cache_path(file_name, 'original')
+        
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        
+        # Jobs for other widths of the same image wait for one download
+        with cls._lock:
+            download = cls._downloads.get(path)
+            owner = download is None
+            if owner:
+                download = cls._downloads[path] = Future()
+        
+        if not owner:
+            return download.result()
+        
+        try:
+            with upstream_call('image.tmdb.org'):
+                response = requests.get(cls.ORIGINAL_URL.format(file_name), timeout=10)
+                if response.status_code != 404:
+                    response.raise_for_status()
+            
+            if response.status_code == 404:
+                raise ImageNotFound(file_name)
+            
+            # Keep anything that is not an image out of the cache
+            try:
+                Image.open(io.BytesIO(response.content)).verify()
+            except Exception as e:
+                raise OSError(f"Invalid image from TMDb for {file_name}: {e!r}") from e
+            
+            cls._write(path, response.content)
+            download.set_result(path)
+        except Exception as e:
+            download.set_exception(e)
+            raise
+        finally:
+            with cls._lock:
+                cls._downloads.pop(path, None)
+        
+        return path
+    
+    @staticmethod
+    def _open(get_path):
+        """Open a cache file from get_path(), calling it again if the file is evicted first
+        
+        Once open, the file stays readable even if it is then evicted.
+        """
+        try:
+            return open(get_path(), 'rb')
+        except FileNotFoundError:
+            return open(get_path(), 'rb')
+    
+    @staticmethod
+    def _cache_path(file_name, variant):
+        digest = hashlib.sha256(file_name.encode()).hexdigest()
+        return os.path.join(settings.IMAGE_CACHE_DIR, digest[:2], f"{digest}.{variant}")
+    
+    @classmethod
+    def _write(cls, path, data):
+        """Write a cache file atomically, then evict if over the size cap"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        with cls._lock:
+            if cls._cache_size is None:
+                cls._cache_size = sum(size for _, size, _ in cls._scan())
+            else:
+                cls._cache_size += len(data)
+            over = cls._cache_size > settings.IMAGE_CACHE_MAX_BYTES
+        
+        if over:
+            cls._evict()
+    
+    @staticmethod
+    def _scan():
+        """Cache files as (path, size, mtime)"""
+        for root, _, files in os.walk(settings.IMAGE_CACHE_DIR):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+    
+    @classmethod
+    def _evict(cls):
+        """Delete least recently used files down to 90% of the cap
+        
+        The size is re-counted from disk here, since other processes share
+        the directory.
+        """
+        files = sorted(cls._scan(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in files)
+        target = settings.IMAGE_CACHE_MAX_BYTES * 0.9
+        
+        for path, file_size, _ in files:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except FileNotFoundError:
+                pass
+        
+        with cls._lock:
+            cls._cache_size = size
\ No newline at end of file
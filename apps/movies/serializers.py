@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from apps.common.pagination import PaginationQuerySerializer, CursorPaginationQuerySerializer
+from .images import ImageProxyService
+from .services import TMDbService
 
 
 class FavouriteMovieSerializer(serializers.Serializer):
@@ -6,12 +9,65 @@ class FavouriteMovieSerializer(serializers.Serializer):
     movie_id = serializers.CharField(max_length=50)
 
 
-class PaginationQuerySerializer(serializers.Serializer):
-    """Serializer for pagination query parameters"""
-    page = serializers.IntegerField(default=1, min_value=1)
-    limit = serializers.IntegerField(default=20, min_value=1, max_value=50)
+class BulkFavouritesSerializer(serializers.Serializer):
+    """Serializer for adding or removing several favourites at once"""
+    movie_ids = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        min_length=1,
+        max_length=100
+    )
 
 
-class SearchQuerySerializer(PaginationQuerySerializer):
+class MovieBatchQuerySerializer(serializers.Serializer):
+    """Serializer for a comma separated list of up to 50 movie ids"""
+    ids = serializers.CharField()
+    
+    def validate_ids(self, value):
+        movie_ids = list(dict.fromkeys(movie_id.strip() for movie_id in value.split(',') if movie_id.strip()))
+        
+        if not movie_ids:
+            raise serializers.ValidationError("At least one movie id is required")
+        if len(movie_ids) > 50:
+            raise serializers.ValidationError("At most 50 movie ids are allowed")
+        if any(len(movie_id) > 50 for movie_id in movie_ids):
+            raise serializers.ValidationError("Movie ids are at most 50 characters")
+        
+        return movie_ids
+
+
+class MovieDetailsQuerySerializer(serializers.Serializer):
+    """Serializer for the comma separated details sections to include"""
+    include = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate_include(self, value):
+        sections = [section.strip() for section in value.split(',') if section.strip()]
+        unknown = [section for section in sections if section not in TMDbService.DETAIL_SECTIONS]
+        
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown sections: {', '.join(unknown)}. Choose from {', '.join(TMDbService.DETAIL_SECTIONS)}"
+            )
+        
+        return sections
+
+
+class ImageQuerySerializer(serializers.Serializer):
+    """Serializer for image proxy query parameters"""
+    w = serializers.IntegerField(default=500, min_value=1, max_value=1280)
+    # Not "format", which DRF keeps for choosing a renderer
+    fm = serializers.ChoiceField(choices=['avif', 'webp', 'jpeg'], required=False)
+    
+    def validate_fm(self, value):
+        if value not in ImageProxyService.available_formats():
+            raise serializers.ValidationError(f"{value} is not supported by this server")
+        return value
+
+
+class SearchQuerySerializer(CursorPaginationQuerySerializer):
     """Serializer for search query parameters"""
-    q = serializers.CharField(max_length=255)
\ No newline at end of file
+    q = serializers.CharField(max_length=255)
+
+
+class TrendingQuerySerializer(PaginationQuerySerializer):
+    """Serializer for trending query parameters"""
+    window = serializers.ChoiceField(choices=['hour', 'day'], default='day')
\ No newline at end of file
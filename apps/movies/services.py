@@ -1,8 +1,18 @@
+import time
+import threading
+import contextvars
+import redis
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 from django.conf import settings
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from apps.users.models import UserFavourite, UserGenre, Genre
+from django_redis import get_redis_connection
+from apps.common.metrics import upstream_call
+from apps.users.genres import GenreMembershipService, GenreRegistry
+from apps.users.models import UserFavourite, Genre
+from .images import ImageProxyService
 from typing import Dict, List, Optional
 
 User = get_user_model()
@@ -11,8 +21,24 @@ User = get_user_model()
 class TMDbService:
     """Service for interacting with The Movie Database API"""
     
+    # Optional sections of a details response, in canonical order
+    DETAIL_SECTIONS = ('cast', 'videos', 'reviews', 'recommendations', 'seasons')
+    
+    # What each section needs appended to the TMDb details request
+    DETAIL_APPENDS = {
+        'cast': 'credits',
+        'videos': 'videos',
+        'reviews': 'reviews',
+        'recommendations': 'recommendations'
+    }
+    
+    # Upstream fetches for batches, shared by every request in the process
+    _batch_slots = None
+    _batch_lock = threading.Lock()
+    
     def __init__(self):
         self.base_url = settings.TMDB_BASE_URL
+        self.host = urlsplit(self.base_url).hostname
         self.access_token = settings.TMDB_ACCESS_TOKEN
         self.youtube_api_key = getattr(settings, 'YOUTUBE_API_KEY', None)
         self.headers = {
@@ -25,8 +51,9 @@ class TMDbService:
         url = f"{self.base_url}/{endpoint}"
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
+            with upstream_call(self.host):
+                response = requests.get(url, headers=self.headers, params=params)
+                response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             print(f"TMDb API error: {e}")
@@ -47,15 +74,10 @@ class TMDbService:
             'language': 'en-US'
         }
         
+        # Unfiltered, so callers can slice pages by position; people are
+        # dropped by the view
         data = self._make_request('search/multi', params)
         
-        # Filter only movies and TV shows
-        if 'results' in data:
-            data['results'] = [
-                item for item in data['results'] 
-                if item.get('media_type') in ['movie', 'tv']
-            ]
-        
         # Cache for 5 minutes
         cache.set(cache_key, data, 300)
         return data
@@ -98,38 +120,120 @@ class TMDbService:
         cache.set(cache_key, data, 3600)
         return data
     
-    def get_movie_details(self, movie_id: str) -> dict:
-        """Get detailed movie information"""
-        cache_key = f"tmdb_movie_{movie_id}"
-        cached_result = cache.get(cache_key)
+    def _details_sections(self, include=None) -> tuple:
+        """Requested detail sections in canonical order, all of them for None"""
+        if include is None:
+            return self.DETAIL_SECTIONS
+        return tuple(section for section in self.DETAIL_SECTIONS if section in include)
+    
+    def _details_append(self, sections: tuple) -> list:
+        return [self.DETAIL_APPENDS[section] for section in sections if section in self.DETAIL_APPENDS]
+    
+    def _details_cache_key(self, movie_id: str, sections: tuple) -> str:
+        # Keyed by what is fetched, and the full response keeps its original key
+        append = self._details_append(sections)
+        if len(append) == len(self.DETAIL_APPENDS):
+            return f"tmdb_movie_{movie_id}"
+        return f"tmdb_movie_{movie_id}_{'-'.join(append) or 'base'}"
+    
+    def _cached_details_many(self, movie_ids: List[str], sections: tuple) -> dict:
+        """Cached details as {movie_id: data} from one get_many
+        
+        A full entry also serves any subset of it.
+        """
+        keys = {}
+        for movie_id in movie_ids:
+            keys[self._details_cache_key(movie_id, sections)] = movie_id
+            keys.setdefault(self._details_cache_key(movie_id, self.DETAIL_SECTIONS), movie_id)
+        
+        results = {}
+        for key, data in cache.get_many(list(keys)).items():
+            if data:
+                results[keys[key]] = data
+        return results
+    
+    def get_movie_details(self, movie_id: str, include=None) -> dict:
+        """Get detailed movie information
+        
+        include limits the sections (see DETAIL_SECTIONS) that are fetched
+        from TMDb. Each combination is cached separately.
+        """
+        sections = self._details_sections(include)
+        cached_result = self._cached_details_many([movie_id], sections).get(movie_id)
         
         if cached_result:
             return cached_result
         
+        return self._fetch_movie_details(movie_id, sections)
+    
+    def _fetch_movie_details(self, movie_id: str, sections: tuple) -> dict:
         params = {
-            'language': 'en-US',
-            'append_to_response': 'credits,reviews,recommendations,videos'
+            'language': 'en-US'
         }
+        append = self._details_append(sections)
+        if append:
+            params['append_to_response'] = ','.join(append)
         
         # Try movie first
         data = self._make_request(f'movie/{movie_id}', params)
         
         # If not found, try TV series
         if not data or 'success' in data:
-            params['append_to_response'] = 'credits,reviews,recommendations,videos,seasons'
             data = self._make_request(f'tv/{movie_id}', params)
             if data and 'success' not in data:
                 data['is_series'] = True
-                # Get detailed season/episode info
-                if 'seasons' in data:
-                    for season in data['seasons']:
-                        season_details = self.get_season_details(movie_id, season['season_number'])
-                        season.update(season_details)
         
         # Cache for 2 hours
-        cache.set(cache_key, data, 7200)
+        cache.set(self._details_cache_key(movie_id, sections), data, 7200)
         return data
     
+    def get_movie_details_many(self, movie_ids: List[str], include=None) -> dict:
+        """Get details for several movies as {movie_id: data}
+        
+        Cached entries come from one get_many. Misses are fetched in threads,
+        with at most TMDB_BATCH_CONCURRENCY fetches in flight across the
+        process. A movie that could not be fetched maps to None.
+        """
+        sections = self._details_sections(include)
+        results = self._cached_details_many(movie_ids, sections)
+        misses = [movie_id for movie_id in movie_ids if movie_id not in results]
+        
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(len(misses), settings.TMDB_BATCH_CONCURRENCY)) as executor:
+                # Each fetch runs in a copy of this context, so it counts towards the request's timings
+                futures = {
+                    movie_id: executor.submit(contextvars.copy_context().run, self._fetch_for_batch, movie_id, sections)
+                    for movie_id in misses
+                }
+            
+            for movie_id, future in futures.items():
+                if future.exception() is not None:
+                    print(f"TMDb batch error for {movie_id}: {future.exception()}")
+                    results[movie_id] = None
+                else:
+                    results[movie_id] = future.result()
+        
+        return {movie_id: results[movie_id] for movie_id in movie_ids}
+    
+    def _fetch_for_batch(self, movie_id: str, sections: tuple) -> dict:
+        cls = type(self)
+        if cls._batch_slots is None:
+            with cls._batch_lock:
+                if cls._batch_slots is None:
+                    cls._batch_slots = threading.BoundedSemaphore(settings.TMDB_BATCH_CONCURRENCY)
+        
+        with cls._batch_slots:
+            return self._fetch_movie_details(movie_id, sections)
+    
+    def get_series_seasons(self, series_id: str) -> Optional[list]:
+        """Season summaries of a series from its cached details, None if it is not one"""
+        data = self.get_movie_details(series_id, include=('seasons',))
+        
+        if not data or 'success' in data or not data.get('is_series'):
+            return None
+        
+        return [self.format_season_summary(season) for season in data.get('seasons', [])]
+    
     def get_season_details(self, series_id: str, season_number: int) -> dict:
         """Get detailed season information"""
         cache_key = f"tmdb_season_{series_id}_{season_number}"
@@ -179,13 +283,14 @@ class TMDbService:
     def get_recommendations_for_user(self, user: User, page: int = 1) -> dict:
         """Get personalized recommendations based on user's favorite genres"""
         # Get user's preferred genres
-        user_genres = UserGenre.objects.filter(user=user).values_list('genre_id', flat=True)
+        user_genres = GenreMembershipService.get_genre_ids(user.id)
         
         if not user_genres:
             # Fallback to popular movies if no genres selected
             return self.get_popular_movies(page)
         
-        cache_key = f"tmdb_recommendations_{user.id}_{page}"
+        # Keyed by genre set, so a change of genres is a change of key
+        cache_key = f"tmdb_recommendations_{'-'.join(user_genres)}_{page}"
         cached_result = cache.get(cache_key)
         
         if cached_result:
@@ -206,37 +311,46 @@ class TMDbService:
         cache.set(cache_key, data, 3600)
         return data
     
-    def format_movie_list_item(self, item: dict, user: User = None) -> dict:
-        """Format movie item for API response"""
+    def get_favourite_ids(self, user: User, movie_ids: List[str]) -> set:
+        """Which of the movies are in the user's favourites, in one query"""
+        if not user or not user.is_authenticated or not movie_ids:
+            return set()
+        
+        return set(
+            UserFavourite.objects.filter(user=user, movie_id__in=movie_ids).values_list('movie_id', flat=True)
+        )
+    
+    def format_movie_list(self, items: List[dict], user: User = None) -> List[dict]:
+        """Format several movie items, looking up favourites once"""
+        favourite_ids = self.get_favourite_ids(user, [str(item.get('id', '')) for item in items])
+        return [self.format_movie_list_item(item, user, favourite_ids) for item in items]
+    
+    def format_movie_list_item(self, item: dict, user: User = None, favourite_ids: Optional[set] = None) -> dict:
+        """Format movie item for API response
+        
+        Pass favourite_ids, from get_favourite_ids, to skip the favourites
+        query when formatting many items.
+        """
         is_series = 'first_air_date' in item or item.get('media_type') == 'tv'
         movie_id = str(item.get('id', ''))
         
         # Check if movie is in user's favorites
-        is_favorite = False
-        if user and user.is_authenticated:
-            is_favorite = UserFavourite.objects.filter(
-                user=user, 
-                movie_id=movie_id
-            ).exists()
+        if favourite_ids is None:
+            favourite_ids = self.get_favourite_ids(user, [movie_id])
+        is_favorite = movie_id in favourite_ids
         
         # Get genres
         genre_names = []
         if 'genre_ids' in item:
-            # Get genre names from cache or database
-            for genre_id in item['genre_ids']:
-                try:
-                    genre = Genre.objects.get(id=str(genre_id))
-                    genre_names.append(genre.name)
-                except Genre.DoesNotExist:
-                    pass
+            genre_names = GenreRegistry.names(item['genre_ids'])
         elif 'genres' in item:
             genre_names = [g['name'] for g in item['genres']]
         
         return {
             "id": movie_id,
             "title": item.get('title') or item.get('name', ''),
-            "poster": f"https://image.tmdb.org/t/p/w500{item.get('poster_path', '')}" if item.get('poster_path') else None,
-            "backdrop": f"https://image.tmdb.org/t/p/w500{item.get('backdrop_path', '')}" if item.get('backdrop_path') else None,
+            "poster": ImageProxyService.url(item.get('poster_path'), 500),
+            "backdrop": ImageProxyService.url(item.get('backdrop_path'), 500),
             "synopsis": item.get('overview', ''),
             "release_date": item.get('release_date') or item.get('first_air_date', ''),
             "duration": item.get('runtime'),
@@ -260,8 +374,13 @@ class TMDbService:
         else:
             return f"{count / 1000000000:.1f}b".rstrip('0').rstrip('.')
     
-    def format_movie_details(self, item: dict, user: User = None) -> dict:
-        """Format movie details for API response"""
+    def format_movie_details(self, item: dict, user: User = None, include=None) -> dict:
+        """Format movie details for API response
+        
+        Only the sections in include are built and returned, all of them for
+        None, so videos cost no YouTube calls unless they are asked for.
+        """
+        sections = self._details_sections(include)
         is_series = item.get('is_series', False) or 'first_air_date' in item
         movie_id = str(item.get('id', ''))
         
@@ -275,7 +394,7 @@ class TMDbService:
         
         # Format cast
         cast = []
-        if 'credits' in item and 'cast' in item['credits']:
+        if 'cast' in sections and 'credits' in item and 'cast' in item['credits']:
             cast = [
                 {
                     "id": member['id'],
@@ -289,7 +408,7 @@ class TMDbService:
         
         # Format videos (trailers, teasers, clips, etc.) - YouTube only
         videos = []
-        if 'videos' in item and 'results' in item['videos']:
+        if 'videos' in sections and 'videos' in item and 'results' in item['videos']:
             # Filter only YouTube videos
             youtube_videos = [v for v in item['videos']['results'] if v.get('site') == 'YouTube']
             
@@ -337,7 +456,7 @@ class TMDbService:
         
         # Format reviews
         reviews = []
-        if 'reviews' in item and 'results' in item['reviews']:
+        if 'reviews' in sections and 'reviews' in item and 'results' in item['reviews']:
             reviews = [
                 {
                     "id": review['id'],
@@ -352,52 +471,23 @@ class TMDbService:
         
         # Format recommendations
         recommendations = []
-        if 'recommendations' in item and 'results' in item['recommendations']:
-            recommendations = [
-                self.format_movie_list_item(rec, user)
-                for rec in item['recommendations']['results'][:10]  # Limit to 10
-            ]
+        if 'recommendations' in sections and 'recommendations' in item and 'results' in item['recommendations']:
+            recommendations = self.format_movie_list(
+                item['recommendations']['results'][:10],  # Limit to 10
+                user
+            )
         
         # Get network logo for series
         network_logo = None
         if is_series and 'networks' in item and item['networks']:
             network = item['networks'][0]  # Take first network
             if network.get('logo_path'):
-                network_logo = f"https://image.tmdb.org/t/p/w500{network['logo_path']}"
+                network_logo = ImageProxyService.url(network['logo_path'], 500)
         
-        # Format seasons for series
+        # Season summaries for series, episodes are served per season
         seasons = []
-        if is_series and 'seasons' in item:
-            for season in item['seasons']:
-                # Get episodes if available
-                episodes = []
-                if 'episodes' in season:
-                    episodes = [
-                        {
-                            "id": ep['id'],
-                            "name": ep['name'],
-                            "overview": ep['overview'],
-                            "air_date": ep.get('air_date'),
-                            "episode_number": ep['episode_number'],
-                            "runtime": ep.get('runtime'),
-                            "season_number": ep['season_number'],
-                            "still_path": f"https://image.tmdb.org/t/p/w500{ep['still_path']}" if ep.get('still_path') else None,
-                            "vote_average": ep.get('vote_average', 0)
-                        }
-                        for ep in season['episodes']
-                    ]
-                
-                seasons.append({
-                    "id": season['id'],
-                    "air_date": season.get('air_date'),
-                    "episode_count": season.get('episode_count', 0),
-                    "name": season['name'],
-                    "overview": season.get('overview', ''),
-                    "poster_path": f"https://image.tmdb.org/t/p/w500{season['poster_path']}" if season.get('poster_path') else None,
-                    "season_number": season['season_number'],
-                    "vote_average": season.get('vote_average', 0),
-                    "episodes": episodes
-                })
+        if 'seasons' in sections and is_series and 'seasons' in item:
+            seasons = [self.format_season_summary(season) for season in item['seasons']]
         
         result = {
             "id": movie_id,
@@ -409,8 +499,8 @@ class TMDbService:
             "rating": round(item.get('vote_average', 0), 1),
             "runtime": item.get('runtime'),
             "network_logo": network_logo,
-            "backdrop_url": f"https://image.tmdb.org/t/p/w1280{item.get('backdrop_path', '')}" if item.get('backdrop_path') else None,
-            "poster_url": f"https://image.tmdb.org/t/p/w500{item.get('poster_path', '')}" if item.get('poster_path') else None,
+            "backdrop_url": ImageProxyService.url(item.get('backdrop_path'), 1280),
+            "poster_url": ImageProxyService.url(item.get('poster_path'), 500),
             "genres": [g['name'] for g in item.get('genres', [])],
             "synopsis": item.get('overview', ''),
             "homepage": item.get('homepage'),
@@ -424,8 +514,39 @@ class TMDbService:
         if is_series:
             result["seasons"] = seasons
         
+        for section in self.DETAIL_SECTIONS:
+            if section not in sections:
+                result.pop(section, None)
+        
         return result
     
+    def format_season_summary(self, season: dict) -> dict:
+        """Format a season, without its episodes, for API response"""
+        return {
+            "id": season['id'],
+            "air_date": season.get('air_date'),
+            "episode_count": season.get('episode_count', len(season.get('episodes', []))),
+            "name": season['name'],
+            "overview": season.get('overview', ''),
+            "poster_path": ImageProxyService.url(season.get('poster_path'), 500),
+            "season_number": season['season_number'],
+            "vote_average": season.get('vote_average', 0)
+        }
+    
+    def format_episode(self, ep: dict) -> dict:
+        """Format an episode for API response"""
+        return {
+            "id": ep['id'],
+            "name": ep['name'],
+            "overview": ep['overview'],
+            "air_date": ep.get('air_date'),
+            "episode_number": ep['episode_number'],
+            "runtime": ep.get('runtime'),
+            "season_number": ep['season_number'],
+            "still_path": ImageProxyService.url(ep.get('still_path'), 500),
+            "vote_average": ep.get('vote_average', 0)
+        }
+    
     def _get_youtube_video_stats(self, video_id: str) -> dict:
         """Get YouTube video statistics including view count, likes, duration, etc."""
         if not self.youtube_api_key:
@@ -446,8 +567,9 @@ class TMDbService:
                 'part': 'statistics,contentDetails,snippet'
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            with upstream_call('www.googleapis.com'):
+                response = requests.get(url, params=params)
+                response.raise_for_status()
             data = response.json()
             
             if 'items' in data and data['items']:
@@ -475,7 +597,7 @@ class TMDbService:
                 # Cache for 1 hour
                 cache.set(cache_key, stats, 3600)
                 return stats
-            
+        
         except requests.RequestException as e:
             print(f"YouTube API error: {e}")
         
@@ -504,7 +626,7 @@ class TMDbService:
                 return f"{h}:{m:02d}:{s:02d}"
             else:
                 return f"{m}:{s:02d}"
-                
+        
         except Exception:
             return ""
     
@@ -519,4 +641,185 @@ class TMDbService:
                     defaults={
                         'name': genre_data['name']
                     }
-                )
\ No newline at end of file
+                )
+
+
+class TrendingService:
+    """Sliding-window trending counters kept entirely in Redis"""
+    
+    WINDOWS = {
+        # window: (bucket prefix, bucket size in seconds, number of buckets)
+        'hour': ('trending:m', 60, 60),
+        'day': ('trending:h', 3600, 24),
+    }
+    
+    # Count a view only the first time a viewer is seen for a movie in the
+    # current hour, so refreshing a page does not inflate the score. The
+    # unique-viewer HyperLogLog, minute bucket and hour bucket are updated
+    # in a single round trip.
+    RECORD_SCRIPT = """
+    local is_new = 1
+    if ARGV[1] ~= '' then
+        is_new = redis.call('PFADD', KEYS[1], ARGV[1])
+        redis.call('EXPIRE', KEYS[1], ARGV[5])
+    end
+    if is_new == 1 then
+        redis.call('ZINCRBY', KEYS[2], ARGV[3], ARGV[2])
+        redis.call('EXPIRE', KEYS[2], ARGV[4])
+        redis.call('ZINCRBY', KEYS[3], ARGV[3], ARGV[2])
+        redis.call('EXPIRE', KEYS[3], ARGV[5])
+    end
+    return is_new
+    """
+    
+    def __init__(self):
+        self.redis = get_redis_connection('default')
+        self.top_n = settings.TRENDING_TOP_N
+        self.refresh_interval = settings.TRENDING_REFRESH_INTERVAL
+        self._record = self.redis.register_script(self.RECORD_SCRIPT)
+    
+    def record_view(self, movie_id: str, viewer_id: str):
+        """Record a movie details view by a user or anonymous client"""
+        self.record_events([(movie_id, viewer_id, 1)])
+    
+    def record_favourite(self, movie_id: str, count: int = 1):
+        """Record movies being added to favourites"""
+        self.record_events([(movie_id, '', settings.TRENDING_FAVOURITE_WEIGHT * count)])
+    
+    def record_events(self, events: List[tuple]):
+        """Record (movie_id, viewer_id, weight) events in one pipeline"""
+        if not events:
+            return
+        
+        now = int(time.time())
+        minute = now // 60
+        hour = now // 3600
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for movie_id, viewer_id, weight in events:
+                self._record(
+                    keys=[
+                        f"trending:uv:{hour}:{movie_id}",
+                        f"trending:m:{minute}",
+                        f"trending:h:{hour}",
+                    ],
+                    args=[viewer_id or '', movie_id, weight, 2 * 3600, 2 * 86400],
+                    client=pipe
+                )
+            pipe.execute()
+        except redis.RedisError as e:
+            # Trending is best effort and must never fail the request
+            print(f"Trending record error: {e}")
+    
+    def get_trending(self, window: str = 'day', offset: int = 0, limit: int = 20) -> dict:
+        """Get a slice of the precomputed top-N for a window"""
+        top_key = f"trending:top:{window}"
+        
+        try:
+            # Stale or missing; while another worker rebuilds, the previous top-N is served
+            if self.redis.exists(f"trending:fresh:{window}", top_key) < 2:
+                self.refresh(window)
+            
+            entries = self.redis.zrevrange(top_key, offset, offset + limit - 1, withscores=True)
+            total = self.redis.zcard(top_key)
+            
+            # Unique viewers over the window, merged from the hourly HyperLogLogs
+            hours = self._bucket_ids(3600, 24 if window == 'day' else 2)
+            pipe = self.redis.pipeline(transaction=False)
+            for movie_id, _ in entries:
+                movie_id = movie_id.decode()
+                pipe.pfcount(*[f"trending:uv:{hour}:{movie_id}" for hour in hours])
+            viewers = pipe.execute() if entries else []
+        except redis.RedisError as e:
+            print(f"Trending read error: {e}")
+            return {'results': [], 'total': 0}
+        
+        return {
+            'results': [
+                {
+                    'movie_id': movie_id.decode(),
+                    'score': score,
+                    'unique_viewers': unique_viewers
+                }
+                for (movie_id, score), unique_viewers in zip(entries, viewers)
+            ],
+            'total': total
+        }
+    
+    def refresh(self, window: str = 'day'):
+        """Roll the window's buckets up into the top-N sorted set
+        
+        The first worker to find the window stale claims the rebuild for the
+        next refresh_interval seconds. Others keep serving the previous
+        top-N, which is kept for the length of the window, and only build
+        it themselves when there is none yet.
+        """
+        prefix, bucket_size, bucket_count = self.WINDOWS[window]
+        top_key = f"trending:top:{window}"
+        
+        if not self.redis.set(f"trending:fresh:{window}", 1, nx=True, ex=self.refresh_interval):
+            if self.redis.exists(top_key):
+                return
+        
+        buckets = [f"{prefix}:{bucket}" for bucket in self._bucket_ids(bucket_size, bucket_count)]
+        
+        # Replaced in one transaction, so readers see the old set or the new one
+        pipe = self.redis.pipeline()
+        pipe.zunionstore(top_key, buckets)
+        pipe.zremrangebyrank(top_key, 0, -(self.top_n + 1))
+        pipe.expire(top_key, max(bucket_size * bucket_count, self.refresh_interval))
+        pipe.execute()
+    
+    def _bucket_ids(self, bucket_size: int, bucket_count: int) -> List[int]:
+        """Ids of the most recent buckets, newest first"""
+        current = int(time.time()) // bucket_size
+        return [current - i for i in range(bucket_count)]
+
+
+class FavouritesService:
+    """Batched changes to a user's favourites"""
+    
+    @staticmethod
+    def add_many(user, movie_ids: List[str]) -> dict:
+        """Add movies to favourites, returning {movie_id: 'added' | 'already_favourite'}"""
+        movie_ids = list(dict.fromkeys(movie_ids))
+        existing = set(
+            UserFavourite.objects.filter(user=user, movie_id__in=movie_ids).values_list('movie_id', flat=True)
+        )
+        favourites = [UserFavourite(user=user, movie_id=movie_id) for movie_id in movie_ids if movie_id not in existing]
+        
+        # ignore_conflicts skips favourites added concurrently since the read.
+        # Ids are made here, so the rows that come back are the ones inserted.
+        added = set()
+        if favourites:
+            UserFavourite.objects.bulk_create(favourites, ignore_conflicts=True)
+            inserted = set(UserFavourite.objects.filter(
+                id__in=[favourite.id for favourite in favourites]
+            ).values_list('id', flat=True))
+            added = {favourite.movie_id for favourite in favourites if favourite.id in inserted}
+        
+        # All trending updates go out in one pipeline
+        TrendingService().record_events([
+            (movie_id, '', settings.TRENDING_FAVOURITE_WEIGHT) for movie_id in movie_ids if movie_id in added
+        ])
+        
+        return {
+            movie_id: 'added' if movie_id in added else 'already_favourite'
+            for movie_id in movie_ids
+        }
+    
+    @staticmethod
+    def remove_many(user, movie_ids: List[str]) -> dict:
+        """Remove movies from favourites, returning {movie_id: 'removed' | 'not_favourite'}"""
+        movie_ids = list(dict.fromkeys(movie_ids))
+        favourites = UserFavourite.objects.filter(user=user, movie_id__in=movie_ids)
+        existing = set(favourites.values_list('movie_id', flat=True))
+        
+        if existing:
+            favourites.delete()
+        
+        return {
+            movie_id: 'removed' if movie_id in existing else 'not_favourite'
+            for movie_id in movie_ids
+        }
\ No newline at end of file
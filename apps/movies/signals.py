@@ -0,0 +1,15 @@
+from django.dispatch import receiver
+from apps.common.middleware import response_cache_hit
+from apps.common.network import get_client_ip
+from apps.movies.services import TrendingService
+
+
+@receiver(response_cache_hit)
+def movie_details_served(sender, request, resolver_match, **kwargs):
+    """Count views of movie details served from the response cache
+    
+    Cached responses only go to anonymous callers, so the viewer is the IP.
+    """
+    if resolver_match.url_name == 'movie-details':
+        viewer_id = get_client_ip(request)
+        TrendingService().record_view(resolver_match.kwargs['movie_id'], viewer_id)
\ No newline at end of file
@@ -5,8 +5,14 @@ urlpatterns = [
     path('search', views.SearchMoviesView.as_view(), name='search-movies'),
     path('popular', views.PopularMoviesView.as_view(), name='popular-movies'),
     path('coming-soon', views.ComingSoonView.as_view(), name='coming-soon'),
+    path('batch', views.MovieBatchView.as_view(), name='movie-batch'),
+    path('trending', views.TrendingMoviesView.as_view(), name='trending-movies'),
     path('recommendations', views.RecommendationsView.as_view(), name='recommendations'),
     path('favourites', views.FavouritesView.as_view(), name='favourites'),
+    path('favourites/bulk', views.BulkFavouritesView.as_view(), name='favourites-bulk'),
     path('genres', views.GenresView.as_view(), name='genres'),
+    path('images/<str:file_name>', views.MovieImageView.as_view(), name='movie-image'),
     path('<str:movie_id>', views.MovieDetailsView.as_view(), name='movie-details'),
+    path('<str:movie_id>/seasons', views.SeriesSeasonsView.as_view(), name='series-seasons'),
+    path('<str:movie_id>/seasons/<int:season_number>/episodes', views.SeasonEpisodesView.as_view(), name='season-episodes'),
 ]
\ No newline at end of file
@@ -1,17 +1,60 @@
 from django.core.paginator import Paginator
+from django.http import FileResponse
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from apps.common.network import get_client_ip
+from apps.common.pagination import (
+    KeysetPaginator, FixedPageAdapter, PaginationQuerySerializer, CursorPaginationQuerySerializer
+)
 from apps.common.responses import success_response, error_response
+from apps.users.genres import GenreMembershipService
 from apps.users.models import UserFavourite, Genre
-from .services import TMDbService
-from .serializers import FavouriteMovieSerializer, SearchQuerySerializer, PaginationQuerySerializer
+from .images import ImageProxyService, ImageBusy, ImageNotFound
+from .services import TMDbService, TrendingService, FavouritesService
+from .serializers import (
+    FavouriteMovieSerializer, BulkFavouritesSerializer, MovieBatchQuerySerializer,
+    MovieDetailsQuerySerializer, SearchQuerySerializer, TrendingQuerySerializer, ImageQuerySerializer
+)
 
 User = get_user_model()
 
 
-class SearchMoviesView(APIView):
+class UpstreamPageMixin:
+    """(page, limit) and cursor windows over TMDb's fixed 20-item pages"""
+    
+    def get_window(self, params, fetch_page):
+        """Get (items, pagination) or None if TMDb failed
+        
+        Raises ValueError for a malformed cursor.
+        """
+        limit = params['limit']
+        cursor = params.get('cursor')
+        
+        if cursor:
+            offset = FixedPageAdapter.decode_cursor(cursor)
+        else:
+            offset = (params['page'] - 1) * limit
+        
+        window = FixedPageAdapter(fetch_page).window(offset, limit)
+        if window is None:
+            return None
+        
+        items, total = window
+        has_next = offset + limit < total
+        
+        return items, {
+            "page": offset // limit + 1,
+            "limit": limit,
+            "total": total,
+            "total_pages": (total + limit - 1) // limit,
+            "next_cursor": FixedPageAdapter.encode_cursor(offset + limit) if has_next else None,
+            "has_next": has_next
+        }
+
+
+class SearchMoviesView(UpstreamPageMixin, APIView):
     """Search movies endpoint"""
     permission_classes = [AllowAny]
     
@@ -25,52 +68,46 @@ class SearchMoviesView(APIView):
                 serializer.errors
             )
         
+        tmdb_service = TMDbService()
         query = serializer.validated_data['q']
-        page = serializer.validated_data['page']
-        limit = serializer.validated_data['limit']
         
-        tmdb_service = TMDbService()
+        def fetch_page(page):
+            return tmdb_service.search_movies(query, page)
         
-        # Get data from TMDb
-        tmdb_data = tmdb_service.search_movies(query, page)
+        try:
+            window = self.get_window(serializer.validated_data, fetch_page)
+        except ValueError:
+            return error_response(
+                "Invalid cursor",
+                "INVALID_CURSOR"
+            )
         
-        if not tmdb_data or 'results' not in tmdb_data:
+        if window is None:
             return error_response(
                 "Failed to search movies",
                 "SEARCH_FAILED"
             )
         
-        # Format movies
-        movies = [
-            tmdb_service.format_movie_list_item(item, request.user)
-            for item in tmdb_data['results']
-        ]
+        items, pagination = window
         
-        # Apply pagination to match our API format
-        paginator = Paginator(movies, limit)
+        # Filter only movies and TV shows, after slicing so windows line up with TMDb pages
+        items = [item for item in items if item.get('media_type') in ['movie', 'tv']]
         
-        try:
-            page_obj = paginator.page(1)  # We already got the right page from TMDb
-        except:
-            page_obj = paginator.page(1)
+        # Format movies
+        movies = tmdb_service.format_movie_list(items, request.user)
         
         return success_response({
             "movies": movies,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": tmdb_data.get('total_results', len(movies)),
-                "total_pages": tmdb_data.get('total_pages', 1)
-            }
+            "pagination": pagination
         })
 
 
-class PopularMoviesView(APIView):
+class PopularMoviesView(UpstreamPageMixin, APIView):
     """Popular movies endpoint"""
     permission_classes = [AllowAny]
     
     def get(self, request):
-        serializer = PaginationQuerySerializer(data=request.query_params)
+        serializer = CursorPaginationQuerySerializer(data=request.query_params)
         
         if not serializer.is_valid():
             return error_response(
@@ -79,43 +116,39 @@ class PopularMoviesView(APIView):
                 serializer.errors
             )
         
-        page = serializer.validated_data['page']
-        limit = serializer.validated_data['limit']
-        
         tmdb_service = TMDbService()
         
-        # Get data from TMDb
-        tmdb_data = tmdb_service.get_popular_movies(page)
+        try:
+            window = self.get_window(serializer.validated_data, tmdb_service.get_popular_movies)
+        except ValueError:
+            return error_response(
+                "Invalid cursor",
+                "INVALID_CURSOR"
+            )
         
-        if not tmdb_data or 'results' not in tmdb_data:
+        if window is None:
             return error_response(
                 "Failed to get popular movies",
                 "FETCH_FAILED"
             )
         
+        items, pagination = window
+        
         # Format movies
-        movies = [
-            tmdb_service.format_movie_list_item(item, request.user)
-            for item in tmdb_data['results']
-        ]
+        movies = tmdb_service.format_movie_list(items, request.user)
         
         return success_response({
             "movies": movies,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": tmdb_data.get('total_results', len(movies)),
-                "total_pages": tmdb_data.get('total_pages', 1)
-            }
+            "pagination": pagination
         })
 
 
-class ComingSoonView(APIView):
+class ComingSoonView(UpstreamPageMixin, APIView):
     """Coming soon movies endpoint"""
     permission_classes = [AllowAny]
     
     def get(self, request):
-        serializer = PaginationQuerySerializer(data=request.query_params)
+        serializer = CursorPaginationQuerySerializer(data=request.query_params)
         
         if not serializer.is_valid():
             return error_response(
@@ -124,43 +157,39 @@ class ComingSoonView(APIView):
                 serializer.errors
             )
         
-        page = serializer.validated_data['page']
-        limit = serializer.validated_data['limit']
-        
         tmdb_service = TMDbService()
         
-        # Get data from TMDb
-        tmdb_data = tmdb_service.get_upcoming_movies(page)
+        try:
+            window = self.get_window(serializer.validated_data, tmdb_service.get_upcoming_movies)
+        except ValueError:
+            return error_response(
+                "Invalid cursor",
+                "INVALID_CURSOR"
+            )
         
-        if not tmdb_data or 'results' not in tmdb_data:
+        if window is None:
             return error_response(
                 "Failed to get upcoming movies",
                 "FETCH_FAILED"
             )
         
+        items, pagination = window
+        
         # Format movies
-        movies = [
-            tmdb_service.format_movie_list_item(item, request.user)
-            for item in tmdb_data['results']
-        ]
+        movies = tmdb_service.format_movie_list(items, request.user)
         
         return success_response({
             "movies": movies,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": tmdb_data.get('total_results', len(movies)),
-                "total_pages": tmdb_data.get('total_pages', 1)
-            }
+            "pagination": pagination
         })
 
 
-class RecommendationsView(APIView):
+class RecommendationsView(UpstreamPageMixin, APIView):
     """Personalized recommendations endpoint"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = PaginationQuerySerializer(data=request.query_params)
+        serializer = CursorPaginationQuerySerializer(data=request.query_params)
         
         if not serializer.is_valid():
             return error_response(
@@ -169,34 +198,36 @@ class RecommendationsView(APIView):
                 serializer.errors
             )
         
-        page = serializer.validated_data['page']
-        limit = serializer.validated_data['limit']
-        
         tmdb_service = TMDbService()
         
-        # Get personalized recommendations
-        tmdb_data = tmdb_service.get_recommendations_for_user(request.user, page)
+        # Resolve the user's genres here, not once per page in the fetch threads
+        GenreMembershipService.get_genre_ids(request.user.id)
+        
+        def fetch_page(page):
+            return tmdb_service.get_recommendations_for_user(request.user, page)
+        
+        try:
+            window = self.get_window(serializer.validated_data, fetch_page)
+        except ValueError:
+            return error_response(
+                "Invalid cursor",
+                "INVALID_CURSOR"
+            )
         
-        if not tmdb_data or 'results' not in tmdb_data:
+        if window is None:
             return error_response(
                 "Failed to get recommendations",
                 "FETCH_FAILED"
             )
         
+        items, pagination = window
+        
         # Format movies
-        movies = [
-            tmdb_service.format_movie_list_item(item, request.user)
-            for item in tmdb_data['results']
-        ]
+        movies = tmdb_service.format_movie_list(items, request.user)
         
         return success_response({
             "movies": movies,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": tmdb_data.get('total_results', len(movies)),
-                "total_pages": tmdb_data.get('total_pages', 1)
-            }
+            "pagination": pagination
         })
 
 
@@ -205,10 +236,22 @@ class MovieDetailsView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, movie_id):
+        serializer = MovieDetailsQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        # Every section unless the client narrows them down
+        include = serializer.validated_data.get('include')
+        
         tmdb_service = TMDbService()
         
         # Get movie details from TMDb
-        movie_data = tmdb_service.get_movie_details(movie_id)
+        movie_data = tmdb_service.get_movie_details(movie_id, include)
         
         if not movie_data or 'success' in movie_data:
             return error_response(
@@ -218,13 +261,183 @@ class MovieDetailsView(APIView):
             )
         
         # Format movie details
-        movie = tmdb_service.format_movie_details(movie_data, request.user)
+        movie = tmdb_service.format_movie_details(movie_data, request.user, include)
+        
+        # Feed the trending counters
+        if request.user and request.user.is_authenticated:
+            viewer_id = str(request.user.id)
+        else:
+            viewer_id = get_client_ip(request)
+        TrendingService().record_view(movie['id'], viewer_id)
         
         return success_response({
             "movie": movie
         })
 
 
+class SeriesSeasonsView(APIView):
+    """Season summaries of a series"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, movie_id):
+        seasons = TMDbService().get_series_seasons(movie_id)
+        
+        if seasons is None:
+            return error_response(
+                "Series not found",
+                "SERIES_NOT_FOUND",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        
+        return success_response({
+            "id": movie_id,
+            "seasons": seasons
+        })
+
+
+class SeasonEpisodesView(APIView):
+    """Episodes of one season, paginated"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, movie_id, season_number):
+        serializer = PaginationQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        page = serializer.validated_data['page']
+        limit = serializer.validated_data['limit']
+        
+        tmdb_service = TMDbService()
+        season_data = tmdb_service.get_season_details(movie_id, season_number)
+        
+        if not season_data or 'success' in season_data or 'episodes' not in season_data:
+            return error_response(
+                "Season not found",
+                "SEASON_NOT_FOUND",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        
+        paginator = Paginator(season_data['episodes'], limit)
+        
+        try:
+            page_obj = paginator.page(page)
+        except:
+            return error_response(
+                "Invalid page number",
+                "INVALID_PAGE"
+            )
+        
+        return success_response({
+            "season": tmdb_service.format_season_summary(season_data),
+            "episodes": [tmdb_service.format_episode(ep) for ep in page_obj],
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": paginator.count,
+                "total_pages": paginator.num_pages
+            }
+        })
+
+
+class MovieBatchView(APIView):
+    """Several movies in one request, e.g. a carousel"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        serializer = MovieBatchQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        movie_ids = serializer.validated_data['ids']
+        
+        tmdb_service = TMDbService()
+        details = tmdb_service.get_movie_details_many(movie_ids, include=())
+        
+        found = {
+            movie_id: movie_data for movie_id, movie_data in details.items()
+            if movie_data and 'success' not in movie_data
+        }
+        formatted = tmdb_service.format_movie_list(list(found.values()), request.user)
+        
+        movies = dict(zip(found, formatted))
+        errors = {
+            movie_id: {
+                "code": "MOVIE_NOT_FOUND",
+                "message": "Movie not found"
+            }
+            for movie_id in movie_ids if movie_id not in found
+        }
+        
+        return success_response({
+            "movies": movies,
+            "errors": errors
+        })
+
+
+class TrendingMoviesView(APIView):
+    """Trending on Cinemate endpoint"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        serializer = TrendingQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        page = serializer.validated_data['page']
+        limit = serializer.validated_data['limit']
+        window = serializer.validated_data['window']
+        
+        trending = TrendingService().get_trending(window, (page - 1) * limit, limit)
+        
+        # Resolve movie data from the TMDb cache
+        tmdb_service = TMDbService()
+        movies = []
+        
+        details = tmdb_service.get_movie_details_many(
+            [entry['movie_id'] for entry in trending['results']],
+            include=()
+        )
+        found = [
+            (entry, details[entry['movie_id']])
+            for entry in trending['results']
+            if details[entry['movie_id']] and 'success' not in details[entry['movie_id']]
+        ]
+        formatted = tmdb_service.format_movie_list([movie_data for _, movie_data in found], request.user)
+        
+        for (entry, _), movie in zip(found, formatted):
+            movie['trending'] = {
+                "score": entry['score'],
+                "unique_viewers": entry['unique_viewers']
+            }
+            movies.append(movie)
+        
+        return success_response({
+            "movies": movies,
+            "window": window,
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": trending['total'],
+                "total_pages": (trending['total'] + limit - 1) // limit
+            }
+        })
+
+
 class FavouritesView(APIView):
     """Favourites management endpoint"""
     permission_classes = [IsAuthenticated]
@@ -242,16 +455,15 @@ class FavouritesView(APIView):
         
         movie_id = serializer.validated_data['movie_id']
         
-        # Check if already in favourites
-        if UserFavourite.objects.filter(user=request.user, movie_id=movie_id).exists():
+        # Add to favourites
+        results = FavouritesService.add_many(request.user, [movie_id])
+        
+        if results[movie_id] == 'already_favourite':
             return error_response(
                 "Movie already in favourites",
                 "ALREADY_FAVOURITE"
             )
         
-        # Add to favourites
-        UserFavourite.objects.create(user=request.user, movie_id=movie_id)
-        
         return success_response(
             message="Movie added to favourites",
             status_code=status.HTTP_201_CREATED
@@ -259,7 +471,7 @@ class FavouritesView(APIView):
     
     def get(self, request):
         """Get user's favourite movies"""
-        serializer = PaginationQuerySerializer(data=request.query_params)
+        serializer = CursorPaginationQuerySerializer(data=request.query_params)
         
         if not serializer.is_valid():
             return error_response(
@@ -270,39 +482,57 @@ class FavouritesView(APIView):
         
         page = serializer.validated_data['page']
         limit = serializer.validated_data['limit']
+        cursor = serializer.validated_data.get('cursor')
         
         # Get user's favourites
-        favourites = UserFavourite.objects.filter(user=request.user).order_by('-created_at')
-        
-        # Paginate
-        paginator = Paginator(favourites, limit)
-        
-        try:
-            page_obj = paginator.page(page)
-        except:
-            return error_response(
-                "Invalid page number",
-                "INVALID_PAGE"
-            )
+        favourites = UserFavourite.objects.filter(user=request.user)
+        
+        # Cursor pagination when a cursor is passed (empty for the first page)
+        if cursor is not None:
+            try:
+                page_obj, next_cursor = KeysetPaginator(favourites, limit).page(cursor)
+            except ValueError:
+                return error_response(
+                    "Invalid cursor",
+                    "INVALID_CURSOR"
+                )
+            
+            pagination = {
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None
+            }
+        else:
+            # Paginate
+            paginator = Paginator(favourites.order_by('-created_at', '-id'), limit)
+            
+            try:
+                page_obj = paginator.page(page)
+            except:
+                return error_response(
+                    "Invalid page number",
+                    "INVALID_PAGE"
+                )
+            
+            pagination = {
+                "page": page,
+                "limit": limit,
+                "total": paginator.count,
+                "total_pages": paginator.num_pages,
+                "next_cursor": KeysetPaginator.encode_cursor(page_obj[-1]) if page_obj.has_next() else None
+            }
         
         # Get movie details for favourites
         tmdb_service = TMDbService()
-        movies = []
-        
-        for favourite in page_obj:
-            movie_data = tmdb_service.get_movie_details(favourite.movie_id)
-            if movie_data and 'success' not in movie_data:
-                movie = tmdb_service.format_movie_list_item(movie_data, request.user)
-                movies.append(movie)
+        details = tmdb_service.get_movie_details_many([favourite.movie_id for favourite in page_obj], include=())
+        movies = tmdb_service.format_movie_list(
+            [movie_data for movie_data in details.values() if movie_data and 'success' not in movie_data],
+            request.user
+        )
         
         return success_response({
             "movies": movies,
-            "pagination": {
-                "page": page,
-                "limit": limit,
-                "total": paginator.count,
-                "total_pages": paginator.num_pages
-            }
+            "pagination": pagination
         })
     
     def delete(self, request):
@@ -331,6 +561,99 @@ class FavouritesView(APIView):
         return success_response(message="Movie removed from favourites")
 
 
+class BulkFavouritesView(APIView):
+    """Add or remove several favourites in one request"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        """Add movies to favourites"""
+        serializer = BulkFavouritesSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid data",
+                "INVALID_DATA",
+                serializer.errors
+            )
+        
+        results = FavouritesService.add_many(request.user, serializer.validated_data['movie_ids'])
+        added = sum(1 for outcome in results.values() if outcome == 'added')
+        
+        return success_response({
+            "results": results,
+            "added": added
+        }, f"{added} movies added to favourites")
+    
+    def delete(self, request):
+        """Remove movies from favourites"""
+        serializer = BulkFavouritesSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid data",
+                "INVALID_DATA",
+                serializer.errors
+            )
+        
+        results = FavouritesService.remove_many(request.user, serializer.validated_data['movie_ids'])
+        removed = sum(1 for outcome in results.values() if outcome == 'removed')
+        
+        return success_response({
+            "results": results,
+            "removed": removed
+        }, f"{removed} movies removed from favourites")
+
+
+class MovieImageView(APIView):
+    """Resized poster, backdrop and still images"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request, file_name):
+        serializer = ImageQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid() or not ImageProxyService.FILE_NAME.match(file_name):
+            return error_response(
+                "Invalid image request",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        width = ImageProxyService.snap_width(serializer.validated_data['w'])
+        image_format = serializer.validated_data.get('fm')
+        negotiated = not image_format
+        if negotiated:
+            image_format = ImageProxyService.negotiate_format(request.META.get('HTTP_ACCEPT', ''))
+        
+        try:
+            image_file = ImageProxyService.open_variant(file_name, width, image_format)
+        except ImageNotFound:
+            return error_response(
+                "Image not found",
+                "IMAGE_NOT_FOUND",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        except ImageBusy:
+            return error_response(
+                "Too many images are being prepared, try again shortly",
+                "IMAGE_BUSY",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except OSError as e:
+            print(f"Image proxy error for {file_name}: {e}")
+            return error_response(
+                "Failed to prepare image",
+                "IMAGE_FAILED",
+                status_code=status.HTTP_502_BAD_GATEWAY
+            )
+        
+        response = FileResponse(image_file, content_type=ImageProxyService.FORMATS[image_format][1])
+        # TMDb image paths never change content, so variants never go stale
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        if negotiated:
+            response['Vary'] = 'Accept'
+        return response
+
+
 class GenresView(APIView):
     """Genres endpoint"""
     permission_classes = [AllowAny]
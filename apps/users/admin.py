@@ -84,6 +84,6 @@ class PasswordResetAdmin(admin.ModelAdmin):
 
 @admin.register(IPBlacklist)
 class IPBlacklistAdmin(admin.ModelAdmin):
-    list_display = ['ip_address', 'reason', 'blocked_until', 'created_at']
+    list_display = ['ip_address', 'prefix_length', 'reason', 'blocked_until', 'created_at']
     list_filter = ['blocked_until', 'created_at']
     search_fields = ['ip_address', 'reason']
\ No newline at end of file
@@ -0,0 +1,135 @@
+import time
+import threading
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from apps.users.models import User, Genre, UserGenre
+
+# Sent after commit when a user's genres change, with user_id, added and removed
+genres_changed = Signal()
+
+
+class GenreRegistry:
+    """Cached map of genre ids to names
+    
+    Genres change only when they are synced from TMDb, so the map is kept in
+    Redis and, for a minute at a time, in process memory.
+    """
+    
+    CACHE_KEY = 'genre_registry'
+    CACHE_TTL = 86400
+    LOCAL_TTL = 60
+    
+    _local = None
+    _loaded_at = 0
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_all(cls) -> dict:
+        """All genres as {id: name}"""
+        local = cls._local
+        if local is not None and time.monotonic() - cls._loaded_at < cls.LOCAL_TTL:
+            return local
+        
+        with cls._lock:
+            genres = cache.get(cls.CACHE_KEY)
+            if genres is None:
+                genres = dict(Genre.objects.values_list('id', 'name'))
+                cache.set(cls.CACHE_KEY, genres, cls.CACHE_TTL)
+            
+            cls._local = genres
+            cls._loaded_at = time.monotonic()
+            return genres
+    
+    @classmethod
+    def invalid_ids(cls, genre_ids) -> list:
+        """Ids that are not known genres"""
+        genres = cls.get_all()
+        return [genre_id for genre_id in genre_ids if str(genre_id) not in genres]
+    
+    @classmethod
+    def names(cls, genre_ids) -> list:
+        """Names of known genres, in order"""
+        genres = cls.get_all()
+        return [genres[str(genre_id)] for genre_id in genre_ids if str(genre_id) in genres]
+    
+    @classmethod
+    def invalidate(cls):
+        cache.delete(cls.CACHE_KEY)
+        cls._local = None
+
+
+class GenreMembershipService:
+    """Set-based updates of a user's preferred genres"""
+    
+    CACHE_TTL = 3600
+    
+    @staticmethod
+    def cache_key(user_id):
+        return f"user_genres_{user_id}"
+    
+    @staticmethod
+    def get_genre_ids(user_id) -> list:
+        """A user's genre ids, sorted, from the cache when possible"""
+        cache_key = GenreMembershipService.cache_key(user_id)
+        genre_ids = cache.get(cache_key)
+        
+        if genre_ids is None:
+            genre_ids = sorted(UserGenre.objects.filter(user_id=user_id).values_list('genre_id', flat=True))
+            cache.set(cache_key, genre_ids, GenreMembershipService.CACHE_TTL)
+        
+        return genre_ids
+    
+    @staticmethod
+    def set_genres(user, genre_ids):
+        """Replace a user's genres with one delete and one insert
+        
+        Unknown ids are ignored. The user's row is locked first, so concurrent
+        updates apply one after the other instead of merging.
+        """
+        desired = {str(genre_id) for genre_id in genre_ids} - set(GenreRegistry.invalid_ids(genre_ids))
+        
+        with transaction.atomic():
+            list(User.objects.select_for_update().filter(id=user.id).values_list('id', flat=True))
+            current = set(UserGenre.objects.filter(user=user).values_list('genre_id', flat=True))
+            added = desired - current
+            removed = current - desired
+            
+            if removed:
+                UserGenre.objects.filter(user=user).exclude(genre_id__in=desired).delete()
+            
+            if added:
+                UserGenre.objects.bulk_create(
+                    [UserGenre(user=user, genre_id=genre_id) for genre_id in sorted(added)],
+                    ignore_conflicts=True
+                )
+            
+            GenreMembershipService._announce(user.id, added, removed)
+        
+        return desired
+    
+    @staticmethod
+    def add_genres(user, genre_ids):
+        """Add genres to a user, e.g. a new one, without reading the current set"""
+        added = {str(genre_id) for genre_id in genre_ids} - set(GenreRegistry.invalid_ids(genre_ids))
+        
+        if added:
+            UserGenre.objects.bulk_create(
+                [UserGenre(user=user, genre_id=genre_id) for genre_id in sorted(added)],
+                ignore_conflicts=True
+            )
+            GenreMembershipService._announce(user.id, added, set())
+        
+        return added
+    
+    @staticmethod
+    def _announce(user_id, added, removed):
+        if not added and not removed:
+            return
+        
+        transaction.on_commit(lambda: genres_changed.send(
+            sender=GenreMembershipService,
+            user_id=user_id,
+            added=sorted(added),
+            removed=sorted(removed)
+        ))
\ No newline at end of file
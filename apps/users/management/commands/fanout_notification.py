@@ -0,0 +1,58 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.models import UserNotification
+from apps.users.services import NotificationFanoutService
+
+
+class Command(BaseCommand):
+    help = 'Send a notification to every active user, or resume an interrupted fan-out job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job-id', help='Job id to resume; a new one is generated if omitted')
+        parser.add_argument(
+            '--type',
+            default='system_update',
+            choices=[choice for choice, _ in UserNotification.NOTIFICATION_TYPES]
+        )
+        parser.add_argument('--title')
+        parser.add_argument('--message')
+        parser.add_argument('--image')
+        parser.add_argument('--movie-id')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--max-rows-per-second', type=int)
+
+    def handle(self, *args, **options):
+        job_id = options['job_id'] or str(uuid.uuid4())
+        
+        notification = None
+        if options['title'] and options['message']:
+            notification = {
+                'type': options['type'],
+                'title': options['title'],
+                'message': options['message'],
+                'image': options['image'],
+                'movie_id': options['movie_id'],
+            }
+        elif not options['job_id']:
+            raise CommandError('--title and --message are required for a new job')
+        
+        self.stdout.write(f'Fan-out job {job_id}')
+        
+        service = NotificationFanoutService(
+            job_id,
+            notification,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            max_rows_per_second=options['max_rows_per_second'],
+            progress_callback=lambda state: self.stdout.write(f"Processed {state['processed']} users")
+        )
+        
+        try:
+            state = service.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        self.stdout.write(
+            self.style.SUCCESS(f"Fan-out job {job_id} complete: {state['processed']} users")
+        )
\ No newline at end of file
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userfavourite',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='user_fav_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userhistory',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='user_hist_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='user_notif_user_created_idx'),
+        ),
+    ]
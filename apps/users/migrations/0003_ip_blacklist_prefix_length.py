@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ipblacklist',
+            name='prefix_length',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Block the whole network, e.g. 24 for a /24. Empty blocks the single address.', null=True),
+        ),
+    ]
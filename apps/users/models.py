@@ -1,5 +1,7 @@
 import uuid
+import ipaddress
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
@@ -119,6 +121,9 @@ class UserFavourite(models.Model):
     class Meta:
         db_table = 'user_favourites'
         unique_together = ['user', 'movie_id']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='user_fav_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email_address} - {self.movie_id}"
@@ -147,6 +152,9 @@ class UserNotification(models.Model):
     class Meta:
         db_table = 'user_notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='user_notif_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email_address} - {self.title}"
@@ -162,6 +170,9 @@ class UserHistory(models.Model):
     class Meta:
         db_table = 'user_history'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='user_hist_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email_address} - {self.movie_id}"
@@ -235,6 +246,10 @@ class IPBlacklist(models.Model):
     """IP blacklist for security"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     ip_address = models.GenericIPAddressField()
+    prefix_length = models.PositiveSmallIntegerField(
+        null=True, blank=True,
+        help_text="Block the whole network, e.g. 24 for a /24. Empty blocks the single address."
+    )
     reason = models.TextField(null=True, blank=True)
     blocked_until = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -244,4 +259,24 @@ class IPBlacklist(models.Model):
         db_table = 'ip_blacklist'
     
     def __str__(self):
-        return f"{self.ip_address} - {self.reason}"
\ No newline at end of file
+        return f"{self.network} - {self.reason}"
+    
+    @property
+    def network(self):
+        return self.build_network(self.ip_address, self.prefix_length)
+    
+    @staticmethod
+    def build_network(ip_address, prefix_length=None):
+        """Network covered by an entry, a single-address network without a prefix"""
+        address = ipaddress.ip_address(ip_address)
+        if prefix_length is None:
+            prefix_length = address.max_prefixlen
+        return ipaddress.ip_network(f"{address}/{prefix_length}", strict=False)
+    
+    def clean(self):
+        super().clean()
+        if self.ip_address and self.prefix_length is not None:
+            try:
+                self.network
+            except ValueError:
+                raise ValidationError({'prefix_length': "Prefix length is too long for this address"})
\ No newline at end of file
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from apps.authentication.hashing import PasswordHashingService
+from apps.common.pagination import CursorPaginationQuerySerializer
+from apps.users.genres import GenreRegistry, GenreMembershipService
 from apps.users.models import Genre, UserGenre, UserNotification
 
 User = get_user_model()
@@ -13,24 +17,6 @@ class GenreSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
-    """User profile serializer"""
-    name = serializers.CharField(source='full_name', max_length=100)
-    email = serializers.EmailField(source='email_address')
-    genres = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = User
-        fields = ['id', 'name', 'email', 'genres', 'maturity_filter', 'preferred_language']
-        read_only_fields = ['id']
-    
-    def get_genres(self, obj):
-        """Get user's preferred genre IDs from UserGenre table"""
-        # Using prefetch_related in the view would be more efficient
-        user_genres = UserGenre.objects.filter(user=obj).select_related('genre')
-        return [ug.genre.id for ug in user_genres]
-
-
 class UserProfileDetailSerializer(serializers.ModelSerializer):
     """Detailed user profile serializer with prefetched genres as IDs"""
     name = serializers.CharField(source='full_name', max_length=100)
@@ -44,7 +30,7 @@ class UserProfileDetailSerializer(serializers.ModelSerializer):
     
     def get_genres(self, obj):
         """Get user's preferred genre IDs from prefetched UserGenre relationship"""
-        return [ug.genre.id for ug in obj.user_genres.all()]
+        return [ug.genre_id for ug in obj.user_genres.all()]
 
 
 class UpdateProfileSerializer(serializers.Serializer):
@@ -72,8 +58,7 @@ class UpdateProfileSerializer(serializers.Serializer):
     def validate_genres(self, value):
         """Validate that all genre IDs exist"""
         if value:
-            existing_genres = set(Genre.objects.filter(id__in=value).values_list('id', flat=True))
-            invalid_genres = set(value) - existing_genres
+            invalid_genres = set(GenreRegistry.invalid_ids(value))
             if invalid_genres:
                 raise serializers.ValidationError(f'Invalid genre IDs: {list(invalid_genres)}')
         return value
@@ -92,28 +77,12 @@ class UpdateProfileSerializer(serializers.Serializer):
         if 'preferred_language' in validated_data:
             instance.preferred_language = validated_data['preferred_language']
         
-        instance.save()
-        
-        # Update genres in UserGenre table
-        if genres_data is not None:
-            # Remove existing user genres
-            UserGenre.objects.filter(user=instance).delete()
-            
-            # Add new genres
-            user_genres_to_create = []
-            for genre_id in genres_data:
-                try:
-                    genre = Genre.objects.get(id=genre_id)
-                    user_genres_to_create.append(
-                        UserGenre(user=instance, genre=genre)
-                    )
-                except Genre.DoesNotExist:
-                    # This should be caught by validate_genres, but keeping as safety
-                    continue
+        with transaction.atomic():
+            instance.save()
             
-            # Bulk create for better performance
-            if user_genres_to_create:
-                UserGenre.objects.bulk_create(user_genres_to_create)
+            # Update genres in UserGenre table
+            if genres_data is not None:
+                GenreMembershipService.set_genres(instance, genres_data)
         
         return instance
 
@@ -126,7 +95,8 @@ class ChangePasswordSerializer(serializers.Serializer):
     def validate_old_password(self, value):
         """Validate old password"""
         user = self.context['request'].user
-        if not user.check_password(value):
+        valid, _ = PasswordHashingService.verify_password(value, user.password)
+        if not valid:
             raise serializers.ValidationError('Current password is incorrect')
         return value
     
@@ -139,7 +109,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     def save(self):
         """Save new password"""
         user = self.context['request'].user
-        user.set_password(self.validated_data['new_password'])
+        user.password = PasswordHashingService.hash_password(self.validated_data['new_password'])
         user.save()
         return user
 
@@ -153,6 +123,11 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class NotificationsQuerySerializer(CursorPaginationQuerySerializer):
+    """Serializer for notification list query parameters"""
+    unread_only = serializers.BooleanField(default=False)
+
+
 class MarkNotificationReadSerializer(serializers.Serializer):
     """Mark notification as read serializer"""
     notification_id = serializers.UUIDField()
@@ -0,0 +1,418 @@
+import json
+import time
+import uuid
+import redis
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from apps.users.models import User, UserNotification, UserFavourite, UserHistory
+from apps.users.serializers import NotificationSerializer, UserProfileDetailSerializer
+
+
+class NotificationService:
+    """Service for user notifications"""
+    
+    BROADCAST_CHANNEL = 'notifications:broadcast'
+    
+    @staticmethod
+    def channel(user_id):
+        """Pub/sub channel of a user's new notifications"""
+        return f"notifications:{user_id}"
+    
+    @staticmethod
+    def publish(notification):
+        """Push a new notification to the user's open streams once the transaction commits"""
+        channel = NotificationService.channel(notification.user_id)
+        data = json.dumps(NotificationSerializer(notification).data)
+        
+        transaction.on_commit(lambda: NotificationService._publish(channel, data))
+    
+    @staticmethod
+    def publish_broadcast(notification):
+        """Push a notification sent to every user to all open streams"""
+        data = json.dumps({'broadcast': True, **notification})
+        NotificationService._publish(NotificationService.BROADCAST_CHANNEL, data)
+    
+    @staticmethod
+    def _publish(channel, data):
+        try:
+            get_redis_connection('default').publish(channel, data)
+        except redis.RedisError as e:
+            # Streams are best effort, clients catch up on reconnect
+            print(f"Notification publish error: {e}")
+    
+    @staticmethod
+    def unread_count_key(user_id):
+        """Cache key of a user's unread notification counter"""
+        return f"notifications_unread_{user_id}"
+    
+    @staticmethod
+    def get_unread_count(user_id):
+        """Get unread notification count, rebuilding it from the database on a miss"""
+        count = cache.get(NotificationService.unread_count_key(user_id))
+        
+        if count is None:
+            count = NotificationService.reconcile_unread_count(user_id)
+        
+        return count
+    
+    @staticmethod
+    def reconcile_unread_count(user_id):
+        """Recount unread notifications from the database and cache the result"""
+        count = UserNotification.objects.filter(user_id=user_id, read=False).count()
+        
+        # The counter expires so drift is periodically corrected from the database
+        cache.set(
+            NotificationService.unread_count_key(user_id),
+            count,
+            settings.NOTIFICATION_UNREAD_COUNT_TTL
+        )
+        return count
+    
+    @staticmethod
+    def adjust_unread_count(user_id, delta):
+        """Apply a change to the unread counter once the current transaction commits"""
+        key = NotificationService.unread_count_key(user_id)
+        
+        def apply():
+            try:
+                if delta >= 0:
+                    count = cache.incr(key, delta)
+                else:
+                    count = cache.decr(key, -delta)
+            except ValueError:
+                # Counter is not cached, the next read rebuilds it
+                return
+            
+            if count < 0:
+                cache.delete(key)
+        
+        transaction.on_commit(apply)
+
+
+class ProfileService:
+    """Cached profile documents
+    
+    The document is built from the authenticated user plus one query for
+    their genres and kept until the user or their genres change.
+    """
+    
+    # User fields that appear in the profile document
+    FIELDS = {'full_name', 'email_address', 'maturity_filter', 'preferred_language'}
+    
+    @staticmethod
+    def cache_key(user_id):
+        return f"profile_{user_id}"
+    
+    @staticmethod
+    def get_profile(user):
+        """Get a user's profile document, building it on a miss"""
+        cache_key = ProfileService.cache_key(user.id)
+        profile = cache.get(cache_key)
+        
+        if profile is None:
+            prefetch_related_objects([user], 'user_genres')
+            profile = dict(UserProfileDetailSerializer(user).data)
+            cache.set(cache_key, profile, settings.PROFILE_CACHE_TTL)
+        
+        return profile
+    
+    @staticmethod
+    def invalidate(user_id):
+        cache.delete(ProfileService.cache_key(user_id))
+
+
+class DataTransferService:
+    """NDJSON export and import of a user's favourites, history and notifications
+    
+    Both directions stream: exports iterate the database in chunks and
+    imports parse one line at a time and write in batches, so memory use
+    does not grow with the size of the data.
+    """
+    
+    # kind: (model, exported fields)
+    KINDS = {
+        'favourites': (UserFavourite, ['movie_id', 'created_at']),
+        'history': (UserHistory, ['movie_id', 'created_at']),
+        'notifications': (
+            UserNotification,
+            ['type', 'title', 'message', 'image', 'movie_id', 'read', 'created_at']
+        ),
+    }
+    
+    MAX_ERRORS = 20
+    
+    def __init__(self, user):
+        self.user = user
+    
+    def _queryset(self, kind):
+        model, fields = self.KINDS[kind]
+        return model.objects.filter(user=self.user).order_by('created_at', 'id').values(*fields)
+    
+    def _line(self, kind, row):
+        return (json.dumps({'kind': kind, **row}, cls=DjangoJSONEncoder) + '\n').encode()
+    
+    def export_lines(self, kinds):
+        """Yield NDJSON lines for a WSGI response"""
+        for kind in kinds:
+            for row in self._queryset(kind).iterator(chunk_size=settings.DATA_EXPORT_CHUNK_SIZE):
+                yield self._line(kind, row)
+    
+    async def aexport_lines(self, kinds):
+        """Yield NDJSON lines for an ASGI response"""
+        for kind in kinds:
+            async for row in self._queryset(kind).aiterator(chunk_size=settings.DATA_EXPORT_CHUNK_SIZE):
+                yield self._line(kind, row)
+    
+    def import_lines(self, lines):
+        """Import NDJSON lines, returning the rows inserted per kind and the first errors
+        
+        skipped counts invalid lines and duplicates counts valid ones that
+        were not inserted because the account already had them.
+        """
+        batches = {kind: [] for kind in self.KINDS}
+        imported = {kind: 0 for kind in self.KINDS}
+        errors = []
+        skipped = 0
+        duplicates = 0
+        
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            
+            if number > settings.DATA_IMPORT_MAX_LINES:
+                errors.append({"line": number, "error": "Line limit reached, the rest was not imported"})
+                break
+            
+            try:
+                kind, instance = self._parse(line)
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < self.MAX_ERRORS:
+                    errors.append({"line": number, "error": str(e)})
+                continue
+            
+            batches[kind].append(instance)
+            if len(batches[kind]) >= settings.DATA_IMPORT_BATCH_SIZE:
+                written = self._write(kind, batches[kind])
+                imported[kind] += written
+                duplicates += len(batches[kind]) - written
+                batches[kind] = []
+        
+        for kind, batch in batches.items():
+            if batch:
+                written = self._write(kind, batch)
+                imported[kind] += written
+                duplicates += len(batch) - written
+        
+        if imported['notifications']:
+            # bulk_create skips the signals that keep the counter in step
+            cache.delete(NotificationService.unread_count_key(self.user.id))
+        
+        return {"imported": imported, "skipped": skipped, "duplicates": duplicates, "errors": errors}
+    
+    def _parse(self, line):
+        try:
+            data = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError("Invalid JSON")
+        
+        if not isinstance(data, dict) or not isinstance(data.get('kind'), str) or data['kind'] not in self.KINDS:
+            raise ValueError(f"kind must be one of {', '.join(self.KINDS)}")
+        
+        kind = data['kind']
+        model, fields = self.KINDS[kind]
+        values = {field: data[field] for field in fields if field in data}
+        
+        created_at = values.pop('created_at', None)
+        if isinstance(created_at, str):
+            created_at = parse_datetime(created_at)
+        else:
+            created_at = None
+        if created_at is None:
+            raise ValueError("created_at must be an ISO 8601 datetime")
+        
+        instance = model(user=self.user, **values)
+        instance.imported_created_at = created_at
+        
+        try:
+            instance.clean_fields(exclude=['user'])
+        except ValidationError as e:
+            raise ValueError("; ".join(f"{field}: {' '.join(messages)}" for field, messages in e.message_dict.items()))
+        
+        return kind, instance
+    
+    def _write(self, kind, batch):
+        """Insert a batch and restore the original timestamps, returning the number of rows inserted"""
+        model, _ = self.KINDS[kind]
+        
+        if kind == 'favourites':
+            # Favourites are unique per movie, skip ones the user already has
+            existing = set(UserFavourite.objects.filter(
+                user=self.user,
+                movie_id__in=[instance.movie_id for instance in batch]
+            ).values_list('movie_id', flat=True))
+            
+            unique = {}
+            for instance in batch:
+                if instance.movie_id not in existing:
+                    unique.setdefault(instance.movie_id, instance)
+            batch = list(unique.values())
+            
+            if not batch:
+                return 0
+        
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=(kind == 'favourites'))
+            
+            if kind == 'favourites':
+                # ignore_conflicts skips favourites added concurrently since the read.
+                # Ids are made here, so the rows that come back are the ones inserted.
+                inserted = set(model.objects.filter(
+                    id__in=[instance.id for instance in batch]
+                ).values_list('id', flat=True))
+                batch = [instance for instance in batch if instance.id in inserted]
+            
+            # auto_now_add stamped the batch with the current time
+            for instance in batch:
+                instance.created_at = instance.imported_created_at
+            model.objects.bulk_update(batch, ['created_at'])
+        
+        return len(batch)
+
+
+class NotificationFanoutService:
+    """Fan a notification out to every active user in resumable, throttled batches
+    
+    User ids are read in keyset chunks and inserted by a thread pool with
+    bulk_create. Notification ids are derived from the job id and user id, so
+    replaying a chunk after a crash inserts nothing twice. The checkpoint only
+    advances past chunks that have completed in order.
+    """
+    
+    STATE_TTL = 7 * 86400
+    
+    def __init__(self, job_id, notification=None, users=None, chunk_size=None,
+                 workers=None, max_rows_per_second=None, progress_callback=None):
+        self.job_id = job_id
+        self.notification = notification
+        self.users = users if users is not None else User.objects.filter(is_active=True)
+        self.chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+        self.workers = workers or settings.NOTIFICATION_FANOUT_WORKERS
+        self.max_rows_per_second = (
+            max_rows_per_second if max_rows_per_second is not None
+            else settings.NOTIFICATION_FANOUT_MAX_ROWS_PER_SECOND
+        )
+        self.progress_callback = progress_callback
+        self.state_key = f"notification_fanout_{job_id}"
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_URL, f"cinemate:notification_fanout:{job_id}")
+        
+        # Only jobs sent to every user are announced on the broadcast channel
+        self.broadcast = users is None
+    
+    def run(self):
+        """Run or resume the job and return its final state"""
+        state = cache.get(self.state_key)
+        
+        if state is None:
+            if not self.notification:
+                raise ValueError(f"Unknown fan-out job {self.job_id}")
+            state = {
+                'notification': self.notification,
+                'cursor': None,
+                'processed': 0,
+                'done': False
+            }
+            cache.set(self.state_key, state, self.STATE_TTL)
+        
+        if state['done']:
+            return state
+        
+        started = time.monotonic()
+        submitted = 0
+        pending = deque()
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for user_ids in self._user_id_chunks(state['cursor']):
+                pending.append((
+                    user_ids[-1],
+                    len(user_ids),
+                    pool.submit(self._insert_chunk, state['notification'], user_ids)
+                ))
+                
+                # Keep at most one chunk in flight per worker
+                while len(pending) >= self.workers:
+                    self._checkpoint(pending.popleft(), state)
+                
+                # Throttle to protect the primary
+                submitted += len(user_ids)
+                if self.max_rows_per_second:
+                    delay = submitted / self.max_rows_per_second - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+            
+            while pending:
+                self._checkpoint(pending.popleft(), state)
+        
+        state['done'] = True
+        cache.set(self.state_key, state, self.STATE_TTL)
+        
+        if self.broadcast:
+            NotificationService.publish_broadcast(state['notification'])
+        
+        return state
+    
+    def _user_id_chunks(self, after=None):
+        """Yield chunks of user ids in primary key order"""
+        queryset = self.users.order_by('id')
+        
+        while True:
+            chunk = queryset.filter(id__gt=after) if after else queryset
+            user_ids = list(chunk.values_list('id', flat=True)[:self.chunk_size])
+            
+            if not user_ids:
+                return
+            
+            yield user_ids
+            after = user_ids[-1]
+    
+    def _insert_chunk(self, notification, user_ids):
+        """Insert one chunk of notifications (runs on a worker thread)"""
+        try:
+            UserNotification.objects.bulk_create(
+                [
+                    UserNotification(
+                        id=uuid.uuid5(self.namespace, str(user_id)),
+                        user_id=user_id,
+                        **notification
+                    )
+                    for user_id in user_ids
+                ],
+                batch_size=self.chunk_size,
+                ignore_conflicts=True
+            )
+            
+            # bulk_create skips signals, so let the unread counters rebuild
+            cache.delete_many([NotificationService.unread_count_key(user_id) for user_id in user_ids])
+        finally:
+            # Worker threads hold their own connections
+            connection.close()
+    
+    def _checkpoint(self, entry, state):
+        """Wait for the oldest chunk and record progress past it"""
+        last_user_id, count, future = entry
+        future.result()
+        
+        state['cursor'] = str(last_user_id)
+        state['processed'] += count
+        cache.set(self.state_key, state, self.STATE_TTL)
+        
+        if self.progress_callback:
+            self.progress_callback(state)
\ No newline at end of file
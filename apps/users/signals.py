@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.authentication.services import SessionCache
+from apps.common.blocklist import IPBlocklist
+from apps.common.middleware import ResponseCache
+from apps.users.genres import GenreRegistry, GenreMembershipService, genres_changed
+from apps.users.models import User, UserNotification, IPBlacklist, Genre
+from apps.users.services import NotificationService, ProfileService
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Drop cached copies of a changed user"""
+    if created:
+        return
+    
+    transaction.on_commit(lambda: SessionCache.invalidate_user(instance.id))
+    
+    # e.g. a last_login update leaves the profile as it is
+    if update_fields is None or ProfileService.FIELDS & set(update_fields):
+        transaction.on_commit(lambda: ProfileService.invalidate(instance.id))
+
+
+@receiver(post_save, sender=UserNotification)
+def notification_created(sender, instance, created, **kwargs):
+    """Count and push new notifications"""
+    if not created:
+        return
+    
+    if not instance.read:
+        NotificationService.adjust_unread_count(instance.user_id, 1)
+    
+    NotificationService.publish(instance)
+
+
+@receiver(post_delete, sender=UserNotification)
+def notification_deleted(sender, instance, **kwargs):
+    """Discount deleted unread notifications"""
+    if not instance.read:
+        NotificationService.adjust_unread_count(instance.user_id, -1)
+
+
+@receiver(post_save, sender=IPBlacklist)
+@receiver(post_delete, sender=IPBlacklist)
+def ip_blacklist_changed(sender, instance, **kwargs):
+    """Make every process reload its blocklist"""
+    transaction.on_commit(IPBlocklist.bump_version)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    """Rebuild the genre registry and retire responses that list genres"""
+    transaction.on_commit(GenreRegistry.invalidate)
+    transaction.on_commit(ResponseCache.bump_version)
+
+
+@receiver(genres_changed)
+def user_genres_changed(sender, user_id, **kwargs):
+    """Drop caches derived from a user's genres, their genre set and profile
+    
+    Recommendations are cached per genre set, so dropping the cached set is
+    enough for the user to get recommendations for the new one.
+    """
+    cache.delete_many([
+        GenreMembershipService.cache_key(user_id),
+        ProfileService.cache_key(user_id)
+    ])
\ No newline at end of file
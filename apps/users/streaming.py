@@ -0,0 +1,275 @@
+import json
+import asyncio
+from collections import defaultdict
+from urllib.parse import parse_qs
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from apps.authentication.services import JWTService
+from apps.users.models import UserNotification
+from apps.users.serializers import NotificationSerializer
+from apps.users.services import NotificationService
+
+
+class Subscription:
+    """A single stream's buffer of pending messages"""
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.channel = NotificationService.channel(user_id)
+        self.queue = asyncio.Queue()
+        self.buffered_bytes = 0
+    
+    def push(self, data):
+        """Buffer a message, closing the stream if it exceeds its memory budget"""
+        if self.buffered_bytes + len(data) > settings.NOTIFICATION_STREAM_MAX_BUFFER_BYTES:
+            # Slow consumer: drop the buffer and end the stream, the client
+            # reconnects with Last-Event-ID and catches up from the database
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.buffered_bytes = 0
+            self.queue.put_nowait(None)
+            return
+        
+        self.buffered_bytes += len(data)
+        self.queue.put_nowait(data)
+    
+    async def get(self):
+        """Wait for the next message, None once the stream has been closed"""
+        data = await self.queue.get()
+        if data is not None:
+            self.buffered_bytes -= len(data)
+        return data
+
+
+class NotificationBroker:
+    """Per-process multiplexer of Redis notification channels
+    
+    All streams in a process share one pub/sub connection. A user's channel
+    is subscribed while at least one of their streams is open.
+    """
+    
+    def __init__(self):
+        self.redis = aioredis.from_url(settings.REDIS_URL)
+        self.pubsub = self.redis.pubsub()
+        self.subscriptions = defaultdict(set)
+        self.lock = asyncio.Lock()
+        self.reader = None
+    
+    async def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        
+        async with self.lock:
+            if self.reader is None:
+                await self.pubsub.subscribe(NotificationService.BROADCAST_CHANNEL)
+                self.reader = asyncio.create_task(self._read())
+            
+            if not self.subscriptions[subscription.channel]:
+                await self.pubsub.subscribe(subscription.channel)
+            self.subscriptions[subscription.channel].add(subscription)
+        
+        return subscription
+    
+    async def unsubscribe(self, subscription):
+        async with self.lock:
+            subscribers = self.subscriptions[subscription.channel]
+            subscribers.discard(subscription)
+            
+            if not subscribers:
+                del self.subscriptions[subscription.channel]
+                await self.pubsub.unsubscribe(subscription.channel)
+    
+    async def _read(self):
+        """Dispatch published messages to the local subscriptions"""
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except redis.RedisError as e:
+                print(f"Notification stream error: {e}")
+                await asyncio.sleep(1)
+                continue
+            
+            if not message or message['type'] != 'message':
+                continue
+            
+            channel = message['channel'].decode()
+            
+            if channel == NotificationService.BROADCAST_CHANNEL:
+                subscriptions = [s for subscribers in self.subscriptions.values() for s in subscribers]
+            else:
+                subscriptions = list(self.subscriptions.get(channel, ()))
+            
+            for subscription in subscriptions:
+                subscription.push(message['data'])
+
+
+class NotificationStreamApp:
+    """Server-sent events stream of a user's new notifications
+    
+    Served directly from the ASGI application rather than through a Django
+    view, so an idle connection costs one coroutine and a small buffer and a
+    client disconnect is noticed immediately.
+    """
+    
+    path = '/profile/notifications/stream'
+    
+    def __init__(self):
+        self.broker = None
+    
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.send_error(send, 405, "Method not allowed", "METHOD_NOT_ALLOWED")
+        
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        
+        user_id = await self.authenticate(headers.get('authorization', ''))
+        if not user_id:
+            return await self.send_error(send, 401, "Session expired or invalid", "AUTHENTICATION_FAILED")
+        
+        # EventSource sends Last-Event-ID when reconnecting
+        query = parse_qs(scope.get('query_string', b'').decode())
+        last_event_id = headers.get('last-event-id') or query.get('last_event_id', [None])[0]
+        
+        if self.broker is None:
+            self.broker = NotificationBroker()
+        
+        # Subscribe before replaying so nothing published in between is lost
+        subscription = await self.broker.subscribe(user_id)
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await self.send_event(send, f"retry: {settings.NOTIFICATION_STREAM_RETRY_MS}\n\n")
+            
+            replayed = set()
+            if last_event_id:
+                notifications, complete = await sync_to_async(self.missed_notifications)(user_id, last_event_id)
+                if not complete:
+                    await self.send_event(send, "event: resync\ndata: {}\n\n")
+                for notification in notifications:
+                    replayed.add(notification['id'])
+                    await self.send_event(send, self.format_notification(json.dumps(notification)))
+            
+            await self.stream(send, subscription, disconnected, replayed)
+        finally:
+            disconnected.cancel()
+            await self.broker.unsubscribe(subscription)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    
+    async def stream(self, send, subscription, disconnected, replayed):
+        """Relay messages until the client leaves, the stream overflows or it reaches its maximum age"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_DURATION
+        getter = None
+        
+        try:
+            while loop.time() < deadline:
+                if getter is None:
+                    getter = asyncio.ensure_future(subscription.get())
+                
+                done, _ = await asyncio.wait(
+                    {getter, disconnected},
+                    timeout=settings.NOTIFICATION_STREAM_HEARTBEAT,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if disconnected in done:
+                    return
+                
+                if getter not in done:
+                    await self.send_event(send, ": heartbeat\n\n")
+                    continue
+                
+                data, getter = getter.result(), None
+                if data is None:
+                    return
+                
+                message = json.loads(data)
+                if message.get('id') in replayed:
+                    continue
+                
+                if message.get('broadcast'):
+                    await self.send_event(send, f"event: broadcast\ndata: {data.decode()}\n\n")
+                else:
+                    await self.send_event(send, self.format_notification(data.decode()))
+        finally:
+            if getter is not None:
+                getter.cancel()
+    
+    async def wait_for_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+    
+    async def authenticate(self, auth_header):
+        """Resolve the user of a bearer access token, None if invalid"""
+        if not auth_header.startswith('Bearer '):
+            return None
+        
+        try:
+            payload = JWTService.decode_token(auth_header.split(' ')[1])
+        except ValueError:
+            return None
+        
+        if payload.get('type') != 'access_token' or 'session_id' not in payload or 'user_id' not in payload:
+            return None
+        
+        # Same resolution as JWTAuthentication: cached, and stateless-mode aware
+        user = await sync_to_async(JWTService.resolve_user)(payload)
+        if not user:
+            return None
+        
+        return str(user.id)
+    
+    def missed_notifications(self, user_id, last_event_id):
+        """Notifications created after the last delivered one, oldest first"""
+        try:
+            last = UserNotification.objects.get(id=last_event_id, user_id=user_id)
+        except (UserNotification.DoesNotExist, ValidationError):
+            return [], False
+        
+        limit = settings.NOTIFICATION_STREAM_REPLAY_LIMIT
+        notifications = list(
+            UserNotification.objects.filter(user_id=user_id).filter(
+                Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id)
+            ).order_by('created_at', 'id')[:limit + 1]
+        )
+        
+        complete = len(notifications) <= limit
+        return NotificationSerializer(notifications[:limit], many=True).data, complete
+    
+    def format_notification(self, data):
+        notification_id = json.loads(data)['id']
+        return f"id: {notification_id}\nevent: notification\ndata: {data}\n\n"
+    
+    async def send_event(self, send, event):
+        await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+    
+    async def send_error(self, send, status_code, message, code):
+        body = json.dumps({
+            "success": False,
+            "error": {
+                "code": code,
+                "message": message,
+                "details": {}
+            }
+        }).encode()
+        
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
\ No newline at end of file
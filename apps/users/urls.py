@@ -5,5 +5,8 @@ urlpatterns = [
     path('', views.ProfileView.as_view(), name='profile'),
     path('change-password', views.ChangePasswordView.as_view(), name='change-password'),
     path('notifications', views.NotificationsView.as_view(), name='notifications'),
+    path('notifications/unread-count', views.UnreadNotificationCountView.as_view(), name='notifications-unread-count'),
     path('notifications/read', views.MarkNotificationReadView.as_view(), name='mark-notifications-read'),
+    path('export', views.ExportDataView.as_view(), name='export-data'),
+    path('import', views.ImportDataView.as_view(), name='import-data'),
 ]
\ No newline at end of file
@@ -1,15 +1,21 @@
-from django.core.paginator import Paginator
-from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage, Paginator
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from apps.common.pagination import KeysetPaginator
+from apps.common.network import get_client_ip
 from apps.common.responses import success_response, error_response
 from apps.users.models import UserNotification
+from apps.authentication.hashing import PasswordHashingService, PasswordHashingBusy
 from apps.authentication.services import JWTService
+from apps.users.services import NotificationService, ProfileService, DataTransferService
 from .serializers import (
-    UserProfileSerializer, UpdateProfileSerializer, 
+    UpdateProfileSerializer, 
     ChangePasswordSerializer, NotificationSerializer,
-    MarkNotificationReadSerializer
+    NotificationsQuerySerializer, MarkNotificationReadSerializer
 )
 
 
@@ -19,10 +25,8 @@ class ProfileView(APIView):
     
     def get(self, request):
         """Get user profile"""
-        serializer = UserProfileSerializer(request.user)
-        
         return success_response({
-            "user": serializer.data
+            "user": ProfileService.get_profile(request.user)
         })
     
     def post(self, request):
@@ -35,11 +39,9 @@ class ProfileView(APIView):
         if serializer.is_valid():
             serializer.update(request.user, serializer.validated_data)
             
-            # Get updated profile
-            profile_serializer = UserProfileSerializer(request.user)
-            
+            # The update dropped the cached profile, this rebuilds it
             return success_response({
-                "user": profile_serializer.data
+                "user": ProfileService.get_profile(request.user)
             }, "Profile updated successfully")
         
         return error_response(
@@ -59,22 +61,29 @@ class ChangePasswordView(APIView):
             context={'request': request}
         )
         
-        if serializer.is_valid():
-            user = request.user
-            new_password = serializer.validated_data['new_password']
-            
-            # Update password
-            user.set_password(new_password)
-            user.save()
-            
+        try:
+            # Old password verification and new password hashing use the hashing pool
+            is_valid = serializer.is_valid()
+            if is_valid:
+                user = request.user
+                new_password = serializer.validated_data['new_password']
+                
+                # Update password
+                user.password = PasswordHashingService.hash_password(new_password)
+                user.save()
+        except PasswordHashingBusy:
+            return error_response(
+                "Server is busy, please retry",
+                "SERVICE_BUSY",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        if is_valid:
             # Generate new access token (invalidate current sessions)
-            ip_address = self.get_client_ip(request)
+            ip_address = get_client_ip(request)
             
             # Terminate all existing sessions
-            user.login_sessions.filter(status='active').update(
-                status='terminated',
-                session_end=timezone.now()
-            )
+            JWTService.terminate_user_sessions(user)
             
             # Create new session
             access_token, session = JWTService.create_login_session(
@@ -91,14 +100,6 @@ class ChangePasswordView(APIView):
             "VALIDATION_ERROR",
             serializer.errors
         )
-    
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
 
 class NotificationsView(APIView):
@@ -107,9 +108,19 @@ class NotificationsView(APIView):
     
     def get(self, request):
         """Get user notifications"""
-        page = int(request.query_params.get('page', 1))
-        limit = min(int(request.query_params.get('limit', 20)), 50)
-        unread_only = request.query_params.get('unread_only', '').lower() == 'true'
+        serializer = NotificationsQuerySerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                serializer.errors
+            )
+        
+        page = serializer.validated_data['page']
+        limit = serializer.validated_data['limit']
+        cursor = serializer.validated_data.get('cursor')
+        unread_only = serializer.validated_data['unread_only']
         
         # Get notifications query
         notifications_query = UserNotification.objects.filter(user=request.user)
@@ -118,14 +129,36 @@ class NotificationsView(APIView):
             notifications_query = notifications_query.filter(read=False)
         
         # Get unread count
-        unread_count = UserNotification.objects.filter(user=request.user, read=False).count()
+        unread_count = NotificationService.get_unread_count(request.user.id)
+        
+        # Cursor pagination when a cursor is passed (empty for the first page)
+        if cursor is not None:
+            try:
+                notifications, next_cursor = KeysetPaginator(notifications_query, limit).page(cursor)
+            except ValueError:
+                return error_response(
+                    "Invalid cursor",
+                    "INVALID_CURSOR"
+                )
+            
+            serializer = NotificationSerializer(notifications, many=True)
+            
+            return success_response({
+                "notifications": serializer.data,
+                "unread_count": unread_count,
+                "pagination": {
+                    "limit": limit,
+                    "next_cursor": next_cursor,
+                    "has_next": next_cursor is not None
+                }
+            })
         
         # Paginate
-        paginator = Paginator(notifications_query, limit)
+        paginator = Paginator(notifications_query.order_by('-created_at', '-id'), limit)
         
         try:
             page_obj = paginator.page(page)
-        except:
+        except InvalidPage:
             return error_response(
                 "Invalid page number",
                 "INVALID_PAGE"
@@ -141,7 +174,8 @@ class NotificationsView(APIView):
                 "page": page,
                 "limit": limit,
                 "total": paginator.count,
-                "total_pages": paginator.num_pages
+                "total_pages": paginator.num_pages,
+                "next_cursor": KeysetPaginator.encode_cursor(page_obj[-1]) if page_obj.has_next() else None
             }
         })
 
@@ -165,11 +199,20 @@ class MarkNotificationReadView(APIView):
         else:
             notification_ids = [notification_id]
         
-        # Update notifications
-        updated_count = UserNotification.objects.filter(
+        notifications = UserNotification.objects.filter(
             user=request.user,
             id__in=notification_ids
-        ).update(read=True)
+        )
+        
+        with transaction.atomic():
+            # Only unread rows change the unread counter
+            updated_count = notifications.filter(read=False).update(read=True)
+            
+            if updated_count:
+                NotificationService.adjust_unread_count(request.user.id, -updated_count)
+            else:
+                # Notifications that were already read still count as marked
+                updated_count = notifications.count()
         
         if updated_count == 0:
             return error_response(
@@ -180,4 +223,54 @@ class MarkNotificationReadView(APIView):
         
         return success_response(
             message=f"Marked {updated_count} notification(s) as read"
-        )
\ No newline at end of file
+        )
+
+
+class UnreadNotificationCountView(APIView):
+    """Unread notification count endpoint"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return success_response({
+            "unread_count": NotificationService.get_unread_count(request.user.id)
+        })
+
+
+class ExportDataView(APIView):
+    """Stream the user's favourites, history and notifications as NDJSON"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        kinds = request.query_params.get('types')
+        kinds = kinds.split(',') if kinds else list(DataTransferService.KINDS)
+        
+        invalid = [kind for kind in kinds if kind not in DataTransferService.KINDS]
+        if invalid:
+            return error_response(
+                "Invalid query parameters",
+                "INVALID_PARAMS",
+                {"types": [f"Unknown types: {', '.join(invalid)}"]}
+            )
+        
+        service = DataTransferService(request.user)
+        
+        # Each server streams only its own kind of iterator, the other is buffered whole
+        if isinstance(request._request, ASGIRequest):
+            lines = service.aexport_lines(kinds)
+        else:
+            lines = service.export_lines(kinds)
+        
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="cinemate-export.ndjson"'
+        return response
+
+
+class ImportDataView(APIView):
+    """Import favourites, history and notifications from an NDJSON export"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        # Read the raw body line by line instead of letting a parser load it
+        result = DataTransferService(request.user).import_lines(request._request)
+        
+        return success_response(result, "Import complete")
\ No newline at end of file
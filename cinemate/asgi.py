@@ -1,5 +1,8 @@
 """
 ASGI config for cinemate project.
+
+The notification stream is long-lived, so it is served by a dedicated ASGI
+app instead of going through Django's request handling.
 """
 
 import os
@@ -8,4 +11,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cinemate.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+django_application = get_asgi_application()
+
+from apps.users.streaming import NotificationStreamApp  # noqa: E402  (needs the app registry)
+
+notification_stream = NotificationStreamApp()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == NotificationStreamApp.path:
+        return await notification_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
\ No newline at end of file
@@ -43,6 +43,8 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.common.middleware.MetricsMiddleware',
+    'apps.common.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.common.middleware.RateLimitMiddleware',
+    'apps.common.middleware.ResponseCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'cinemate.urls'
@@ -102,6 +105,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs in a process pool; requests beyond the queue are rejected with 503
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=os.cpu_count() or 2, cast=int)
+PASSWORD_HASHING_QUEUE_SIZE = config('PASSWORD_HASHING_QUEUE_SIZE', default=64, cast=int)
+PASSWORD_HASHING_QUEUE_TIMEOUT = config('PASSWORD_HASHING_QUEUE_TIMEOUT', default=5, cast=int)
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -155,7 +163,10 @@ CACHES = {
         'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': REDIS_URL,
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Counts hits and misses for /system/metrics
+            'CLIENT_CLASS': 'apps.common.metrics.MetricsCacheClient',
+            # Reports Redis calls to ServerTimingMiddleware
+            'CONNECTION_POOL_CLASS': 'apps.common.timing.TimedConnectionPool',
         }
     }
 }
@@ -163,9 +174,49 @@ CACHES = {
 # Cache timeout
 CACHE_TTL = config('CACHE_TTL', default=300, cast=int)
 
+# Profile documents are invalidated on change, the TTL only bounds staleness after a missed invalidation
+PROFILE_CACHE_TTL = config('PROFILE_CACHE_TTL', default=86400, cast=int)
+
+# Unread notification counters are recounted from the database after this many seconds
+NOTIFICATION_UNREAD_COUNT_TTL = config('NOTIFICATION_UNREAD_COUNT_TTL', default=3600, cast=int)
+
+# System-wide notification fan-out
+NOTIFICATION_FANOUT_CHUNK_SIZE = config('NOTIFICATION_FANOUT_CHUNK_SIZE', default=1000, cast=int)
+NOTIFICATION_FANOUT_WORKERS = config('NOTIFICATION_FANOUT_WORKERS', default=4, cast=int)
+NOTIFICATION_FANOUT_MAX_ROWS_PER_SECOND = config('NOTIFICATION_FANOUT_MAX_ROWS_PER_SECOND', default=20000, cast=int)
+
+# Notification stream (server-sent events, served by the ASGI application)
+NOTIFICATION_STREAM_HEARTBEAT = config('NOTIFICATION_STREAM_HEARTBEAT', default=15, cast=int)
+NOTIFICATION_STREAM_MAX_DURATION = config('NOTIFICATION_STREAM_MAX_DURATION', default=3600, cast=int)
+NOTIFICATION_STREAM_MAX_BUFFER_BYTES = config('NOTIFICATION_STREAM_MAX_BUFFER_BYTES', default=65536, cast=int)
+NOTIFICATION_STREAM_REPLAY_LIMIT = config('NOTIFICATION_STREAM_REPLAY_LIMIT', default=100, cast=int)
+NOTIFICATION_STREAM_RETRY_MS = config('NOTIFICATION_STREAM_RETRY_MS', default=5000, cast=int)
+
+# Streaming NDJSON export/import of favourites, history and notifications
+DATA_EXPORT_CHUNK_SIZE = config('DATA_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+DATA_IMPORT_BATCH_SIZE = config('DATA_IMPORT_BATCH_SIZE', default=1000, cast=int)
+DATA_IMPORT_MAX_LINES = config('DATA_IMPORT_MAX_LINES', default=200000, cast=int)
+
 # TMDb API settings
 TMDB_ACCESS_TOKEN = config('TMDB_ACCESS_TOKEN')
 TMDB_BASE_URL = config('TMDB_BASE_URL', default='https://api.themoviedb.org/3')
+# Upstream fetches in flight at once for batched movie lookups, per process
+TMDB_BATCH_CONCURRENCY = config('TMDB_BATCH_CONCURRENCY', default=8, cast=int)
+
+# Image proxy: formatters point at /movies/images/<file>?w=<width> instead of
+# TMDb when enabled. IMAGE_PROXY_BASE_URL makes those URLs absolute.
+IMAGE_PROXY_ENABLE = config('IMAGE_PROXY_ENABLE', default=False, cast=bool)
+IMAGE_PROXY_BASE_URL = config('IMAGE_PROXY_BASE_URL', default='')
+IMAGE_PROXY_WORKERS = config('IMAGE_PROXY_WORKERS', default=4, cast=int)
+IMAGE_PROXY_QUEUE_SIZE = config('IMAGE_PROXY_QUEUE_SIZE', default=32, cast=int)
+IMAGE_PROXY_QUALITY = config('IMAGE_PROXY_QUALITY', default=80, cast=int)
+IMAGE_CACHE_DIR = config('IMAGE_CACHE_DIR', default=os.path.join(MEDIA_ROOT, 'image_cache'))
+IMAGE_CACHE_MAX_BYTES = config('IMAGE_CACHE_MAX_BYTES', default=1024 ** 3, cast=int)
+
+# Trending settings
+TRENDING_TOP_N = config('TRENDING_TOP_N', default=100, cast=int)
+TRENDING_REFRESH_INTERVAL = config('TRENDING_REFRESH_INTERVAL', default=60, cast=int)
+TRENDING_FAVOURITE_WEIGHT = config('TRENDING_FAVOURITE_WEIGHT', default=5, cast=int)
 
 # YouTube API settings
 YOUTUBE_API_KEY = config('YOUTUBE_API_KEY')
@@ -176,6 +227,24 @@ JWT_ALGORITHM = config('JWT_ALGORITHM', default='HS256')
 JWT_ACCESS_TOKEN_LIFETIME = config('JWT_ACCESS_TOKEN_LIFETIME', default=3600, cast=int)
 JWT_REFRESH_TOKEN_LIFETIME = config('JWT_REFRESH_TOKEN_LIFETIME', default=604800, cast=int)
 
+# 'session' checks the login session on every request (cached), 'stateless'
+# trusts access tokens until they expire unless their session is revoked
+JWT_AUTH_MODE = config('JWT_AUTH_MODE', default='session')
+AUTH_REVOCATION_SYNC_INTERVAL = config('AUTH_REVOCATION_SYNC_INTERVAL', default=30, cast=int)
+AUTH_REVOCATION_BLOOM_CAPACITY = config('AUTH_REVOCATION_BLOOM_CAPACITY', default=100000, cast=int)
+AUTH_REVOCATION_BLOOM_ERROR_RATE = config('AUTH_REVOCATION_BLOOM_ERROR_RATE', default=0.001, cast=float)
+
+# Authenticated session/user cache (Redis, then a shorter-lived copy in process memory)
+AUTH_CACHE_TTL = config('AUTH_CACHE_TTL', default=300, cast=int)
+AUTH_CACHE_LOCAL_TTL = config('AUTH_CACHE_LOCAL_TTL', default=30, cast=int)
+AUTH_CACHE_LOCAL_MAX_ENTRIES = config('AUTH_CACHE_LOCAL_MAX_ENTRIES', default=10000, cast=int)
+
+# Sweeping of expired sessions and password resets (sweep_auth_records)
+AUTH_SWEEP_BATCH_SIZE = config('AUTH_SWEEP_BATCH_SIZE', default=1000, cast=int)
+AUTH_SWEEP_BATCH_PAUSE = config('AUTH_SWEEP_BATCH_PAUSE', default=0.1, cast=float)
+AUTH_SESSION_RETENTION_DAYS = config('AUTH_SESSION_RETENTION_DAYS', default=30, cast=int)
+PASSWORD_RESET_RETENTION_DAYS = config('PASSWORD_RESET_RETENTION_DAYS', default=7, cast=int)
+
 # Email settings
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='')
@@ -228,4 +297,73 @@ CORS_ALLOW_METHODS = [
 CORS_PREFLIGHT_MAX_AGE = 3600
 
 # Rate limiting
-RATE_LIMIT_ENABLE = config('RATE_LIMIT_ENABLE', default=False, cast=bool)
\ No newline at end of file
+RATE_LIMIT_ENABLE = config('RATE_LIMIT_ENABLE', default=False, cast=bool)
+
+# Addresses or networks of the reverse proxies in front of the API. Only
+# these may set X-Forwarded-For; otherwise clients are identified, rate
+# limited and blocked by REMOTE_ADDR. Required behind a proxy, or every
+# client is the proxy. Proxies and private addresses are never auto-blocked.
+TRUSTED_PROXIES = [network for network in config('TRUSTED_PROXIES', default='').split(',') if network.strip()]
+
+# Seconds an IP stays blocked after exhausting its bucket (0 to only throttle)
+RATE_LIMIT_BLOCK_DURATION = config('RATE_LIMIT_BLOCK_DURATION', default=300, cast=int)
+
+# Token buckets per route, first match wins. Each allows `requests` per
+# `window` seconds per IP and endpoint (path and method), so endpoints under
+# one rule do not share a bucket; `user_requests` gives authenticated callers
+# their own bucket instead. A rule without `requests` is not limited.
+RATE_LIMIT_RULES = [
+    {'name': 'auth', 'pattern': r'^/auth/', 'requests': 5, 'window': 60},
+    {'name': 'search', 'pattern': r'^/movies/search'},
+    {'name': 'images', 'pattern': r'^/movies/images/', 'requests': 600, 'window': 60},
+    {'name': 'movies', 'pattern': r'^/movies/', 'requests': 100, 'window': 60, 'user_requests': 200},
+    {'name': 'profile', 'pattern': r'^/profile/', 'requests': 50, 'window': 60, 'user_requests': 100},
+]
+
+# Server-Timing header and a JSON log line per request with the time spent on
+# the database, Redis and each upstream host
+SERVER_TIMING_ENABLE = config('SERVER_TIMING_ENABLE', default=True, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'cinemate.timing': {
+            'handlers': ['console'],
+            'level': config('SERVER_TIMING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Prometheus metrics at /system/metrics. Each process adds its counts to Redis
+# every METRICS_FLUSH_INTERVAL seconds; scrapers send METRICS_TOKEN as a bearer
+# token, the endpoint is disabled without one.
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=int)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Rendered responses to anonymous requests, cached for a number of seconds
+# per URL name. ResponseCache.bump_version() retires every entry.
+RESPONSE_CACHE_ENABLE = config('RESPONSE_CACHE_ENABLE', default=True, cast=bool)
+RESPONSE_CACHE_RULES = {
+    'popular-movies': 300,
+    'coming-soon': 300,
+    'genres': 3600,
+    'movie-details': 300,
+}
+
+# Heavy-hitter detection: a count-min sketch and top-K set per window of
+# HEAVY_HITTER_WINDOW seconds, kept for HEAVY_HITTER_HISTORY windows. IPs
+# reaching HEAVY_HITTER_THRESHOLD requests in a window are blacklisted.
+HEAVY_HITTER_WINDOW = config('HEAVY_HITTER_WINDOW', default=60, cast=int)
+HEAVY_HITTER_THRESHOLD = config('HEAVY_HITTER_THRESHOLD', default=600, cast=int)
+HEAVY_HITTER_TOP_K = config('HEAVY_HITTER_TOP_K', default=50, cast=int)
+HEAVY_HITTER_SKETCH_WIDTH = config('HEAVY_HITTER_SKETCH_WIDTH', default=2048, cast=int)
+HEAVY_HITTER_SKETCH_DEPTH = config('HEAVY_HITTER_SKETCH_DEPTH', default=4, cast=int)
+HEAVY_HITTER_HISTORY = config('HEAVY_HITTER_HISTORY', default=60, cast=int)
+HEAVY_HITTER_BLOCK_DURATION = config('HEAVY_HITTER_BLOCK_DURATION', default=3600, cast=int)
\ No newline at end of file